@@ -0,0 +1,255 @@
+"""
+Seeded synthetic data for benchmarks
+
+Generates projects with sub jobs, cost codes across every discipline in
+DISCIPLINE_CHOICES, rules of credit with 1 to 8 steps, and work items with
+step progress following a typical project distribution: some not started,
+some complete, the rest partway with earlier steps done before later ones.
+The same seed and sizes always produce the same data. Earned values and
+rollups are computed with the application's own recalculation.
+
+Usage:
+    python benchmarks/data_generator.py --items 100000 --projects 4 --output /tmp/bench.db
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+# Bump when the generated data changes, so cached benchmark databases are rebuilt
+GENERATOR_VERSION = 1
+
+# Work items inserted per executemany statement
+INSERT_CHUNK_SIZE = 10000
+
+# Share of work items not started and complete; the rest are in progress
+NOT_STARTED_SHARE = 0.30
+COMPLETE_SHARE = 0.15
+
+UNITS_BY_DISCIPLINE = {
+    'Mechanical': 'EA', 'Electrical': 'LF', 'Civil': 'CY', 'Steel': 'TN', 'Concrete': 'CY',
+    'Piping': 'LF', 'Plumbing': 'LF', 'Fire': 'EA', 'Painting': 'SF', 'Roofing': 'SF',
+    'Staff': 'HR', 'GC': 'LS', 'Misc.': 'EA'
+}
+
+STEP_NAMES = ('Receive', 'Layout', 'Set', 'Install', 'Connect', 'Punch', 'Test', 'Turnover')
+
+
+def make_app(database_path, profile='default'):
+    """Flask app bound to a SQLite file, with the application's routes registered"""
+    from models import db
+    from routes import main_bp
+    from services.database import init_database
+
+    root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    app = Flask(__name__, root_path=root_path, instance_path=os.path.dirname(os.path.abspath(database_path)))
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.abspath(database_path)}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SECRET_KEY'] = 'benchmark'
+    app.config['SQLITE_PROFILE'] = profile
+    app.config['REPORT_CACHE_DIR'] = os.path.join(app.instance_path, 'report_cache')
+    init_database(app)
+    app.register_blueprint(main_bp)
+    return app, db
+
+
+def _rule_steps(rng, step_count):
+    """Step names in execution order with integer weights summing to 100"""
+    names = STEP_NAMES[:step_count] if step_count < len(STEP_NAMES) else STEP_NAMES
+    raw = [rng.uniform(1, 3) for _ in names]
+    weights = [max(1, int(100 * value / sum(raw))) for value in raw]
+    weights[-1] += 100 - sum(weights)
+    return [{'name': name, 'weight': weight} for name, weight in zip(names, weights)]
+
+
+def _step_progress(rng, step_count):
+    """Percent complete per step: finished steps, one step partway, the rest not started"""
+    draw = rng.random()
+    if draw < NOT_STARTED_SHARE:
+        return [0.0] * step_count
+    if draw < NOT_STARTED_SHARE + COMPLETE_SHARE:
+        return [100.0] * step_count
+    current = rng.randrange(step_count)
+    partial = float(rng.choice((0, 10, 25, 50, 75, 90)))
+    if current == 0 and partial == 0:
+        partial = 25.0
+    return [100.0] * current + [partial] + [0.0] * (step_count - current - 1)
+
+
+def generate_dataset(work_items, projects=4, sub_jobs_per_project=10, cost_codes_per_discipline=3,
+                     rules=12, seed=0, progress_callback=None):
+    """
+    Fill the current database with a synthetic data set
+
+    Must run in an app context on an empty database.
+
+    Args:
+        work_items (int): Total work items, split evenly over the projects
+        projects (int): Number of projects
+        sub_jobs_per_project (int): Sub jobs in each project
+        cost_codes_per_discipline (int): Cost codes per discipline in each project
+        rules (int): Rules of credit shared by all projects
+        seed (int): Random seed
+        progress_callback (callable): Called as (work items inserted, total) after each chunk
+
+    Returns:
+        dict: Counts of the generated rows and elapsed seconds
+    """
+    from models import db, DISCIPLINE_CHOICES, Project, SubJob, RuleOfCredit, CostCode, WorkItem, WorkItemStepProgress
+    from services.recalculation import recalculate_work_items
+
+    started = time.monotonic()
+    rng = random.Random(seed)
+
+    rule_rows = []
+    for index in range(rules):
+        rule = RuleOfCredit(name=f'Rule {index + 1:02d}', description='Generated benchmark rule')
+        rule.set_steps(_rule_steps(rng, 1 + index % len(STEP_NAMES)))
+        rule_rows.append(rule)
+    db.session.add_all(rule_rows)
+    db.session.flush()
+    rule_step_names = {rule.id: [step['name'] for step in rule.get_steps()] for rule in rule_rows}
+
+    project_rows = [
+        Project(project_id_str=f'BENCH-{index + 1:03d}', name=f'Benchmark Project {index + 1}',
+                description='Generated benchmark project')
+        for index in range(projects)
+    ]
+    db.session.add_all(project_rows)
+    db.session.flush()
+
+    # Per project: sub job IDs and (cost code ID, rule ID, unit of measure) choices
+    scopes = []
+    for project in project_rows:
+        sub_jobs = [
+            SubJob(sub_job_id_str=f'{project.project_id_str}-SJ{index + 1:02d}', name=f'Area {index + 1}',
+                   project_id=project.id, area=f'Area {index + 1}')
+            for index in range(sub_jobs_per_project)
+        ]
+        cost_codes = [
+            CostCode(cost_code_id_str=f'{project.project_id_str}-{discipline[:4].upper().rstrip(".")}-{index + 1:02d}',
+                     description=f'{discipline} work {index + 1}', discipline=discipline,
+                     project_id=project.id, rule_of_credit_id=rng.choice(rule_rows).id)
+            for discipline in DISCIPLINE_CHOICES
+            for index in range(cost_codes_per_discipline)
+        ]
+        db.session.add_all(sub_jobs + cost_codes)
+        db.session.flush()
+        scopes.append((
+            project.id,
+            [sub_job.id for sub_job in sub_jobs],
+            [(cost_code.id, cost_code.rule_of_credit_id, UNITS_BY_DISCIPLINE.get(cost_code.discipline, 'EA'))
+             for cost_code in cost_codes]
+        ))
+    db.session.commit()
+
+    inserted = 0
+    step_rows_inserted = 0
+    while inserted < work_items:
+        chunk = []
+        rule_ids = []
+        for index in range(inserted, min(inserted + INSERT_CHUNK_SIZE, work_items)):
+            project_id, sub_job_ids, cost_codes = scopes[index % len(scopes)]
+            cost_code_id, rule_id, unit_of_measure = rng.choice(cost_codes)
+            # Budgets are skewed: many small items and a few large ones
+            budgeted_man_hours = round(math.exp(rng.gauss(2.5, 1.0)), 1)
+            chunk.append({
+                'work_item_id_str': f'BENCH-WI-{index + 1:07d}',
+                'description': f'{unit_of_measure} item {index + 1} {rng.choice(STEP_NAMES).lower()}',
+                'project_id': project_id,
+                'sub_job_id': rng.choice(sub_job_ids),
+                'cost_code_id': cost_code_id,
+                'budgeted_quantity': round(budgeted_man_hours * rng.uniform(0.5, 4.0), 1),
+                'unit_of_measure': unit_of_measure,
+                'budgeted_man_hours': budgeted_man_hours,
+                'progress_json': '[]',
+                'earned_man_hours': 0.0,
+                'earned_quantity': 0.0,
+                'percent_complete_hours': 0.0,
+                'percent_complete_quantity': 0.0
+            })
+            rule_ids.append(rule_id)
+        db.session.execute(WorkItem.__table__.insert(), chunk)
+
+        new_ids = dict(
+            db.session.query(WorkItem.work_item_id_str, WorkItem.id)
+            .filter(WorkItem.work_item_id_str.in_([row['work_item_id_str'] for row in chunk]))
+        )
+        step_rows = []
+        for row, rule_id in zip(chunk, rule_ids):
+            step_names = rule_step_names[rule_id]
+            for step_name, percentage in zip(step_names, _step_progress(rng, len(step_names))):
+                step_rows.append({'work_item_id': new_ids[row['work_item_id_str']], 'step_name': step_name,
+                                  'percentage': percentage})
+        db.session.execute(WorkItemStepProgress.__table__.insert(), step_rows)
+        db.session.commit()
+
+        inserted += len(chunk)
+        step_rows_inserted += len(step_rows)
+        if progress_callback:
+            progress_callback(inserted, work_items)
+
+    # Earned values and rollups through the same code path as a rule change
+    recalculate_work_items()
+
+    return {
+        'projects': projects,
+        'sub_jobs': projects * sub_jobs_per_project,
+        'cost_codes': sum(len(cost_codes) for _, _, cost_codes in scopes),
+        'rules_of_credit': rules,
+        'work_items': inserted,
+        'step_progress_rows': step_rows_inserted,
+        'elapsed_seconds': time.monotonic() - started
+    }
+
+
+def create_database(database_path, work_items, projects=4, seed=0, progress_callback=None):
+    """
+    Create a SQLite database file holding a generated data set
+
+    Returns:
+        dict: The result of generate_dataset
+    """
+    if os.path.exists(database_path):
+        os.remove(database_path)
+    os.makedirs(os.path.dirname(os.path.abspath(database_path)), exist_ok=True)
+    from services.migrations import run_migrations, analyze_database
+    from services.search import ensure_search_index
+
+    app, db = make_app(database_path)
+    with app.app_context():
+        # The same schema, indexes and search index as a database set up by the app
+        db.create_all()
+        run_migrations()
+        result = generate_dataset(work_items, projects=projects, seed=seed, progress_callback=progress_callback)
+        ensure_search_index()
+        db.session.remove()
+        # Planner statistics, as db-upgrade leaves them on a production database
+        analyze_database()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=10000, help='Work items to generate')
+    parser.add_argument('--projects', type=int, default=4, help='Projects to spread the work items over')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--output', required=True, help='SQLite database file to create (replaced if it exists)')
+    args = parser.parse_args()
+
+    result = create_database(
+        args.output, args.items, projects=args.projects, seed=args.seed,
+        progress_callback=lambda done, total: print(f"Inserted {done}/{total} work items")
+    )
+    print(f"Generated {result['work_items']} work items and {result['step_progress_rows']} step progress rows "
+          f"in {result['elapsed_seconds']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
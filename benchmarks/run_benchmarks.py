@@ -0,0 +1,340 @@
+"""
+Benchmark suite for the key pages and jobs at several data sizes
+
+For each size a seeded data set is generated (see data_generator.py) and
+the projects page, project page, work item list filters, single and batch
+progress updates, both PDF reports and the bulk recalculation are timed
+against a scratch copy of it. Results are written as JSON; pass an earlier
+results file with --compare to list the cases that got slower.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 1k,10k,100k --output results.json
+    python benchmarks/run_benchmarks.py --sizes 1k,10k --compare results.json
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_generator import GENERATOR_VERSION, create_database, make_app
+
+# Bump when cases are added or changed, so results of different suites are not compared
+SUITE_VERSION = 1
+
+DEFAULT_SIZES = '1k,10k'
+
+# Slower than the baseline by more than this factor counts as a regression
+DEFAULT_REGRESSION_THRESHOLD = 1.2
+
+# Updates sent per progress batch request
+PROGRESS_BATCH_SIZE = 100
+
+
+def parse_size(text):
+    """Turn '10k' or '1m' into a number of work items"""
+    text = text.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _dataset_path(data_dir, size, projects, seed):
+    return os.path.join(data_dir, f'bench-v{GENERATOR_VERSION}-{size}-{projects}p-s{seed}.db')
+
+
+# ===== CASES =====
+
+class BenchmarkContext:
+    """Test client and IDs of the data set the cases run against"""
+
+    def __init__(self, app, seed):
+        from models import db, WorkItem, CostCode
+
+        self.app = app
+        self.client = app.test_client()
+        self.rng = random.Random(seed)
+        self.batch_number = 0
+
+        # The largest project is the one every case looks at
+        project_id, _ = db.session.query(WorkItem.project_id, db.func.count(WorkItem.id)) \
+            .group_by(WorkItem.project_id).order_by(db.func.count(WorkItem.id).desc()).first()
+        self.project_id = project_id
+        # Work item ID -> cost code ID, so updates can be built without timed queries
+        self.work_item_cost_codes = dict(
+            db.session.query(WorkItem.id, WorkItem.cost_code_id).filter(WorkItem.project_id == project_id)
+        )
+        self.work_item_ids = sorted(self.work_item_cost_codes)
+        self.sub_job_id = db.session.query(WorkItem.sub_job_id).filter(WorkItem.project_id == project_id).limit(1).scalar()
+
+        self.cost_code_steps = {}
+        for cost_code in CostCode.query.filter(CostCode.project_id == project_id):
+            rule = cost_code.rule_of_credit
+            self.cost_code_steps[cost_code.id] = [step['name'] for step in rule.get_steps()] if rule else []
+
+    def random_work_item(self):
+        """A work item of the project and the step names of its rule"""
+        work_item_id = self.rng.choice(self.work_item_ids)
+        return work_item_id, self.cost_code_steps[self.work_item_cost_codes[work_item_id]]
+
+    def get(self, url):
+        response = self.client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+        # Pages catch their own errors and show them as a flash message
+        if b'alert-danger' in response.data:
+            raise RuntimeError(f"GET {url} showed an error message")
+        return response
+
+
+def _progress_update(context):
+    work_item_id, steps = context.random_work_item()
+    form = {f'step_{step}': str(context.rng.choice((0, 25, 50, 75, 100))) for step in steps}
+    response = context.client.post(f'/update_work_item_progress/{work_item_id}', data=form)
+    if response.status_code != 302:
+        raise RuntimeError(f"Progress update returned {response.status_code}")
+
+
+def _progress_batch(context):
+    updates = []
+    for _ in range(PROGRESS_BATCH_SIZE):
+        work_item_id, steps = context.random_work_item()
+        updates.append({'work_item_id': work_item_id, 'step': context.rng.choice(steps),
+                        'percent': context.rng.choice((0, 25, 50, 75, 100))})
+    context.batch_number += 1
+    response = context.client.post('/api/work_items/progress',
+                                   json={'batch_id': f'bench-{context.batch_number}', 'updates': updates})
+    if response.status_code != 200:
+        raise RuntimeError(f"Progress batch returned {response.status_code}")
+
+
+def _pdf_report(writer):
+    def run(context):
+        with tempfile.TemporaryFile() as output:
+            writer(output, project_id=context.project_id)
+    return run
+
+
+def _recalculation(context):
+    from services.recalculation import recalculate_work_items
+    recalculate_work_items(project_id=context.project_id)
+
+
+def benchmark_cases():
+    """
+    (name, function, heavy) for every case
+
+    Heavy cases scale with the size of the project and run --heavy-repeat
+    times instead of --repeat times.
+    """
+    from reports.pdf_export import write_quantities_report_pdf, write_hours_report_pdf
+    from services.report_jobs import write_combined_report
+
+    return [
+        ('projects', lambda context: context.get('/projects'), False),
+        ('view_project', lambda context: context.get(f'/project/{context.project_id}'), False),
+        ('work_items', lambda context: context.get('/work_items'), False),
+        ('work_items_project', lambda context: context.get(f'/work_items?project_id={context.project_id}'), False),
+        ('work_items_sub_job', lambda context: context.get(
+            f'/work_items?project_id={context.project_id}&sub_job_id={context.sub_job_id}'), False),
+        ('work_items_discipline', lambda context: context.get(
+            f'/work_items?project_id={context.project_id}&discipline=Piping'), False),
+        ('work_items_status', lambda context: context.get(
+            f'/work_items?project_id={context.project_id}&status=in_progress'), False),
+        ('work_items_search', lambda context: context.get(
+            f'/work_items?project_id={context.project_id}&search=install'), False),
+        ('work_items_sort_progress', lambda context: context.get(
+            f'/work_items?project_id={context.project_id}&sort_by=progress'), False),
+        ('progress_update', _progress_update, False),
+        ('progress_batch', _progress_batch, False),
+        ('pdf_quantities', _pdf_report(write_quantities_report_pdf), True),
+        ('pdf_hours', _pdf_report(write_hours_report_pdf), True),
+        ('pdf_both', _pdf_report(write_combined_report), True),
+        ('recalculation', _recalculation, True)
+    ]
+
+
+def _summary(durations):
+    durations_ms = [duration * 1000 for duration in durations]
+    return {
+        'runs': len(durations_ms),
+        'min_ms': round(min(durations_ms), 3),
+        'median_ms': round(statistics.median(durations_ms), 3),
+        'mean_ms': round(statistics.mean(durations_ms), 3),
+        'max_ms': round(max(durations_ms), 3)
+    }
+
+
+def run_size(size, args, case_names=None):
+    """
+    Run every case against a scratch copy of the data set of one size
+
+    Returns:
+        dict: Data set generation details and one summary per case
+    """
+    os.makedirs(args.data_dir, exist_ok=True)
+    dataset_path = _dataset_path(args.data_dir, size, args.projects, args.seed)
+    generation = None
+    if not os.path.exists(dataset_path):
+        print(f"Generating {size} work items...")
+        generation = create_database(dataset_path + '.tmp', size, projects=args.projects, seed=args.seed)
+        os.replace(dataset_path + '.tmp', dataset_path)
+
+    work_dir = tempfile.mkdtemp(prefix='magellan-bench-')
+    database_path = os.path.join(work_dir, 'bench.db')
+    shutil.copy(dataset_path, database_path)
+    try:
+        app, db = make_app(database_path, args.sqlite_profile)
+        results = {}
+        with app.app_context():
+            context = BenchmarkContext(app, args.seed)
+            for name, run, heavy in benchmark_cases():
+                if case_names and name not in case_names:
+                    continue
+                repeat = args.heavy_repeat if heavy else args.repeat
+                if not heavy:
+                    run(context)  # Warm up caches and compiled statements
+                durations = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    run(context)
+                    durations.append(time.perf_counter() - started)
+                    db.session.remove()
+                results[name] = _summary(durations)
+                print(f"{size:>9d} {name:26s} median {results[name]['median_ms']:10.1f} ms  "
+                      f"min {results[name]['min_ms']:10.1f} ms")
+            db.session.remove()
+        return {
+            'work_items': size,
+            'generation_seconds': round(generation['elapsed_seconds'], 3) if generation else None,
+            'cases': results
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _run_size_process(size, args, case_names, results):
+    results.put(run_size(size, args, case_names))
+
+
+def run_size_isolated(size, args, case_names=None):
+    """
+    run_size in a fresh process
+
+    The rule and search index caches are per process, and each size uses
+    its own database, so sizes must not share a process.
+    """
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=_run_size_process, args=(size, args, case_names, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+# ===== RESULTS =====
+
+def compare_results(baseline, current, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """
+    Median times of current versus baseline for the sizes and cases both ran
+
+    Returns:
+        list: (size, case, baseline ms, current ms, ratio, regressed) tuples
+    """
+    if baseline.get('suite_version') != current.get('suite_version'):
+        print(f"Warning: comparing suite version {current.get('suite_version')} "
+              f"with {baseline.get('suite_version')}")
+    rows = []
+    for size, result in current['sizes'].items():
+        baseline_cases = baseline.get('sizes', {}).get(size, {}).get('cases', {})
+        for case, summary in result['cases'].items():
+            if case not in baseline_cases:
+                continue
+            before = baseline_cases[case]['median_ms']
+            after = summary['median_ms']
+            ratio = after / before if before > 0 else float('inf')
+            rows.append((size, case, before, after, ratio, ratio > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help='Comma separated work item counts, e.g. 1k,10k,100k,1m')
+    parser.add_argument('--projects', type=int, default=4, help='Projects to spread the work items over')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the data and the updates')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed runs of each page and update case')
+    parser.add_argument('--heavy-repeat', type=int, default=2, help='Timed runs of the reports and recalculation')
+    parser.add_argument('--cases', default='', help='Comma separated case names to run (default all)')
+    parser.add_argument('--sqlite-profile', default='default', help='SQLite profile of the scratch database')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'magellan-bench-data'),
+                        help='Directory where generated data sets are kept for later runs')
+    parser.add_argument('--output', help='JSON file to write the results to')
+    parser.add_argument('--compare', help='Earlier results JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help='Median slowdown factor reported as a regression')
+    args = parser.parse_args()
+
+    case_names = {name.strip() for name in args.cases.split(',') if name.strip()}
+    results = {
+        'suite_version': SUITE_VERSION,
+        'generator_version': GENERATOR_VERSION,
+        'created_at': datetime.datetime.utcnow().isoformat() + 'Z',
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sqlite': sqlite3.sqlite_version,
+        'settings': {
+            'projects': args.projects,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'heavy_repeat': args.heavy_repeat,
+            'sqlite_profile': args.sqlite_profile
+        },
+        'sizes': {}
+    }
+    for size in [parse_size(size) for size in args.sizes.split(',') if size.strip()]:
+        results['sizes'][str(size)] = run_size_isolated(size, args, case_names)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare_results(baseline, results, args.threshold)
+        print(f"\nCompared with {args.compare} (commit {baseline.get('git_commit')})")
+        print(f"{'size':>9s} {'case':26s} {'before ms':>10s} {'after ms':>10s} {'ratio':>7s}")
+        for size, case, before, after, ratio, regressed in rows:
+            print(f"{size:>9s} {case:26s} {before:10.1f} {after:10.1f} {ratio:7.2f}"
+                  f"{'  REGRESSION' if regressed else ''}")
+        if any(row[5] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Concurrent read/write throughput of the SQLite database profiles
+
+Starts reader and writer processes against a scratch database, the way
+several gunicorn workers share instance/magellan_ev.db. Readers load the
+projects page queries; writers update step progress like the progress
+update route. Each profile is run on a fresh copy of the same data.
+
+Usage:
+    python benchmarks/sqlite_concurrency.py --items 20000 --readers 4 --writers 4 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+
+def make_app(database_path, profile):
+    from models import db
+    from services.database import init_database
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLITE_PROFILE'] = profile
+    init_database(app)
+    return app, db
+
+
+def seed_database(database_path, item_count):
+    """Create a project with item_count work items and their rollups"""
+    from models import Project, SubJob, RuleOfCredit, CostCode, WorkItem
+    from services.rollups import rebuild_rollups
+
+    app, db = make_app(database_path, 'default')
+    with app.app_context():
+        db.create_all()
+        project = Project(project_id_str='BENCH', name='Benchmark Project')
+        db.session.add(project)
+        db.session.flush()
+        sub_job = SubJob(sub_job_id_str='BENCH-SJ', name='Benchmark Sub Job', project_id=project.id)
+        rule = RuleOfCredit(name='Benchmark Rule')
+        rule.set_steps([{'name': 'Install', 'weight': 60}, {'name': 'Test', 'weight': 40}])
+        db.session.add_all([sub_job, rule])
+        db.session.flush()
+        cost_code = CostCode(cost_code_id_str='BENCH-CC', description='Benchmark', discipline='Piping',
+                             project_id=project.id, rule_of_credit_id=rule.id)
+        db.session.add(cost_code)
+        db.session.flush()
+
+        db.session.execute(WorkItem.__table__.insert(), [
+            {
+                'work_item_id_str': f'BENCH-{index:07d}',
+                'description': f'Benchmark item {index}',
+                'project_id': project.id,
+                'sub_job_id': sub_job.id,
+                'cost_code_id': cost_code.id,
+                'budgeted_quantity': 10.0,
+                'budgeted_man_hours': 8.0,
+                'unit_of_measure': 'EA'
+            }
+            for index in range(item_count)
+        ])
+        rebuild_rollups()
+        db.session.commit()
+
+
+def reader(database_path, profile, seconds, results):
+    from models import WorkItem
+    from services.rollups import project_totals, sub_job_totals
+
+    app, db = make_app(database_path, profile)
+    done = errors = 0
+    with app.app_context():
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            try:
+                project_totals()
+                sub_job_totals(project_id=1)
+                WorkItem.query.filter(WorkItem.project_id == 1).order_by(WorkItem.id.desc()).limit(50).all()
+                db.session.commit()
+                done += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    results.put(('read', done, errors))
+
+
+def writer(database_path, profile, seconds, item_count, results):
+    from models import WorkItem
+    from services.rollups import capture_contribution, record_work_item_change
+
+    app, db = make_app(database_path, profile)
+    done = errors = 0
+    with app.app_context():
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            try:
+                work_item = db.session.get(WorkItem, random.randint(1, item_count))
+                before = capture_contribution(work_item)
+                work_item.update_progress_step('Install', random.choice([0, 25, 50, 75, 100]))
+                work_item.calculate_earned_values()
+                record_work_item_change(before, work_item)
+                db.session.commit()
+                done += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    results.put(('write', done, errors))
+
+
+def run_profile(seed_path, profile, args):
+    """Run the readers and writers against a fresh copy of the seeded database"""
+    work_dir = tempfile.mkdtemp(prefix=f'magellan-bench-{profile}-')
+    database_path = os.path.join(work_dir, 'bench.db')
+    shutil.copy(seed_path, database_path)
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    processes = [
+        context.Process(target=reader, args=(database_path, profile, args.seconds, results))
+        for _ in range(args.readers)
+    ] + [
+        context.Process(target=writer, args=(database_path, profile, args.seconds, args.items, results))
+        for _ in range(args.writers)
+    ]
+    for process in processes:
+        process.start()
+
+    totals = {'read': [0, 0], 'write': [0, 0]}
+    for _ in processes:
+        kind, done, errors = results.get()
+        totals[kind][0] += done
+        totals[kind][1] += errors
+    for process in processes:
+        process.join()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=20000, help='Work items in the scratch database')
+    parser.add_argument('--readers', type=int, default=4, help='Reader processes')
+    parser.add_argument('--writers', type=int, default=4, help='Writer processes')
+    parser.add_argument('--seconds', type=float, default=10, help='Duration of each run')
+    parser.add_argument('--profiles', default='default,production', help='Comma separated profiles to compare')
+    args = parser.parse_args()
+
+    seed_dir = tempfile.mkdtemp(prefix='magellan-bench-seed-')
+    seed_path = os.path.join(seed_dir, 'seed.db')
+    print(f"Seeding {args.items} work items...")
+    seed_database(seed_path, args.items)
+
+    print(f"{'profile':12s} {'reads/s':>10s} {'writes/s':>10s} {'read errors':>12s} {'write errors':>13s}")
+    for profile in args.profiles.split(','):
+        totals = run_profile(seed_path, profile, args)
+        print(f"{profile:12s} {totals['read'][0] / args.seconds:10.1f} {totals['write'][0] / args.seconds:10.1f} "
+              f"{totals['read'][1]:12d} {totals['write'][1]:13d}")
+    shutil.rmtree(seed_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
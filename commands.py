@@ -0,0 +1,190 @@
+import click
+from flask.cli import with_appcontext
+from models import db
+
+
+@click.command('rebuild-rollups')
+@click.option('--project-id', type=int, default=None, help='Only rebuild the rollups of this project')
+@with_appcontext
+def rebuild_rollups_command(project_id):
+    """Rebuild the materialized project, sub job, cost code and discipline rollups"""
+    from services.rollups import rebuild_rollups
+
+    row_count = rebuild_rollups(project_id=project_id)
+    db.session.commit()
+    click.echo(f'Rebuilt {row_count} rollup rows')
+
+
+@click.command('migrate-step-progress')
+@click.option('--batch-size', type=int, default=1000, help='Work items converted per transaction')
+@with_appcontext
+def migrate_step_progress_command(batch_size):
+    """Convert legacy progress_json values into work_item_step_progress rows"""
+    from services.step_progress import migrate_progress_json
+
+    migrated_items, written_rows = migrate_progress_json(batch_size=batch_size)
+    click.echo(f'Migrated {migrated_items} work items ({written_rows} step rows)')
+
+
+@click.command('recalculate')
+@click.option('--rule-id', type=int, default=None, help='Only work items whose cost code uses this rule of credit')
+@click.option('--cost-code-id', type=int, default=None, help='Only work items with this cost code')
+@click.option('--project-id', type=int, default=None, help='Only work items of this project')
+@click.option('--chunk-size', type=int, default=5000, help='Work items per transaction')
+@with_appcontext
+def recalculate_command(rule_id, cost_code_id, project_id, chunk_size):
+    """Recalculate stored earned values of work items in bulk"""
+    from services.recalculation import recalculate_work_items
+
+    def report_progress(done, total, elapsed):
+        click.echo(f'{done}/{total} work items ({elapsed:.2f}s)')
+
+    result = recalculate_work_items(rule_id=rule_id, cost_code_id=cost_code_id, project_id=project_id,
+                                    chunk_size=chunk_size, progress_callback=report_progress)
+    click.echo(f"Recalculated {result['items']} work items in {result['chunks']} chunks "
+               f"({result['elapsed_seconds']:.2f}s)")
+
+
+@click.command('purge-report-jobs')
+@click.option('--hours', type=int, default=24, help='Delete finished report jobs older than this')
+@with_appcontext
+def purge_report_jobs_command(hours):
+    """Delete old report jobs (cached report files are evicted by size)"""
+    from services.report_jobs import purge_report_jobs
+
+    deleted = purge_report_jobs(max_age_hours=hours)
+    click.echo(f'Deleted {deleted} report jobs')
+
+
+@click.command('purge-recalculation-jobs')
+@click.option('--hours', type=int, default=24, help='Delete finished recalculation jobs older than this')
+@with_appcontext
+def purge_recalculation_jobs_command(hours):
+    """Delete old background recalculation jobs"""
+    from services.recalculation import purge_recalculation_jobs
+
+    deleted = purge_recalculation_jobs(max_age_hours=hours)
+    click.echo(f'Deleted {deleted} recalculation jobs')
+
+
+@click.command('purge-progress-batches')
+@click.option('--days', type=int, default=30, help='Delete stored progress batch results older than this')
+@with_appcontext
+def purge_progress_batches_command(days):
+    """Delete old bulk progress batch results kept for idempotent retries"""
+    from services.progress_batch import purge_progress_batches
+
+    deleted = purge_progress_batches(max_age_days=days)
+    click.echo(f'Deleted {deleted} progress batches')
+
+
+@click.command('compact-progress-history')
+@click.option('--project-id', type=int, default=None, help='Only compact this project')
+@with_appcontext
+def compact_progress_history_command(project_id):
+    """Write weekly progress snapshots from progress events (run nightly)"""
+    from services.progress_history import compact_progress_history
+
+    written = compact_progress_history(project_id=project_id)
+    click.echo(f'Wrote {written} weekly snapshots')
+
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Create or repopulate the full-text work item search index"""
+    from services.search import ensure_search_index, rebuild_search_index
+
+    if not ensure_search_index():
+        click.echo('Full-text search is not available on this database')
+        return
+    count = rebuild_search_index()
+    click.echo(f'Indexed {count} work items')
+
+
+@click.command('import-work-items')
+@click.argument('project_id', type=int)
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Validate the file without importing anything')
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False), default=None,
+              help='Write rejected rows to this CSV file')
+@click.option('--chunk-size', type=int, default=5000, help='Rows per transaction')
+@with_appcontext
+def import_work_items_command(project_id, path, dry_run, errors_path, chunk_size):
+    """Bulk import work items into a project from a CSV or Excel file"""
+    from services.work_item_import import read_import_rows, import_work_items, write_error_report
+
+    def report_progress(read, imported, elapsed):
+        click.echo(f'{read} rows read, {imported} valid ({elapsed:.2f}s)')
+
+    with open(path, 'rb') as stream:
+        result = import_work_items(project_id, read_import_rows(stream, path), dry_run=dry_run,
+                                   chunk_size=chunk_size, progress_callback=report_progress)
+
+    if errors_path:
+        with open(errors_path, 'w', newline='', encoding='utf-8') as output:
+            write_error_report(result['errors'], output)
+    for error in result['errors'][:20]:
+        click.echo(f"Row {error['row']}: {error['error']}")
+
+    verb = 'Validated' if dry_run else 'Imported'
+    click.echo(f"{verb} {result['imported']} of {result['rows']} rows, {result['rejected']} rejected "
+               f"({result['elapsed_seconds']:.2f}s)")
+
+
+@click.command('db-upgrade')
+@with_appcontext
+def db_upgrade_command():
+    """Create missing tables, apply pending schema migrations and refresh planner statistics"""
+    from services.migrations import run_migrations, analyze_database
+
+    db.create_all()
+    applied = run_migrations()
+    analyze_database()
+    click.echo(f'Applied {len(applied)} migrations')
+
+
+@click.command('db-status')
+@with_appcontext
+def db_status_command():
+    """List schema migrations and whether they are applied"""
+    from services.migrations import MIGRATIONS, get_applied_versions
+
+    applied = get_applied_versions()
+    for version, name, _ in MIGRATIONS:
+        state = 'applied' if version in applied else 'pending'
+        click.echo(f'{version:4d}  {state:8s} {name}')
+
+
+@click.command('check-indexes')
+@with_appcontext
+def check_indexes_command():
+    """Report hot queries that scan a whole table or sort their rows (EXPLAIN QUERY PLAN)"""
+    from services.migrations import check_query_plans
+
+    try:
+        problems = check_query_plans()
+    except RuntimeError as e:
+        click.echo(str(e))
+        raise SystemExit(1)
+    for name, detail in problems:
+        click.echo(f'Missing index: {name}: {detail}')
+    if problems:
+        raise SystemExit(1)
+    click.echo('All hot queries use indexes')
+
+
+def register_commands(app):
+    """Register the maintenance commands with the Flask CLI"""
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(migrate_step_progress_command)
+    app.cli.add_command(recalculate_command)
+    app.cli.add_command(purge_report_jobs_command)
+    app.cli.add_command(purge_recalculation_jobs_command)
+    app.cli.add_command(purge_progress_batches_command)
+    app.cli.add_command(compact_progress_history_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(import_work_items_command)
+    app.cli.add_command(db_upgrade_command)
+    app.cli.add_command(db_status_command)
+    app.cli.add_command(check_indexes_command)
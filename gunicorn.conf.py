@@ -0,0 +1,22 @@
+import glob
+import os
+import tempfile
+
+# Metrics of all workers are combined through files in this directory
+# (prometheus_client multiprocess mode). It must be set before the app, and
+# so the first metric, is imported in any worker.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'magellan_ev_metrics'))
+
+
+def on_starting(server):
+    """Start every server run with empty metrics"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that exited; its counters and histograms are kept"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
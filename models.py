@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+import datetime
 import json
 
 # Initialize SQLAlchemy
@@ -46,34 +47,38 @@ class Project(db.Model):
             items.extend(sub_job.work_items)
         return items
     
+    @property
+    def totals(self):
+        """Get hours and quantity totals for this project from a SQL aggregate"""
+        from services.rollups import get_project_totals
+        return get_project_totals(self.id)
+    
     @property
     def total_budgeted_hours(self):
         """Calculate total budgeted hours for all work items in this project"""
-        return sum(item.budgeted_man_hours or 0 for item in self.work_items)
+        return self.totals['total_budgeted_hours']
     
     @property
     def total_earned_hours(self):
         """Calculate total earned hours for all work items in this project"""
-        return sum(item.earned_man_hours or 0 for item in self.work_items)
+        return self.totals['total_earned_hours']
     
     @property
     def total_budgeted_quantity(self):
         """Calculate total budgeted quantity for all work items in this project"""
         # Note: This is a simplified approach as quantities might have different units
-        return sum(item.budgeted_quantity or 0 for item in self.work_items)
+        return self.totals['total_budgeted_quantity']
     
     @property
     def total_earned_quantity(self):
         """Calculate total earned quantity for all work items in this project"""
         # Note: This is a simplified approach as quantities might have different units
-        return sum(item.earned_quantity or 0 for item in self.work_items)
+        return self.totals['total_earned_quantity']
     
     @property
     def percent_complete(self):
         """Calculate overall percent complete for the project based on earned vs budgeted hours"""
-        if self.total_budgeted_hours == 0:
-            return 0
-        return (self.total_earned_hours / self.total_budgeted_hours) * 100
+        return self.totals['overall_progress']
 
 class SubJob(db.Model):
     __tablename__ = "sub_job"
@@ -84,6 +89,10 @@ class SubJob(db.Model):
     project_id = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False)
     work_items = db.relationship("WorkItem", backref="sub_job", lazy=True, cascade="all, delete-orphan")
     area = db.Column(db.String(100))
+    
+    __table_args__ = (
+        db.Index("ix_sub_job_project_id", "project_id"),
+    )
 
     def serialize(self):
         return {
@@ -106,32 +115,36 @@ class SubJob(db.Model):
             "work_items": [wi.serialize() for wi in self.work_items]
         }
     
+    @property
+    def totals(self):
+        """Get hours and quantity totals for this sub job from a SQL aggregate"""
+        from services.rollups import get_sub_job_totals
+        return get_sub_job_totals(self.id)
+    
     @property
     def total_budgeted_hours(self):
         """Calculate total budgeted hours for all work items in this sub job"""
-        return sum(item.budgeted_man_hours or 0 for item in self.work_items)
+        return self.totals['total_budgeted_hours']
     
     @property
     def total_earned_hours(self):
         """Calculate total earned hours for all work items in this sub job"""
-        return sum(item.earned_man_hours or 0 for item in self.work_items)
+        return self.totals['total_earned_hours']
     
     @property
     def total_budgeted_quantity(self):
         """Calculate total budgeted quantity for all work items in this sub job"""
-        return sum(item.budgeted_quantity or 0 for item in self.work_items)
+        return self.totals['total_budgeted_quantity']
     
     @property
     def total_earned_quantity(self):
         """Calculate total earned quantity for all work items in this sub job"""
-        return sum(item.earned_quantity or 0 for item in self.work_items)
+        return self.totals['total_earned_quantity']
     
     @property
     def percent_complete(self):
         """Calculate overall percent complete for the sub job based on earned vs budgeted hours"""
-        if self.total_budgeted_hours == 0:
-            return 0
-        return (self.total_earned_hours / self.total_budgeted_hours) * 100
+        return self.totals['overall_progress']
 
 class RuleOfCredit(db.Model):
     __tablename__ = "rule_of_credit"
@@ -175,6 +188,12 @@ class CostCode(db.Model):
     rule_of_credit_id = db.Column(db.Integer, db.ForeignKey("rule_of_credit.id"), nullable=True)
     work_items = db.relationship("WorkItem", backref="cost_code", lazy=True)
     
+    __table_args__ = (
+        db.Index("ix_cost_code_project_discipline", "project_id", "discipline"),
+        db.Index("ix_cost_code_discipline", "discipline"),
+        db.Index("ix_cost_code_rule_of_credit_id", "rule_of_credit_id"),
+    )
+    
     def serialize(self):
         return {
             "id": self.id,
@@ -196,41 +215,48 @@ class WorkItem(db.Model):
     budgeted_quantity = db.Column(db.Float)
     unit_of_measure = db.Column(db.String(20))
     budgeted_man_hours = db.Column(db.Float)
-    progress_json = db.Column(db.Text, default="[]") # JSON string of step name and its % completion
+    progress_json = db.Column(db.Text, default="[]") # Legacy JSON step progress, migrated to work_item_step_progress
     earned_man_hours = db.Column(db.Float, default=0.0)
     earned_quantity = db.Column(db.Float, default=0.0)
     percent_complete_hours = db.Column(db.Float, default=0.0)
     percent_complete_quantity = db.Column(db.Float, default=0.0)
     
+    step_progress = db.relationship("WorkItemStepProgress", backref="work_item", lazy=True, cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        db.Index("ix_work_item_project_id", "project_id"),
+        db.Index("ix_work_item_project_progress", "project_id", "percent_complete_hours"),
+        db.Index("ix_work_item_sub_job_id", "sub_job_id"),
+        db.Index("ix_work_item_cost_code_id", "cost_code_id"),
+        # Sort orders of the work item listing, unfiltered and per project or sub job
+        db.Index("ix_work_item_project_id_str", "project_id", "work_item_id_str"),
+        db.Index("ix_work_item_sub_job_id_str", "sub_job_id", "work_item_id_str"),
+        db.Index("ix_work_item_description", "description"),
+        db.Index("ix_work_item_project_description", "project_id", "description"),
+        db.Index("ix_work_item_sub_job_description", "sub_job_id", "description"),
+        db.Index("ix_work_item_progress", "percent_complete_hours"),
+        db.Index("ix_work_item_sub_job_progress", "sub_job_id", "percent_complete_hours"),
+        db.Index("ix_work_item_cost_code_project", "cost_code_id", "project_id"),
+        db.Index("ix_work_item_cost_code_sub_job", "cost_code_id", "sub_job_id"),
+    )
+    
     def get_steps_progress(self):
         """Return steps progress as a Python dictionary"""
-        try:
-            progress_data = {}
-            current_progress_data = json.loads(self.progress_json or "[]")
-            
-            if isinstance(current_progress_data, list):
-                for step_progress in current_progress_data:
-                    if isinstance(step_progress, dict):
-                        if "step_name" in step_progress and "current_complete_percentage" in step_progress:
-                            progress_data[step_progress["step_name"]] = float(step_progress["current_complete_percentage"])
-                        elif "name" in step_progress and "percentage" in step_progress:
-                            progress_data[step_progress["name"]] = float(step_progress["percentage"])
-            elif isinstance(current_progress_data, dict):
-                progress_data = current_progress_data
-            
-            return progress_data
-        except:
-            return {}
+        return {row.step_name: row.percentage for row in self.step_progress}
     
     def set_steps_progress(self, progress_dict):
         """Set steps progress from a dictionary"""
-        progress_list = []
+        existing_rows = {row.step_name: row for row in self.step_progress}
+        
         for step_name, percentage in progress_dict.items():
-            progress_list.append({
-                "step_name": step_name,
-                "current_complete_percentage": float(percentage)
-            })
-        self.progress_json = json.dumps(progress_list)
+            if step_name in existing_rows:
+                existing_rows.pop(step_name).percentage = float(percentage)
+            else:
+                self.step_progress.append(WorkItemStepProgress(step_name=step_name, percentage=float(percentage)))
+        
+        # Steps missing from the dictionary are removed, as with the old JSON list
+        for row in existing_rows.values():
+            self.step_progress.remove(row)
         
     def set_progress_data(self, progress_dict):
         """Alias for set_steps_progress for compatibility"""
@@ -239,124 +265,32 @@ class WorkItem(db.Model):
     def update_progress_step(self, step_name_to_update, completion_percentage):
         """Update progress for a specific step"""
         try:
-            progress_data = json.loads(self.progress_json or "[]")
-            
-            # Handle different progress_json formats
-            if isinstance(progress_data, list):
-                # Find and update the step if it exists
-                step_found = False
-                for step in progress_data:
-                    if isinstance(step, dict):
-                        if "step_name" in step and step["step_name"] == step_name_to_update:
-                            step["current_complete_percentage"] = float(completion_percentage)
-                            step_found = True
-                            break
-                        elif "name" in step and step["name"] == step_name_to_update:
-                            step["percentage"] = float(completion_percentage)
-                            step_found = True
-                            break
-                
-                # If step not found, add it
-                if not step_found:
-                    progress_data.append({
-                        "step_name": step_name_to_update,
-                        "current_complete_percentage": float(completion_percentage)
-                    })
-            elif isinstance(progress_data, dict):
-                # Legacy dictionary format
-                progress_data[step_name_to_update] = float(completion_percentage)
+            if self.id is None:
+                # Not saved yet, so there is no row to upsert
+                progress_data = self.get_steps_progress()
+                progress_data[step_name_to_update] = completion_percentage
+                self.set_steps_progress(progress_data)
             else:
-                # Initialize as new format
-                progress_data = [{
-                    "step_name": step_name_to_update,
-                    "current_complete_percentage": float(completion_percentage)
-                }]
+                from services.step_progress import upsert_step_progress
+                upsert_step_progress(self.id, step_name_to_update, completion_percentage)
+                db.session.expire(self, ["step_progress"])
             
-            self.progress_json = json.dumps(progress_data)
             self.calculate_earned_values()
         except Exception as e:
             print(f"Error updating progress step: {e}")
     
     def calculate_earned_values(self):
         """Calculate earned values based on rule of credit steps and their weights"""
+        from services.rule_cache import get_compiled_rule_for_cost_code
+        from services.earned_value import compute_earned_values
         try:
-            # Get the cost code and rule of credit
-            cost_code = CostCode.query.get(self.cost_code_id)
-            if not cost_code or not cost_code.rule_of_credit_id:
-                self.earned_man_hours = 0
-                self.percent_complete_hours = 0
-                self.earned_quantity = 0
-                self.percent_complete_quantity = 0
-                return
+            # Get the compiled rule of credit for the cost code (cached per process)
+            rule = get_compiled_rule_for_cost_code(self.cost_code_id)
+            progress_data = self.get_steps_progress() if rule else {}
             
-            rule = RuleOfCredit.query.get(cost_code.rule_of_credit_id)
-            if not rule:
-                self.earned_man_hours = 0
-                self.percent_complete_hours = 0
-                self.earned_quantity = 0
-                self.percent_complete_quantity = 0
-                return
-
-            # Parse rule steps
-            parsed_rule_steps = []
-            try:
-                rule_data = json.loads(rule.steps_json)
-                if isinstance(rule_data, dict) and "steps" in rule_data and isinstance(rule_data["steps"], list):
-                    steps_list_from_json = rule_data["steps"]
-                    for step_entry in steps_list_from_json:
-                        if isinstance(step_entry, dict) and "name" in step_entry and "weight" in step_entry:
-                            parsed_rule_steps.append({
-                                "name": str(step_entry["name"]),
-                                "weight": float(step_entry["weight"])
-                            })
-                elif isinstance(rule_data, list):  # Legacy format support
-                    for step_entry in rule_data:
-                        if isinstance(step_entry, dict) and "weight" in step_entry:
-                            step_name_val = None
-                            if "name" in step_entry:  # Legacy might have 'name'
-                                step_name_val = str(step_entry["name"])
-                            elif "step_name" in step_entry:  # Or 'step_name'
-                                step_name_val = str(step_entry["step_name"])
-                            
-                            if step_name_val:
-                                parsed_rule_steps.append({
-                                    "name": step_name_val,
-                                    "weight": float(step_entry["weight"])
-                                })
-            except json.JSONDecodeError:
-                pass
-            except Exception:
-                pass
-
-            # Get progress data
-            progress_data = self.get_steps_progress()
-
-            # Calculate weighted percentage
-            total_weighted_percentage = 0
-            for step_def in parsed_rule_steps:
-                step_name_key = step_def.get("name")
-                if not step_name_key:
-                    continue
-                
-                step_weight = float(step_def.get("weight", 0.0))
-                step_completion = float(progress_data.get(step_name_key, 0.0))
-                
-                total_weighted_percentage += (step_completion / 100.0) * step_weight
-
-            # Calculate earned values
-            if self.budgeted_man_hours and self.budgeted_man_hours > 0:
-                self.earned_man_hours = (total_weighted_percentage / 100.0) * self.budgeted_man_hours
-                self.percent_complete_hours = (self.earned_man_hours / self.budgeted_man_hours) * 100 if self.budgeted_man_hours != 0 else 0
-            else:
-                self.earned_man_hours = 0
-                self.percent_complete_hours = 0
-
-            if self.budgeted_quantity and self.budgeted_quantity > 0:
-                self.earned_quantity = (total_weighted_percentage / 100.0) * self.budgeted_quantity
-                self.percent_complete_quantity = (self.earned_quantity / self.budgeted_quantity) * 100 if self.budgeted_quantity != 0 else 0
-            else:
-                self.earned_quantity = 0
-                self.percent_complete_quantity = 0
+            values = compute_earned_values(rule, progress_data, self.budgeted_man_hours, self.budgeted_quantity)
+            for column, value in values.items():
+                setattr(self, column, value)
         except Exception as e:
             print(f"Error calculating earned values: {e}")
             self.earned_man_hours = 0
@@ -380,3 +314,191 @@ class WorkItem(db.Model):
             "percent_complete_hours": self.percent_complete_hours,
             "percent_complete_quantity": self.percent_complete_quantity
         }
+
+class RollupTotal(db.Model):
+    """Materialized hours and quantity totals for a project, sub job, cost code or discipline"""
+    __tablename__ = "rollup_total"
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(20), nullable=False)  # project, sub_job, cost_code or discipline
+    project_id = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False)
+    group_key = db.Column(db.String(100), nullable=False)  # Sub job/cost code ID or discipline name
+    item_count = db.Column(db.Integer, default=0, nullable=False)
+    budgeted_man_hours = db.Column(db.Float, default=0.0, nullable=False)
+    earned_man_hours = db.Column(db.Float, default=0.0, nullable=False)
+    budgeted_quantity = db.Column(db.Float, default=0.0, nullable=False)
+    earned_quantity = db.Column(db.Float, default=0.0, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint("scope", "project_id", "group_key", name="uq_rollup_total_group"),
+    )
+    
+    def serialize(self):
+        return {
+            "scope": self.scope,
+            "project_id": self.project_id,
+            "group_key": self.group_key,
+            "item_count": self.item_count,
+            "budgeted_man_hours": self.budgeted_man_hours,
+            "earned_man_hours": self.earned_man_hours,
+            "budgeted_quantity": self.budgeted_quantity,
+            "earned_quantity": self.earned_quantity
+        }
+
+class WorkItemStepProgress(db.Model):
+    """Completion percentage of one rule of credit step for one work item"""
+    __tablename__ = "work_item_step_progress"
+    id = db.Column(db.Integer, primary_key=True)
+    work_item_id = db.Column(db.Integer, db.ForeignKey("work_item.id"), nullable=False)
+    step_name = db.Column(db.String(100), nullable=False)
+    percentage = db.Column(db.Float, default=0.0, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint("work_item_id", "step_name", name="uq_step_progress_item_step"),
+        db.Index("ix_step_progress_step_percentage", "step_name", "percentage"),
+    )
+    
+    def serialize(self):
+        return {
+            "work_item_id": self.work_item_id,
+            "step_name": self.step_name,
+            "percentage": self.percentage
+        }
+
+class CacheVersion(db.Model):
+    """Version counter shared by all workers to invalidate process-local caches"""
+    __tablename__ = "cache_version"
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+
+class SchemaMigration(db.Model):
+    """A schema migration applied to this database (see services.migrations)"""
+    __tablename__ = "schema_migration"
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+class ProgressEvent(db.Model):
+    """Append-only change of a work item's budgeted and earned values (history for trend reports)"""
+    __tablename__ = "progress_event"
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign keys: history is kept after work items, sub jobs and projects are deleted
+    work_item_id = db.Column(db.Integer)
+    project_id = db.Column(db.Integer, nullable=False)
+    sub_job_id = db.Column(db.Integer, nullable=False)
+    recorded_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, nullable=False)
+    # Changes, not totals: +1/-1 items when a work item is added/removed from the sub job
+    item_count = db.Column(db.Integer, default=0, nullable=False)
+    budgeted_man_hours = db.Column(db.Float, default=0.0, nullable=False)
+    earned_man_hours = db.Column(db.Float, default=0.0, nullable=False)
+    budgeted_quantity = db.Column(db.Float, default=0.0, nullable=False)
+    earned_quantity = db.Column(db.Float, default=0.0, nullable=False)
+    
+    __table_args__ = (
+        db.Index("ix_progress_event_project_recorded", "project_id", "recorded_at"),
+    )
+
+class ProgressSnapshot(db.Model):
+    """Totals of a project or sub job at the end of a week, compacted from progress events"""
+    __tablename__ = "progress_snapshot"
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(20), nullable=False)  # project or sub_job
+    project_id = db.Column(db.Integer, nullable=False)
+    group_key = db.Column(db.String(100), nullable=False)  # Project or sub job ID, as in rollup_total
+    period_start = db.Column(db.Date, nullable=False)  # Monday of the week
+    item_count = db.Column(db.Integer, default=0, nullable=False)
+    budgeted_man_hours = db.Column(db.Float, default=0.0, nullable=False)
+    earned_man_hours = db.Column(db.Float, default=0.0, nullable=False)
+    budgeted_quantity = db.Column(db.Float, default=0.0, nullable=False)
+    earned_quantity = db.Column(db.Float, default=0.0, nullable=False)
+    earned_man_hours_period = db.Column(db.Float, default=0.0, nullable=False)  # Earned during the week
+    earned_quantity_period = db.Column(db.Float, default=0.0, nullable=False)
+    compacted_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint("scope", "project_id", "group_key", "period_start", name="uq_progress_snapshot_period"),
+        db.Index("ix_progress_snapshot_project_period", "project_id", "period_start"),
+    )
+    
+    def serialize(self):
+        return {
+            "period_start": self.period_start.isoformat(),
+            "item_count": self.item_count,
+            "budgeted_man_hours": self.budgeted_man_hours,
+            "earned_man_hours": self.earned_man_hours,
+            "budgeted_quantity": self.budgeted_quantity,
+            "earned_quantity": self.earned_quantity,
+            "earned_man_hours_period": self.earned_man_hours_period,
+            "earned_quantity_period": self.earned_quantity_period
+        }
+
+class ProgressBatch(db.Model):
+    """A bulk progress update that was applied, kept so a retried batch is not applied twice"""
+    __tablename__ = "progress_batch"
+    batch_id = db.Column(db.String(100), primary_key=True)  # Chosen by the client
+    payload_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the updates
+    item_count = db.Column(db.Integer, nullable=False)
+    result_json = db.Column(db.Text, nullable=False)  # Response returned for the batch
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, nullable=False, index=True)
+    
+    def get_result(self):
+        """Return the stored response as a dictionary"""
+        return json.loads(self.result_json)
+
+class ReportJob(db.Model):
+    """A report generated in the background report worker pool"""
+    __tablename__ = "report_job"
+    id = db.Column(db.String(32), primary_key=True)
+    report_type = db.Column(db.String(20), nullable=False)  # quantities, hours or both
+    project_id = db.Column(db.Integer, db.ForeignKey("project.id"), nullable=False)
+    sub_job_id = db.Column(db.Integer, db.ForeignKey("sub_job.id"), nullable=True)
+    status = db.Column(db.String(20), default="queued", nullable=False)  # queued, running, completed, failed
+    download_name = db.Column(db.String(255), nullable=False)
+    cache_key = db.Column(db.String(64), index=True)  # Report cache key (content address)
+    file_path = db.Column(db.String(500))
+    size_bytes = db.Column(db.Integer)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def serialize(self):
+        return {
+            "id": self.id,
+            "report_type": self.report_type,
+            "project_id": self.project_id,
+            "sub_job_id": self.sub_job_id,
+            "status": self.status,
+            "download_name": self.download_name,
+            "cache_key": self.cache_key,
+            "size_bytes": self.size_bytes,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class RecalculationJob(db.Model):
+    """A background earned value recalculation; stored so every web worker can report its progress"""
+    __tablename__ = "recalculation_job"
+    id = db.Column(db.String(32), primary_key=True)
+    description = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), default="running", nullable=False)  # running, completed, failed
+    done = db.Column(db.Integer, default=0, nullable=False)  # Work items recalculated so far
+    total = db.Column(db.Integer)
+    elapsed_seconds = db.Column(db.Float, default=0.0, nullable=False)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    
+    def serialize(self):
+        return {
+            "job_id": self.id,
+            "description": self.description,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "elapsed_seconds": self.elapsed_seconds,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,215 @@
+import csv
+import io
+import json
+from sqlalchemy import select, cast, Integer
+from models import db, SubJob, CostCode, WorkItem, WorkItemStepProgress, RollupTotal
+
+# Rows fetched from the database cursor at a time
+EXPORT_BATCH_SIZE = 1000
+
+# Bytes of CSV/NDJSON collected before a chunk is sent to the client
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+WORK_ITEM_EXPORT_COLUMNS = (
+    'id', 'work_item_id_str', 'description', 'project_id_str', 'sub_job_id_str', 'cost_code_id_str',
+    'discipline', 'unit_of_measure', 'budgeted_quantity', 'earned_quantity', 'percent_complete_quantity',
+    'budgeted_man_hours', 'earned_man_hours', 'percent_complete_hours', 'step_progress'
+)
+
+ROLLUP_EXPORT_COLUMNS = {
+    'cost_codes': (
+        'project_id_str', 'cost_code_id_str', 'cost_code_description', 'discipline', 'item_count',
+        'budgeted_quantity', 'earned_quantity', 'budgeted_man_hours', 'earned_man_hours', 'percent_complete_hours'
+    ),
+    'disciplines': (
+        'project_id_str', 'discipline', 'item_count',
+        'budgeted_quantity', 'earned_quantity', 'budgeted_man_hours', 'earned_man_hours', 'percent_complete_hours'
+    )
+}
+
+
+def _streaming_connection():
+    # Server-side cursor on PostgreSQL; batched fetches from SQLite
+    return db.session.connection().execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+
+
+# ===== RECORDS =====
+
+def iter_work_item_records(project, sub_job=None):
+    """
+    Yield one dictionary per work item of a project (or sub job), with its step progress
+
+    Work items and step progress come from two streaming cursors ordered by
+    work item ID and are merged as they are read, so memory use does not
+    depend on the number of work items.
+
+    Args:
+        project (Project): Project to export
+        sub_job (SubJob): Only export the work items of this sub job
+    """
+    criteria = [WorkItem.project_id == project.id]
+    if sub_job is not None:
+        criteria.append(WorkItem.sub_job_id == sub_job.id)
+    connection = _streaming_connection()
+
+    rows = connection.execute(
+        select(
+            WorkItem.id,
+            WorkItem.work_item_id_str,
+            WorkItem.description,
+            SubJob.sub_job_id_str,
+            CostCode.cost_code_id_str,
+            CostCode.discipline,
+            WorkItem.unit_of_measure,
+            WorkItem.budgeted_quantity,
+            WorkItem.earned_quantity,
+            WorkItem.percent_complete_quantity,
+            WorkItem.budgeted_man_hours,
+            WorkItem.earned_man_hours,
+            WorkItem.percent_complete_hours
+        ).join(SubJob, WorkItem.sub_job_id == SubJob.id)
+        .join(CostCode, WorkItem.cost_code_id == CostCode.id)
+        .where(*criteria)
+        .order_by(WorkItem.id)
+    )
+
+    progress_rows = iter(connection.execute(
+        select(
+            WorkItemStepProgress.work_item_id,
+            WorkItemStepProgress.step_name,
+            WorkItemStepProgress.percentage
+        ).join(WorkItem, WorkItemStepProgress.work_item_id == WorkItem.id)
+        .where(*criteria)
+        .order_by(WorkItemStepProgress.work_item_id, WorkItemStepProgress.id)
+    ))
+
+    # Rows are read as plain tuples; named attribute access costs more than the rest of the loop
+    keys = list(rows.keys())
+    pending = next(progress_rows, None)
+    for row in rows:
+        work_item_id = row[0]
+        step_progress = {}
+        while pending is not None and pending[0] < work_item_id:
+            pending = next(progress_rows, None)
+        while pending is not None and pending[0] == work_item_id:
+            step_progress[pending[1]] = pending[2]
+            pending = next(progress_rows, None)
+
+        record = dict(zip(keys, row))
+        record['project_id_str'] = project.project_id_str
+        record['step_progress'] = step_progress
+        yield record
+
+
+def iter_rollup_records(project, scope):
+    """
+    Yield the cost code or discipline rollups of a project, one dictionary per group
+
+    Args:
+        project (Project): Project to export
+        scope (str): 'cost_codes' or 'disciplines'
+    """
+    columns = [
+        RollupTotal.item_count,
+        RollupTotal.budgeted_quantity,
+        RollupTotal.earned_quantity,
+        RollupTotal.budgeted_man_hours,
+        RollupTotal.earned_man_hours
+    ]
+    if scope == 'cost_codes':
+        statement = select(
+            CostCode.cost_code_id_str,
+            CostCode.description.label('cost_code_description'),
+            CostCode.discipline,
+            *columns
+        ).join(CostCode, CostCode.id == cast(RollupTotal.group_key, Integer)) \
+            .where(RollupTotal.scope == 'cost_code', RollupTotal.project_id == project.id) \
+            .order_by(CostCode.cost_code_id_str)
+    elif scope == 'disciplines':
+        statement = select(RollupTotal.group_key.label('discipline'), *columns) \
+            .where(RollupTotal.scope == 'discipline', RollupTotal.project_id == project.id) \
+            .order_by(RollupTotal.group_key)
+    else:
+        raise ValueError(f"Unknown rollup export: {scope}")
+
+    rows = _streaming_connection().execute(statement)
+    keys = list(rows.keys())
+    for row in rows:
+        record = dict(zip(keys, row))
+        record['project_id_str'] = project.project_id_str
+        budgeted_hours = record['budgeted_man_hours'] or 0
+        record['percent_complete_hours'] = (record['earned_man_hours'] / budgeted_hours) * 100 if budgeted_hours > 0 else 0
+        yield record
+
+
+# ===== ENCODING =====
+
+def _chunked(lines):
+    """Join encoded lines into chunks of about EXPORT_CHUNK_BYTES"""
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _csv_lines(columns, records):
+    output = io.StringIO()
+    writer = csv.writer(output)
+
+    def line(values):
+        output.seek(0)
+        output.truncate()
+        writer.writerow(values)
+        return output.getvalue()
+
+    yield line(columns)
+    for record in records:
+        values = [record[column] for column in columns]
+        yield line([json.dumps(value) if isinstance(value, dict) else value for value in values])
+
+
+def _ndjson_lines(columns, records):
+    for record in records:
+        yield json.dumps({column: record[column] for column in columns}) + '\n'
+
+
+def encode_records(export_format, columns, records):
+    """
+    Encode records as CSV or NDJSON text chunks, for a streaming response
+
+    In CSV, dictionary values (step progress) are written as JSON objects.
+
+    Args:
+        export_format (str): 'csv' or 'ndjson'
+        columns (tuple): Columns to write, in order
+        records (iterable): Dictionaries with at least those columns
+    """
+    if export_format == 'csv':
+        return _chunked(_csv_lines(columns, records))
+    if export_format == 'ndjson':
+        return _chunked(_ndjson_lines(columns, records))
+    raise ValueError(f"Unknown export format: {export_format}")
+
+
+def export_work_items(export_format, project, sub_job=None):
+    """Text chunks of the work item export of a project or sub job"""
+    return encode_records(export_format, WORK_ITEM_EXPORT_COLUMNS, iter_work_item_records(project, sub_job))
+
+
+def export_rollups(export_format, project, scope):
+    """Text chunks of the cost code or discipline rollup export of a project"""
+    if scope not in ROLLUP_EXPORT_COLUMNS:
+        raise ValueError(f"Unknown rollup export: {scope}")
+    return encode_records(export_format, ROLLUP_EXPORT_COLUMNS[scope], iter_rollup_records(project, scope))
@@ -1,261 +1,85 @@
 import os
 import io
 import datetime
+import threading
+import zipfile
 from fpdf import FPDF
 
-class QuantitiesPDF(FPDF):
-    def __init__(self):
-        # Initialize with landscape orientation ('L')
-        super().__init__(orientation='L')
-        
-    def header(self):
-        # Logo - Use Fortis logo instead of Magellan
-        logo_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'images', 'Fortis.png')
-        if os.path.exists(logo_path):
-            # Adjust logo position for landscape orientation
-            self.image(logo_path, 10, 8, 40)
-        
-        # Set up header section with 3 rows as specified
-        # Top row: "Quantity Report"
-        self.set_font('Arial', 'B', 16)
-        self.set_xy(120, 8)
-        self.cell(60, 8, 'Quantity Report', 0, 1, 'C')
-        
-        # Middle row: "Progress Detail"
-        self.set_xy(120, 16)
-        self.cell(60, 8, 'Progress Detail', 0, 1, 'C')
-        
-        # Bottom row: Project name (without project ID)
-        if hasattr(self, 'project_name'):
-            self.set_font('Arial', '', 12)
-            self.set_xy(120, 24)
-            self.cell(60, 8, self.project_name, 0, 1, 'C')
-        
-        # Page info on the right
-        self.set_font('Arial', '', 9)
-        self.set_xy(250, 8)
-        self.cell(30, 5, f'Page: {self.page_no()}', 0, 1, 'R')
-        
-        # Progress info
-        if hasattr(self, 'overall_progress'):
-            self.set_xy(250, 13)
-            self.cell(30, 5, f'Progress: {self.overall_progress:.1f}%', 0, 1, 'R')
-        
-        # Date info
-        self.set_xy(250, 18)
-        self.cell(30, 5, f'Date: {datetime.datetime.now().strftime("%Y-%m-%d")}', 0, 1, 'R')
-        
-        # Line break after header
-        self.ln(25)
-        self.line(10, 35, 287, 35)
-        
-        # Add sub job information if available
-        if hasattr(self, 'sub_job_name') and hasattr(self, 'sub_job_description'):
-            self.set_font('Arial', 'B', 10)
-            self.set_xy(10, 38)
-            self.cell(100, 5, f'Sub Job: {self.sub_job_name}', 0, 0, 'L')
-            
-            if self.sub_job_description:
-                self.set_xy(120, 38)
-                self.cell(167, 5, f'Description: {self.sub_job_description}', 0, 0, 'L')
-            
-            self.ln(8)
-        else:
-            self.ln(5)
+# Fortis logo printed in the header of every page
+LOGO_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'images', 'Fortis.png')
 
-    def footer(self):
-        # Position at 1.5 cm from bottom
-        self.set_y(-15)
-        # Arial italic 8
-        self.set_font('Arial', 'I', 8)
-        # Page number
-        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+# Core font used by the reports ('Arial' is an alias that fpdf2 substitutes on every call)
+REPORT_FONT = 'helvetica'
 
-    def chapter_title(self, title):
-        # Arial 12
-        self.set_font('Arial', 'B', 12)
-        # Background color
-        self.set_fill_color(200, 200, 200)
-        # Title
-        self.cell(0, 6, title, 0, 1, 'L', 1)
-        # Line break
-        self.ln(4)
+# Adjust column widths for landscape orientation
+COL_WIDTHS = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
 
-    def table_header(self):
-        # Colors, line width and bold font
-        self.set_fill_color(240, 240, 240)
-        self.set_text_color(0, 0, 0)
-        self.set_font('Arial', 'B', 9)
-        self.set_line_width(0.3)
-        
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
-        
-        # Calculate total table width
-        self.table_width = sum(col_widths)
-        
-        # Header row 1
-        self.cell(col_widths[0], 7, 'Work Item', 1, 0, 'C', 1)
-        self.cell(col_widths[1], 7, 'Description', 1, 0, 'C', 1)
-        self.cell(col_widths[2], 7, 'UOM', 1, 0, 'C', 1)
-        
-        # Use multi-line cells for header text that needs wrapping
-        current_x = self.get_x()
-        current_y = self.get_y()
-        self.multi_cell(col_widths[3], 3.5, 'Budgeted Quantity', 1, 'C', 1)
-        self.set_xy(current_x + col_widths[3], current_y)
-        
-        current_x = self.get_x()
-        current_y = self.get_y()
-        self.multi_cell(col_widths[4], 3.5, 'Earned Quantity', 1, 'C', 1)
-        self.set_xy(current_x + col_widths[4], current_y)
-        
-        self.cell(col_widths[5], 7, '% Complete', 1, 0, 'C', 1)
-        
-        # Rules of Credit header (spans 7 columns)
-        rules_width = sum(col_widths[6:])
-        self.cell(rules_width, 7, 'Rules of Credit', 1, 1, 'C', 1)
-        
-        # No space between header and table content
-        self.set_xy(10, self.get_y())
+# Title, table header labels, work item columns and rollup totals of each report measure
+REPORT_MEASURES = {
+    'quantities': {
+        'title': 'Quantity Report',
+        'budget_label': 'Budgeted Quantity',
+        'earned_label': 'Earned Quantity',
+        'budget_column': 'budgeted_quantity',
+        'earned_column': 'earned_quantity',
+        'budget_total_key': 'total_budgeted_quantity',
+        'earned_total_key': 'total_earned_quantity'
+    },
+    'hours': {
+        'title': 'Hours Report',
+        'budget_label': 'Budgeted Hours',
+        'earned_label': 'Earned Hours',
+        'budget_column': 'budgeted_man_hours',
+        'earned_column': 'earned_man_hours',
+        'budget_total_key': 'total_budgeted_hours',
+        'earned_total_key': 'total_earned_hours'
+    }
+}
 
-    def discipline_row(self, discipline):
-        # Set font
-        self.set_font('Arial', 'B', 9)
-        # Background color
-        self.set_fill_color(220, 220, 220)
-        # Discipline row - use exact table width to prevent overhang
-        self.cell(self.table_width, 6, discipline, 1, 1, 'L', 1)
-
-    def cost_code_row(self, cost_code, steps):
-        # Set font
-        self.set_font('Arial', '', 9)
-        # Background color
-        self.set_fill_color(240, 240, 240)
-        
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
-        cost_code_text = f"{cost_code.cost_code_id_str} - {cost_code.description}"
-        
-        # Cost code cell (spans first 6 columns)
-        cost_code_width = sum(col_widths[:6])
-        self.cell(cost_code_width, 6, cost_code_text, 1, 0, 'L', 1)
-        
-        # Rules of Credit step names
-        self.set_font('Arial', '', 7)
-        steps_list = cost_code.rule_of_credit.get_steps() if cost_code.rule_of_credit else []
-        
-        # Add up to 7 step names
-        for i in range(7):
-            if i < len(steps_list):
-                self.cell(col_widths[i+6], 6, steps_list[i]['name'], 1, 0, 'C', 1)
-            else:
-                self.cell(col_widths[i+6], 6, '', 1, 0, 'C', 1)
-        
-        self.ln()
+_logo_bytes = None
+_logo_loaded = False
+_logo_lock = threading.Lock()
 
-    def work_item_row(self, item):
-        # Set font
-        self.set_font('Arial', '', 9)
-        
-        # Calculate progress
-        progress = 0
-        if item.budgeted_quantity and item.budgeted_quantity > 0:
-            progress = (item.earned_quantity or 0) / item.budgeted_quantity * 100
-        
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
-        
-        # Handle text wrapping for description - ensure no text bleeds over cell lines
-        description = item.description
-        if len(description) > 50:  # Increased character limit for landscape
-            # Calculate how many lines we need
-            lines = len(description) // 50 + (1 if len(description) % 50 > 0 else 0)
-            row_height = 6 * lines  # Adjust row height based on number of lines
-        else:
-            row_height = 6
-        
-        # Work item cells
-        self.cell(col_widths[0], row_height, str(item.work_item_id_str), 1, 0, 'L')
-        
-        # Multi-line cell for description
-        current_x = self.get_x()
-        current_y = self.get_y()
-        self.multi_cell(col_widths[1], row_height / (1 if len(description) <= 50 else lines), description, 1, 'L')
-        self.set_xy(current_x + col_widths[1], current_y)
-        
-        self.cell(col_widths[2], row_height, item.unit_of_measure or '', 1, 0, 'C')
-        self.cell(col_widths[3], row_height, f"{item.budgeted_quantity or 0:.2f}", 1, 0, 'R')
-        self.cell(col_widths[4], row_height, f"{item.earned_quantity or 0:.2f}", 1, 0, 'R')
-        self.cell(col_widths[5], row_height, f"{progress:.1f}%", 1, 0, 'R')
-        
-        # Rules of Credit progress steps
-        self.set_font('Arial', '', 7)
-        progress_data = item.get_steps_progress()
-        
-        # Get the rule of credit steps
-        steps = []
-        if item.cost_code and item.cost_code.rule_of_credit:
-            steps = item.cost_code.rule_of_credit.get_steps()
-        
-        for i in range(7):
-            if i < len(steps):
-                step_name = steps[i]['name']
-                progress_value = progress_data.get(step_name, 0)
-                self.cell(col_widths[i+6], row_height, f"{progress_value:.0f}%", 1, 0, 'C')
-            else:
-                self.cell(col_widths[i+6], row_height, '', 1, 0, 'C')
-        
-        self.ln()
 
-    def total_row(self, title, budgeted, earned, is_grand_total=False):
-        # Set font
-        self.set_font('Arial', 'B', 9)
-        # Background color
-        if is_grand_total:
-            self.set_fill_color(200, 200, 200)
-        else:
-            self.set_fill_color(240, 240, 240)
-        
-        # Calculate progress
-        progress = 0
-        if budgeted > 0:
-            progress = (earned / budgeted) * 100
-        
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
-        
-        # Title spans first 3 columns
-        title_width = sum(col_widths[:3])
-        self.cell(title_width, 6, title, 1, 0, 'L', 1)
-        
-        # Values
-        self.cell(col_widths[3], 6, f"{budgeted:.2f}", 1, 0, 'R', 1)
-        self.cell(col_widths[4], 6, f"{earned:.2f}", 1, 0, 'R', 1)
-        self.cell(col_widths[5], 6, f"{progress:.1f}%", 1, 0, 'R', 1)
-        
-        # Empty cells for Rules of Credit - use exact width to prevent overhang
-        rules_width = sum(col_widths[6:])
-        self.cell(rules_width, 6, '', 1, 1, 'C', 1)
+def _load_logo_bytes():
+    """Read the logo file once per process; None if the file is missing"""
+    global _logo_bytes, _logo_loaded
+    with _logo_lock:
+        if not _logo_loaded:
+            if os.path.exists(LOGO_PATH):
+                with open(LOGO_PATH, 'rb') as logo_file:
+                    _logo_bytes = logo_file.read()
+            _logo_loaded = True
+        return _logo_bytes
 
 
-class HoursPDF(FPDF):
-    def __init__(self):
+class ProgressReportPDF(FPDF):
+    """
+    Progress detail report of one measure (quantities or hours)
+    
+    Args:
+        measure (str): Key of REPORT_MEASURES
+    """
+    
+    def __init__(self, measure):
         # Initialize with landscape orientation ('L')
         super().__init__(orientation='L')
+        self.measure = REPORT_MEASURES[measure]
+        # fpdf2 keys images given as bytes by content, so the logo is decoded
+        # on the first page and reused by the following ones
+        self.logo = _load_logo_bytes()
         
     def header(self):
         # Logo - Use Fortis logo instead of Magellan
-        logo_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'images', 'Fortis.png')
-        if os.path.exists(logo_path):
+        if self.logo:
             # Adjust logo position for landscape orientation
-            self.image(logo_path, 10, 8, 40)
+            self.image(self.logo, 10, 8, 40)
         
         # Set up header section with 3 rows as specified
-        # Top row: "Hours Report"
-        self.set_font('Arial', 'B', 16)
+        # Top row: report title
+        self.set_font(REPORT_FONT, 'B', 16)
         self.set_xy(120, 8)
-        self.cell(60, 8, 'Hours Report', 0, 1, 'C')
+        self.cell(60, 8, self.measure['title'], 0, 1, 'C')
         
         # Middle row: "Progress Detail"
         self.set_xy(120, 16)
@@ -263,12 +87,12 @@ class HoursPDF(FPDF):
         
         # Bottom row: Project name (without project ID)
         if hasattr(self, 'project_name'):
-            self.set_font('Arial', '', 12)
+            self.set_font(REPORT_FONT, '', 12)
             self.set_xy(120, 24)
             self.cell(60, 8, self.project_name, 0, 1, 'C')
         
         # Page info on the right
-        self.set_font('Arial', '', 9)
+        self.set_font(REPORT_FONT, '', 9)
         self.set_xy(250, 8)
         self.cell(30, 5, f'Page: {self.page_no()}', 0, 1, 'R')
         
@@ -287,7 +111,7 @@ class HoursPDF(FPDF):
         
         # Add sub job information if available
         if hasattr(self, 'sub_job_name') and hasattr(self, 'sub_job_description'):
-            self.set_font('Arial', 'B', 10)
+            self.set_font(REPORT_FONT, 'B', 10)
             self.set_xy(10, 38)
             self.cell(100, 5, f'Sub Job: {self.sub_job_name}', 0, 0, 'L')
             
@@ -302,14 +126,14 @@ class HoursPDF(FPDF):
     def footer(self):
         # Position at 1.5 cm from bottom
         self.set_y(-15)
-        # Arial italic 8
-        self.set_font('Arial', 'I', 8)
+        # Italic 8
+        self.set_font(REPORT_FONT, 'I', 8)
         # Page number
         self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
 
     def chapter_title(self, title):
-        # Arial 12
-        self.set_font('Arial', 'B', 12)
+        # Bold 12
+        self.set_font(REPORT_FONT, 'B', 12)
         # Background color
         self.set_fill_color(200, 200, 200)
         # Title
@@ -321,11 +145,10 @@ class HoursPDF(FPDF):
         # Colors, line width and bold font
         self.set_fill_color(240, 240, 240)
         self.set_text_color(0, 0, 0)
-        self.set_font('Arial', 'B', 9)
+        self.set_font(REPORT_FONT, 'B', 9)
         self.set_line_width(0.3)
         
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
+        col_widths = COL_WIDTHS
         
         # Calculate total table width
         self.table_width = sum(col_widths)
@@ -338,12 +161,12 @@ class HoursPDF(FPDF):
         # Use multi-line cells for header text that needs wrapping
         current_x = self.get_x()
         current_y = self.get_y()
-        self.multi_cell(col_widths[3], 3.5, 'Budgeted Hours', 1, 'C', 1)
+        self.multi_cell(col_widths[3], 3.5, self.measure['budget_label'], 1, 'C', 1)
         self.set_xy(current_x + col_widths[3], current_y)
         
         current_x = self.get_x()
         current_y = self.get_y()
-        self.multi_cell(col_widths[4], 3.5, 'Earned Hours', 1, 'C', 1)
+        self.multi_cell(col_widths[4], 3.5, self.measure['earned_label'], 1, 'C', 1)
         self.set_xy(current_x + col_widths[4], current_y)
         
         self.cell(col_widths[5], 7, '% Complete', 1, 0, 'C', 1)
@@ -357,7 +180,7 @@ class HoursPDF(FPDF):
 
     def discipline_row(self, discipline):
         # Set font
-        self.set_font('Arial', 'B', 9)
+        self.set_font(REPORT_FONT, 'B', 9)
         # Background color
         self.set_fill_color(220, 220, 220)
         # Discipline row - use exact table width to prevent overhang
@@ -365,12 +188,11 @@ class HoursPDF(FPDF):
 
     def cost_code_row(self, cost_code, steps):
         # Set font
-        self.set_font('Arial', '', 9)
+        self.set_font(REPORT_FONT, '', 9)
         # Background color
         self.set_fill_color(240, 240, 240)
         
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
+        col_widths = COL_WIDTHS
         cost_code_text = f"{cost_code.cost_code_id_str} - {cost_code.description}"
         
         # Cost code cell (spans first 6 columns)
@@ -378,29 +200,30 @@ class HoursPDF(FPDF):
         self.cell(cost_code_width, 6, cost_code_text, 1, 0, 'L', 1)
         
         # Rules of Credit step names
-        self.set_font('Arial', '', 7)
-        steps_list = cost_code.rule_of_credit.get_steps() if cost_code.rule_of_credit else []
+        self.set_font(REPORT_FONT, '', 7)
         
         # Add up to 7 step names
         for i in range(7):
-            if i < len(steps_list):
-                self.cell(col_widths[i+6], 6, steps_list[i]['name'], 1, 0, 'C', 1)
+            if i < len(steps):
+                self.cell(col_widths[i+6], 6, steps[i], 1, 0, 'C', 1)
             else:
                 self.cell(col_widths[i+6], 6, '', 1, 0, 'C', 1)
         
         self.ln()
 
-    def work_item_row(self, item):
+    def work_item_row(self, item, steps, progress_data):
         # Set font
-        self.set_font('Arial', '', 9)
+        self.set_font(REPORT_FONT, '', 9)
+        
+        budgeted = getattr(item, self.measure['budget_column']) or 0
+        earned = getattr(item, self.measure['earned_column']) or 0
         
         # Calculate progress
         progress = 0
-        if item.budgeted_man_hours and item.budgeted_man_hours > 0:
-            progress = (item.earned_man_hours or 0) / item.budgeted_man_hours * 100
+        if budgeted > 0:
+            progress = earned / budgeted * 100
         
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
+        col_widths = COL_WIDTHS
         
         # Handle text wrapping for description - ensure no text bleeds over cell lines
         description = item.description
@@ -421,22 +244,16 @@ class HoursPDF(FPDF):
         self.set_xy(current_x + col_widths[1], current_y)
         
         self.cell(col_widths[2], row_height, item.unit_of_measure or '', 1, 0, 'C')
-        self.cell(col_widths[3], row_height, f"{item.budgeted_man_hours or 0:.2f}", 1, 0, 'R')
-        self.cell(col_widths[4], row_height, f"{item.earned_man_hours or 0:.2f}", 1, 0, 'R')
+        self.cell(col_widths[3], row_height, f"{budgeted:.2f}", 1, 0, 'R')
+        self.cell(col_widths[4], row_height, f"{earned:.2f}", 1, 0, 'R')
         self.cell(col_widths[5], row_height, f"{progress:.1f}%", 1, 0, 'R')
         
         # Rules of Credit progress steps
-        self.set_font('Arial', '', 7)
-        progress_data = item.get_steps_progress()
-        
-        # Get the rule of credit steps
-        steps = []
-        if item.cost_code and item.cost_code.rule_of_credit:
-            steps = item.cost_code.rule_of_credit.get_steps()
+        self.set_font(REPORT_FONT, '', 7)
         
         for i in range(7):
             if i < len(steps):
-                step_name = steps[i]['name']
+                step_name = steps[i]
                 progress_value = progress_data.get(step_name, 0)
                 self.cell(col_widths[i+6], row_height, f"{progress_value:.0f}%", 1, 0, 'C')
             else:
@@ -446,7 +263,7 @@ class HoursPDF(FPDF):
 
     def total_row(self, title, budgeted, earned, is_grand_total=False):
         # Set font
-        self.set_font('Arial', 'B', 9)
+        self.set_font(REPORT_FONT, 'B', 9)
         # Background color
         if is_grand_total:
             self.set_fill_color(200, 200, 200)
@@ -458,8 +275,7 @@ class HoursPDF(FPDF):
         if budgeted > 0:
             progress = (earned / budgeted) * 100
         
-        # Adjust column widths for landscape orientation
-        col_widths = [25, 60, 15, 25, 25, 20, 15, 15, 15, 15, 15, 15, 15]
+        col_widths = COL_WIDTHS
         
         # Title spans first 3 columns
         title_width = sum(col_widths[:3])
@@ -475,297 +291,302 @@ class HoursPDF(FPDF):
         self.cell(rules_width, 6, '', 1, 1, 'C', 1)
 
 
-def generate_quantities_report_pdf(project_id=None, sub_job_id=None):
+class QuantitiesPDF(ProgressReportPDF):
+    def __init__(self):
+        super().__init__('quantities')
+
+
+class HoursPDF(ProgressReportPDF):
+    def __init__(self):
+        super().__init__('hours')
+
+
+# Rows fetched per round trip by the report cursors
+STREAM_BATCH_SIZE = 500
+
+
+def _load_report_scope(project_id=None, sub_job_id=None):
     """
-    Generate a PDF report for quantities data using FPDF2
-    
-    Args:
-        project_id (int): Project ID to generate report for
-        sub_job_id (int): Sub Job ID to generate report for
-        
+    Resolve the project or sub job a report covers
+
     Returns:
-        bytes: PDF file data
+        tuple: (project, sub_job or None, work item filter criteria, rollup totals)
     """
-    from models import Project, SubJob, WorkItem, CostCode
+    from models import Project, SubJob, WorkItem
+    from services.rollups import get_project_totals, get_sub_job_totals
     
-    # Get data based on project_id or sub_job_id
     if sub_job_id:
         sub_job = SubJob.query.get_or_404(sub_job_id)
         project = Project.query.get_or_404(sub_job.project_id)
-        work_items = WorkItem.query.filter_by(sub_job_id=sub_job_id).all()
-        # Store project and sub job information separately
-        project_name = project.name
-        sub_job_name = sub_job.name
-        sub_job_description = sub_job.description
+        return project, sub_job, [WorkItem.sub_job_id == sub_job.id], get_sub_job_totals(sub_job.id)
     elif project_id:
         project = Project.query.get_or_404(project_id)
-        work_items = WorkItem.query.filter_by(project_id=project_id).all()
-        # Store project information
-        project_name = project.name
-        sub_job_name = None
-        sub_job_description = None
-    else:
-        raise ValueError("Either project_id or sub_job_id must be provided")
+        return project, None, [WorkItem.project_id == project.id], get_project_totals(project.id)
+    raise ValueError("Either project_id or sub_job_id must be provided")
+
+
+def stream_report_rows(criteria, batch_size=STREAM_BATCH_SIZE):
+    """
+    Yield work item rows in report order together with their step progress
     
-    # Group work items by discipline and cost code
-    grouped_items = {}
-    discipline_totals = {}
-    total_budgeted_quantity = 0
-    total_earned_quantity = 0
+    Work items with their cost code columns, and step progress, come from
+    two streaming cursors sorted in the same report order (discipline, cost
+    code, work item) and are merged as they are read. A report therefore
+    runs the same two queries whatever the number of work items, and
+    memory use does not grow with the size of the project.
     
-    for item in work_items:
-        if not item.cost_code:
-            continue
-            
-        discipline = item.cost_code.discipline
-        cost_code_id = item.cost_code_id
-        
-        # Initialize discipline if not exists
-        if discipline not in grouped_items:
-            grouped_items[discipline] = {}
-            discipline_totals[discipline] = {
-                'total_budgeted_quantity': 0,
-                'total_earned_quantity': 0
-            }
-        
-        # Initialize cost code if not exists
-        if cost_code_id not in grouped_items[discipline]:
-            grouped_items[discipline][cost_code_id] = {
-                'cost_code': item.cost_code,
-                'items': [],
-                'total_budgeted_quantity': 0,
-                'total_earned_quantity': 0
-            }
-        
-        # Add work item to group
-        grouped_items[discipline][cost_code_id]['items'].append(item)
-        
-        # Update totals
-        budgeted_quantity = item.budgeted_quantity or 0
-        earned_quantity = item.earned_quantity or 0
-        
-        grouped_items[discipline][cost_code_id]['total_budgeted_quantity'] += budgeted_quantity
-        grouped_items[discipline][cost_code_id]['total_earned_quantity'] += earned_quantity
-        
-        discipline_totals[discipline]['total_budgeted_quantity'] += budgeted_quantity
-        discipline_totals[discipline]['total_earned_quantity'] += earned_quantity
-        
-        total_budgeted_quantity += budgeted_quantity
-        total_earned_quantity += earned_quantity
+    Args:
+        criteria (list): Filter expressions on WorkItem
+        batch_size (int): Rows fetched from each cursor at a time
+        
+    Yields:
+        tuple: (row, progress_data dict of step name -> percentage)
+    """
+    from sqlalchemy import select
+    from models import db, WorkItem, CostCode, WorkItemStepProgress
     
-    # Calculate overall progress
-    overall_progress = 0
-    if total_budgeted_quantity > 0:
-        overall_progress = (total_earned_quantity / total_budgeted_quantity) * 100
+    report_order = (CostCode.discipline, CostCode.cost_code_id_str, CostCode.id, WorkItem.id)
+    connection = db.session.connection().execution_options(stream_results=True, yield_per=batch_size)
     
-    # Create PDF
-    pdf = QuantitiesPDF()
-    pdf.project_name = project_name
-    pdf.overall_progress = overall_progress
+    rows = connection.execute(
+        select(
+            WorkItem.id,
+            WorkItem.work_item_id_str,
+            WorkItem.description,
+            WorkItem.unit_of_measure,
+            WorkItem.budgeted_quantity,
+            WorkItem.earned_quantity,
+            WorkItem.budgeted_man_hours,
+            WorkItem.earned_man_hours,
+            CostCode.id.label('cost_code_id'),
+            CostCode.cost_code_id_str,
+            CostCode.description.label('cost_code_description'),
+            CostCode.discipline,
+            CostCode.rule_of_credit_id
+        ).join(CostCode, WorkItem.cost_code_id == CostCode.id)
+        .where(*criteria)
+        .order_by(*report_order)
+    )
     
-    # Add sub job information if available
-    if sub_job_name:
-        pdf.sub_job_name = sub_job_name
-        pdf.sub_job_description = sub_job_description
+    progress_rows = iter(connection.execute(
+        select(
+            WorkItemStepProgress.work_item_id,
+            WorkItemStepProgress.step_name,
+            WorkItemStepProgress.percentage
+        ).join(WorkItem, WorkItemStepProgress.work_item_id == WorkItem.id)
+        .join(CostCode, WorkItem.cost_code_id == CostCode.id)
+        .where(*criteria)
+        .order_by(*report_order)
+    ))
     
-    # Set up the PDF
-    pdf.set_auto_page_break(True, margin=15)
-    pdf.add_page()
+    pending = next(progress_rows, None)
+    for row in rows:
+        progress_data = {}
+        while pending is not None and pending.work_item_id == row.id:
+            progress_data[pending.step_name] = pending.percentage
+            pending = next(progress_rows, None)
+        yield row, progress_data
+
+
+class _CostCodeHeading:
+    """Cost code fields printed in a cost code row"""
     
-    # Add table header
-    pdf.table_header()
+    def __init__(self, row):
+        self.cost_code_id_str = row.cost_code_id_str
+        self.description = row.cost_code_description
+
+
+class _GroupTotals:
+    """Budgeted and earned totals of one group, per report"""
     
-    # Add data rows
-    for discipline, cost_codes in grouped_items.items():
-        # Discipline header
-        pdf.discipline_row(discipline)
-        
-        for cost_code_id, data in cost_codes.items():
-            # Cost code row with Rules of Credit steps
-            pdf.cost_code_row(data['cost_code'], data['cost_code'].rule_of_credit.get_steps() if data['cost_code'].rule_of_credit else [])
-            
-            # Work items
-            for item in data['items']:
-                pdf.work_item_row(item)
-            
-            # Cost code total
-            pdf.total_row(
-                'Cost Code Total',
-                data['total_budgeted_quantity'],
-                data['total_earned_quantity']
-            )
-        
-        # Discipline total
-        pdf.total_row(
-            'Discipline Total',
-            discipline_totals[discipline]['total_budgeted_quantity'],
-            discipline_totals[discipline]['total_earned_quantity']
-        )
+    def __init__(self, pdfs):
+        self.values = [[0, 0] for _ in pdfs]
     
-    # Grand total
-    pdf.total_row(
-        'Grand Total',
-        total_budgeted_quantity,
-        total_earned_quantity,
-        is_grand_total=True
-    )
+    def add(self, pdfs, row):
+        for values, pdf in zip(self.values, pdfs):
+            values[0] += getattr(row, pdf.measure['budget_column']) or 0
+            values[1] += getattr(row, pdf.measure['earned_column']) or 0
     
-    # Create a BytesIO object to store the PDF data
-    pdf_buffer = io.BytesIO()
+    def write(self, pdfs, title, is_grand_total=False):
+        for values, pdf in zip(self.values, pdfs):
+            pdf.total_row(title, values[0], values[1], is_grand_total=is_grand_total)
+
+
+def _render_reports(pdfs, rows):
+    """
+    Write discipline, cost code and work item rows to reports as they stream in
     
-    # Output PDF to the BytesIO buffer
-    pdf.output(pdf_buffer)
+    Every row is rendered into each of pdfs, so any number of report
+    measures share one pass over the data. Group totals are accumulated
+    while rendering and written when the group ends, so no group has to be
+    held in memory.
+    """
+    from services.rule_cache import get_compiled_rule
     
-    # Reset buffer position to the beginning
-    pdf_buffer.seek(0)
+    current_discipline = None
+    current_cost_code_id = None
+    steps = []
+    cost_code_totals = discipline_totals = None
+    grand_totals = _GroupTotals(pdfs)
     
-    # Return the BytesIO object containing the PDF data
-    return pdf_buffer.getvalue()
+    for row, progress_data in rows:
+        if current_cost_code_id is not None and (
+                row.cost_code_id != current_cost_code_id or row.discipline != current_discipline):
+            # Cost code total
+            cost_code_totals.write(pdfs, 'Cost Code Total')
+            current_cost_code_id = None
+        
+        if current_discipline is not None and row.discipline != current_discipline:
+            # Discipline total
+            discipline_totals.write(pdfs, 'Discipline Total')
+            current_discipline = None
+        
+        if current_discipline is None:
+            # Discipline header
+            for pdf in pdfs:
+                pdf.discipline_row(row.discipline)
+            current_discipline = row.discipline
+            discipline_totals = _GroupTotals(pdfs)
+        
+        if current_cost_code_id is None:
+            # Cost code row with Rules of Credit steps
+            rule = get_compiled_rule(row.rule_of_credit_id)
+            steps = [step_name for step_name, _ in rule.steps] if rule else []
+            heading = _CostCodeHeading(row)
+            for pdf in pdfs:
+                pdf.cost_code_row(heading, steps)
+            current_cost_code_id = row.cost_code_id
+            cost_code_totals = _GroupTotals(pdfs)
+        
+        for pdf in pdfs:
+            pdf.work_item_row(row, steps, progress_data)
+        
+        for totals in (cost_code_totals, discipline_totals, grand_totals):
+            totals.add(pdfs, row)
+    
+    if current_cost_code_id is not None:
+        cost_code_totals.write(pdfs, 'Cost Code Total')
+    if current_discipline is not None:
+        discipline_totals.write(pdfs, 'Discipline Total')
+    
+    # Grand total
+    grand_totals.write(pdfs, 'Grand Total', is_grand_total=True)
 
 
-def generate_hours_report_pdf(project_id=None, sub_job_id=None):
+def write_report_pdfs(outputs, project_id=None, sub_job_id=None):
     """
-    Generate a PDF report for hours data using FPDF2
+    Generate one or more PDF reports from a single pass over the work items
     
     Args:
-        project_id (int): Project ID to generate report for
-        sub_job_id (int): Sub Job ID to generate report for
-        
-    Returns:
-        bytes: PDF file data
+        outputs (dict): Report measure ('quantities' or 'hours') -> path or
+                        binary file object to write that report to
+        project_id (int): Project ID to generate reports for
+        sub_job_id (int): Sub Job ID to generate reports for
     """
-    from models import Project, SubJob, WorkItem, CostCode
-    
-    # Get data based on project_id or sub_job_id
-    if sub_job_id:
-        sub_job = SubJob.query.get_or_404(sub_job_id)
-        project = Project.query.get_or_404(sub_job.project_id)
-        work_items = WorkItem.query.filter_by(sub_job_id=sub_job_id).all()
-        # Store project and sub job information separately
-        project_name = project.name
-        sub_job_name = sub_job.name
-        sub_job_description = sub_job.description
-    elif project_id:
-        project = Project.query.get_or_404(project_id)
-        work_items = WorkItem.query.filter_by(project_id=project_id).all()
-        # Store project information
-        project_name = project.name
-        sub_job_name = None
-        sub_job_description = None
-    else:
-        raise ValueError("Either project_id or sub_job_id must be provided")
+    project, sub_job, criteria, totals = _load_report_scope(project_id, sub_job_id)
     
-    # Group work items by discipline and cost code
-    grouped_items = {}
-    discipline_totals = {}
-    total_budgeted_hours = 0
-    total_earned_hours = 0
+    pdfs = []
+    for measure in outputs:
+        pdf = ProgressReportPDF(measure)
+        
+        # The header shows overall progress on every page, so it comes from the
+        # materialized rollups instead of a first pass over the work items
+        budgeted_total = totals[pdf.measure['budget_total_key']]
+        earned_total = totals[pdf.measure['earned_total_key']]
+        
+        pdf.project_name = project.name
+        pdf.overall_progress = (earned_total / budgeted_total) * 100 if budgeted_total > 0 else 0
+        
+        # Add sub job information if available
+        if sub_job:
+            pdf.sub_job_name = sub_job.name
+            pdf.sub_job_description = sub_job.description
+        
+        # Set up the PDF
+        pdf.set_auto_page_break(True, margin=15)
+        pdf.add_page()
+        
+        # Add table header
+        pdf.table_header()
+        pdfs.append(pdf)
     
-    for item in work_items:
-        if not item.cost_code:
-            continue
-            
-        discipline = item.cost_code.discipline
-        cost_code_id = item.cost_code_id
-        
-        # Initialize discipline if not exists
-        if discipline not in grouped_items:
-            grouped_items[discipline] = {}
-            discipline_totals[discipline] = {
-                'total_budgeted_hours': 0,
-                'total_earned_hours': 0
-            }
-        
-        # Initialize cost code if not exists
-        if cost_code_id not in grouped_items[discipline]:
-            grouped_items[discipline][cost_code_id] = {
-                'cost_code': item.cost_code,
-                'items': [],
-                'total_budgeted_hours': 0,
-                'total_earned_hours': 0
-            }
-        
-        # Add work item to group
-        grouped_items[discipline][cost_code_id]['items'].append(item)
-        
-        # Update totals
-        budgeted_hours = item.budgeted_man_hours or 0
-        earned_hours = item.earned_man_hours or 0
-        
-        grouped_items[discipline][cost_code_id]['total_budgeted_hours'] += budgeted_hours
-        grouped_items[discipline][cost_code_id]['total_earned_hours'] += earned_hours
-        
-        discipline_totals[discipline]['total_budgeted_hours'] += budgeted_hours
-        discipline_totals[discipline]['total_earned_hours'] += earned_hours
-        
-        total_budgeted_hours += budgeted_hours
-        total_earned_hours += earned_hours
+    _render_reports(pdfs, stream_report_rows(criteria))
     
-    # Calculate overall progress
-    overall_progress = 0
-    if total_budgeted_hours > 0:
-        overall_progress = (total_earned_hours / total_budgeted_hours) * 100
+    # Written straight to the file or stream, without an intermediate BytesIO copy
+    for pdf, output in zip(pdfs, outputs.values()):
+        pdf.output(output)
+
+
+def write_quantities_report_pdf(output, project_id=None, sub_job_id=None):
+    """
+    Generate a quantities PDF report and write it to output
     
-    # Create PDF
-    pdf = HoursPDF()
-    pdf.project_name = project_name
-    pdf.overall_progress = overall_progress
+    Args:
+        output (str or file): Path or binary file object to write the PDF to
+        project_id (int): Project ID to generate report for
+        sub_job_id (int): Sub Job ID to generate report for
+    """
+    write_report_pdfs({'quantities': output}, project_id, sub_job_id)
+
+
+def write_hours_report_pdf(output, project_id=None, sub_job_id=None):
+    """
+    Generate an hours PDF report and write it to output
     
-    # Add sub job information if available
-    if sub_job_name:
-        pdf.sub_job_name = sub_job_name
-        pdf.sub_job_description = sub_job_description
+    Args:
+        output (str or file): Path or binary file object to write the PDF to
+        project_id (int): Project ID to generate report for
+        sub_job_id (int): Sub Job ID to generate report for
+    """
+    write_report_pdfs({'hours': output}, project_id, sub_job_id)
+
+
+def write_report_archive(output, entry_names, project_id=None, sub_job_id=None):
+    """
+    Generate several PDF reports from a single pass and write them to one ZIP archive
     
-    # Set up the PDF
-    pdf.set_auto_page_break(True, margin=15)
-    pdf.add_page()
+    Args:
+        output (str or file): Path or binary file object to write the archive to
+        entry_names (dict): Report measure -> file name of that PDF in the archive
+        project_id (int): Project ID to generate reports for
+        sub_job_id (int): Sub Job ID to generate reports for
+    """
+    buffers = {measure: io.BytesIO() for measure in entry_names}
+    write_report_pdfs(buffers, project_id, sub_job_id)
     
-    # Add table header
-    pdf.table_header()
+    # The PDF page streams are already compressed, so entries are stored as they are
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+        for measure, buffer in buffers.items():
+            archive.writestr(entry_names[measure], buffer.getvalue())
+
+
+def generate_quantities_report_pdf(project_id=None, sub_job_id=None):
+    """
+    Generate a PDF report for quantities data using FPDF2
     
-    # Add data rows
-    for discipline, cost_codes in grouped_items.items():
-        # Discipline header
-        pdf.discipline_row(discipline)
+    Args:
+        project_id (int): Project ID to generate report for
+        sub_job_id (int): Sub Job ID to generate report for
         
-        for cost_code_id, data in cost_codes.items():
-            # Cost code row with Rules of Credit steps
-            pdf.cost_code_row(data['cost_code'], data['cost_code'].rule_of_credit.get_steps() if data['cost_code'].rule_of_credit else [])
-            
-            # Work items
-            for item in data['items']:
-                pdf.work_item_row(item)
-            
-            # Cost code total
-            pdf.total_row(
-                'Cost Code Total',
-                data['total_budgeted_hours'],
-                data['total_earned_hours']
-            )
-        
-        # Discipline total
-        pdf.total_row(
-            'Discipline Total',
-            discipline_totals[discipline]['total_budgeted_hours'],
-            discipline_totals[discipline]['total_earned_hours']
-        )
-    
-    # Grand total
-    pdf.total_row(
-        'Grand Total',
-        total_budgeted_hours,
-        total_earned_hours,
-        is_grand_total=True
-    )
-    
-    # Create a BytesIO object to store the PDF data
+    Returns:
+        bytes: PDF file data
+    """
     pdf_buffer = io.BytesIO()
+    write_quantities_report_pdf(pdf_buffer, project_id, sub_job_id)
+    return pdf_buffer.getvalue()
+
+
+def generate_hours_report_pdf(project_id=None, sub_job_id=None):
+    """
+    Generate a PDF report for hours data using FPDF2
     
-    # Output PDF to the BytesIO buffer
-    pdf.output(pdf_buffer)
-    
-    # Reset buffer position to the beginning
-    pdf_buffer.seek(0)
-    
-    # Return the BytesIO object containing the PDF data
+    Args:
+        project_id (int): Project ID to generate report for
+        sub_job_id (int): Sub Job ID to generate report for
+        
+    Returns:
+        bytes: PDF file data
+    """
+    pdf_buffer = io.BytesIO()
+    write_hours_report_pdf(pdf_buffer, project_id, sub_job_id)
     return pdf_buffer.getvalue()
@@ -1,5 +1,25 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
-from models import db, Project, SubJob, RuleOfCredit, CostCode, WorkItem, DISCIPLINE_CHOICES
+from flask import (Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file, current_app,
+                   stream_with_context, abort)
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager
+from models import db, Project, SubJob, RuleOfCredit, CostCode, WorkItem, ReportJob, DISCIPLINE_CHOICES
+from services.rollups import (get_sub_job_totals, empty_totals, capture_contribution, record_work_item_change,
+                              rebuild_rollups, count_work_items)
+from services.rule_cache import invalidate_rule, invalidate_cost_code
+from services.recalculation import start_recalculation, get_recalculation_status
+from services.report_jobs import submit_report_job, get_report_download_name, REPORT_FORMATS
+from services.report_cache import report_cache_key, get_report_cache_dir, get_cached_report
+from services.versions import bump_project_version, project_data_version, portfolio_data_version
+from services.summary_api import (summary_etag, projects_summary, project_summary, sub_job_summary,
+                                  discipline_summary, cost_code_summary)
+from services.summary_cache import (get_project_summaries, get_project_summary, get_sub_job_summaries,
+                                    invalidate_project_list, invalidate_project_summary)
+from services.pagination import SortKey, keyset_page
+from services.search import work_item_search_filter, search_work_items
+from reports.data_export import export_work_items, export_rollups, EXPORT_FORMATS, ROLLUP_EXPORT_COLUMNS
+from services.progress_history import progress_history
+from services.progress_batch import apply_progress_batch, BatchConflictError
+from services.work_item_import import read_import_rows, import_work_items, write_error_report, IMPORT_COLUMNS
 import json
 import uuid
 import traceback
@@ -14,7 +34,7 @@ main_bp = Blueprint('main', __name__)
 def index():
     """Home page route"""
     try:
-        projects = Project.query.all()
+        projects = get_project_summaries()
         work_items = WorkItem.query.order_by(WorkItem.id.desc()).limit(10).all()
         return render_template('index.html', projects=projects, work_items=work_items)
     except Exception as e:
@@ -28,35 +48,21 @@ def index():
 def projects():
     """List all projects"""
     try:
-        all_projects = Project.query.all()
-        
-        # Create a list to hold projects with their calculated values
+        # Project details, sub jobs and rollup totals from the process-wide summary cache
         projects_with_data = []
         
-        # Calculate project-level totals for each project
-        for project in all_projects:
-            # Get all work items for this project
-            work_items = WorkItem.query.filter_by(project_id=project.id).all()
-            
-            # Calculate totals using local variables instead of setting properties directly
-            total_budgeted_hours = sum(item.budgeted_man_hours or 0 for item in work_items)
-            total_earned_hours = sum(item.earned_man_hours or 0 for item in work_items)
-            total_budgeted_quantity = sum(item.budgeted_quantity or 0 for item in work_items)
-            total_earned_quantity = sum(item.earned_quantity or 0 for item in work_items)
-            
-            # Calculate overall progress percentage
-            overall_progress = 0
-            if total_budgeted_hours > 0:
-                overall_progress = (total_earned_hours / total_budgeted_hours) * 100
+        for project in get_project_summaries():
+            totals = project.totals
             
             # Create a dictionary with project and its calculated values
             project_data = {
                 'project': project,
-                'total_budgeted_hours': total_budgeted_hours,
-                'total_earned_hours': total_earned_hours,
-                'total_budgeted_quantity': total_budgeted_quantity,
-                'total_earned_quantity': total_earned_quantity,
-                'overall_progress': overall_progress
+                'item_count': totals['item_count'],
+                'total_budgeted_hours': totals['total_budgeted_hours'],
+                'total_earned_hours': totals['total_earned_hours'],
+                'total_budgeted_quantity': totals['total_budgeted_quantity'],
+                'total_earned_quantity': totals['total_earned_quantity'],
+                'overall_progress': totals['overall_progress']
             }
             
             projects_with_data.append(project_data)
@@ -81,6 +87,7 @@ def add_project():
             project_id_str=project_id_str
         )
         db.session.add(new_project)
+        invalidate_project_list()
         db.session.commit()
         
         flash('Project added successfully!', 'success')
@@ -92,38 +99,25 @@ def add_project():
 def view_project(project_id):
     """View a specific project"""
     try:
-        project = Project.query.get_or_404(project_id)
-        sub_jobs = SubJob.query.filter_by(project_id=project_id).all()
-        
-        # Calculate project-level totals
-        total_budgeted_hours = 0
-        total_earned_hours = 0
-        total_budgeted_quantity = 0
-        total_earned_quantity = 0
-        
-        # Get all work items for this project
-        work_items = WorkItem.query.filter_by(project_id=project_id).all()
-        
-        # Sum up the values
-        for item in work_items:
-            total_budgeted_hours += item.budgeted_man_hours or 0
-            total_earned_hours += item.earned_man_hours or 0
-            total_budgeted_quantity += item.budgeted_quantity or 0
-            total_earned_quantity += item.earned_quantity or 0
-        
-        # Calculate overall progress percentage
-        overall_progress = 0
-        if total_budgeted_hours > 0:
-            overall_progress = (total_earned_hours / total_budgeted_hours) * 100
+        project = get_project_summary(project_id)
+        if project is None:
+            abort(404)
+        sub_jobs = project.sub_jobs
+        
+        # Project-level and per sub job totals come with the cached summary
+        totals = project.totals
+        totals_by_sub_job = {sub_job.id: sub_job.totals for sub_job in sub_jobs}
         
         return render_template('view_project.html', 
                               project=project, 
                               sub_jobs=sub_jobs,
-                              total_budgeted_hours=total_budgeted_hours,
-                              total_earned_hours=total_earned_hours,
-                              total_budgeted_quantity=total_budgeted_quantity,
-                              total_earned_quantity=total_earned_quantity,
-                              overall_progress=overall_progress)
+                              sub_job_totals=totals_by_sub_job,
+                              empty_totals=empty_totals(),
+                              total_budgeted_hours=totals['total_budgeted_hours'],
+                              total_earned_hours=totals['total_earned_hours'],
+                              total_budgeted_quantity=totals['total_budgeted_quantity'],
+                              total_earned_quantity=totals['total_earned_quantity'],
+                              overall_progress=totals['overall_progress'])
     except Exception as e:
         flash(f'Error loading project: {str(e)}', 'danger')
         traceback.print_exc()
@@ -139,6 +133,8 @@ def edit_project(project_id):
         project.description = request.form.get('description')
         project.project_id_str = request.form.get('project_id_str')
         
+        # Project names are printed on its reports and shown in every project menu
+        invalidate_project_summary(project.id)
         db.session.commit()
         flash('Project updated successfully!', 'success')
         return redirect(url_for('main.view_project', project_id=project.id))
@@ -157,6 +153,7 @@ def delete_project(project_id):
         return redirect(url_for('main.projects'))
     
     db.session.delete(project)
+    invalidate_project_list()
     db.session.commit()
     
     flash('Project deleted successfully!', 'success')
@@ -183,6 +180,7 @@ def add_sub_job(project_id):
             project_id=project_id
         )
         db.session.add(new_sub_job)
+        invalidate_project_summary(project_id)
         db.session.commit()
         
         flash('Sub Job added successfully!', 'success')
@@ -197,27 +195,17 @@ def view_sub_job(sub_job_id):
         sub_job = SubJob.query.get_or_404(sub_job_id)
         work_items = WorkItem.query.filter_by(sub_job_id=sub_job_id).all()
         
-        # Calculate total budgeted hours
-        total_budgeted_hours = sum(wi.budgeted_man_hours for wi in work_items if wi.budgeted_man_hours)
-        total_earned_hours = sum(wi.earned_man_hours for wi in work_items if wi.earned_man_hours)
-        
-        # Calculate total budgeted quantity and earned quantity
-        total_budgeted_quantity = sum(wi.budgeted_quantity for wi in work_items if wi.budgeted_quantity)
-        total_earned_quantity = sum(wi.earned_quantity for wi in work_items if wi.earned_quantity)
-        
-        # Calculate overall progress
-        overall_progress = 0
-        if total_budgeted_hours > 0:
-            overall_progress = (total_earned_hours / total_budgeted_hours) * 100
+        # Calculate sub job totals with a SQL aggregate
+        totals = get_sub_job_totals(sub_job_id)
         
         return render_template('view_sub_job.html', 
                               sub_job=sub_job, 
                               work_items=work_items,
-                              total_budgeted_hours=total_budgeted_hours,
-                              total_earned_hours=total_earned_hours,
-                              total_budgeted_quantity=total_budgeted_quantity,
-                              total_earned_quantity=total_earned_quantity,
-                              overall_progress=overall_progress)
+                              total_budgeted_hours=totals['total_budgeted_hours'],
+                              total_earned_hours=totals['total_earned_hours'],
+                              total_budgeted_quantity=totals['total_budgeted_quantity'],
+                              total_earned_quantity=totals['total_earned_quantity'],
+                              overall_progress=totals['overall_progress'])
     except Exception as e:
         flash(f'Error loading sub job: {str(e)}', 'danger')
         traceback.print_exc()
@@ -234,6 +222,7 @@ def edit_sub_job(sub_job_id):
         sub_job.area = request.form.get('area')
         sub_job.sub_job_id_str = request.form.get('sub_job_id_str')
         
+        invalidate_project_summary(sub_job.project_id)
         db.session.commit()
         flash('Sub Job updated successfully!', 'success')
         return redirect(url_for('main.view_sub_job', sub_job_id=sub_job.id))
@@ -253,6 +242,7 @@ def delete_sub_job(sub_job_id):
         return redirect(url_for('main.view_sub_job', sub_job_id=sub_job_id))
     
     db.session.delete(sub_job)
+    invalidate_project_summary(project_id)
     db.session.commit()
     
     flash('Sub Job deleted successfully!', 'success')
@@ -264,7 +254,8 @@ def delete_sub_job(sub_job_id):
 def list_rules_of_credit():
     """List all rules of credit"""
     all_rules = RuleOfCredit.query.all()
-    return render_template('list_rules_of_credit.html', rules=all_rules)
+    return render_template('list_rules_of_credit.html', rules=all_rules,
+                           recalculation_id=request.args.get('recalculation'))
 
 @main_bp.route('/add_rule_of_credit', methods=['GET', 'POST'])
 def add_rule_of_credit():
@@ -347,11 +338,16 @@ def edit_rule_of_credit(rule_id):
         rule.name = name
         rule.description = description
         rule.set_steps(steps)
+        invalidate_rule(rule.id)
         
         db.session.commit()
         
-        flash('Rule of Credit updated successfully!', 'success')
-        return redirect(url_for('main.list_rules_of_credit'))
+        # Recalculate every work item using this rule without holding up the request
+        job_id = start_recalculation(current_app._get_current_object(), f"rule of credit {rule.name}",
+                                     rule_id=rule.id)
+        
+        flash('Rule of Credit updated successfully! Earned values of work items using it are being recalculated.', 'success')
+        return redirect(url_for('main.list_rules_of_credit', recalculation=job_id))
     
     return render_template('edit_rule_of_credit.html', rule=rule)
 
@@ -367,6 +363,7 @@ def delete_rule_of_credit(rule_id):
         return redirect(url_for('main.list_rules_of_credit'))
     
     db.session.delete(rule)
+    invalidate_rule(rule_id)
     db.session.commit()
     
     flash('Rule of Credit deleted successfully!', 'success')
@@ -379,12 +376,13 @@ def list_cost_codes():
     """List all cost codes"""
     try:
         all_cost_codes = CostCode.query.all()
-        projects = Project.query.all()
+        projects = get_project_summaries()
         disciplines = DISCIPLINE_CHOICES
         return render_template('list_cost_codes.html', 
                               cost_codes=all_cost_codes, 
                               projects=projects, 
-                              disciplines=disciplines)
+                              disciplines=disciplines,
+                              recalculation_id=request.args.get('recalculation'))
     except Exception as e:
         flash(f'Error loading cost codes: {str(e)}', 'danger')
         return redirect(url_for('main.index'))
@@ -417,6 +415,7 @@ def add_cost_code():
                 )
                 
                 db.session.add(new_cost_code)
+                bump_project_version(project_id)
                 db.session.commit()
                 
                 flash('Cost code added successfully!', 'success')
@@ -427,7 +426,7 @@ def add_cost_code():
                 traceback.print_exc()
         
         # Get projects and rules of credit for the form
-        projects = Project.query.all()
+        projects = get_project_summaries()
         rules = RuleOfCredit.query.all()
         disciplines = DISCIPLINE_CHOICES
         
@@ -460,15 +459,35 @@ def edit_cost_code(cost_code_id):
                     flash('Cost code already exists!', 'danger')
                     return redirect(url_for('main.edit_cost_code', cost_code_id=cost_code_id))
                 
+                # Discipline and project changes move work items between rollup groups
+                affected_project_ids = {cost_code.project_id, int(project_id)}
+                regroup = cost_code.discipline != discipline or cost_code.project_id != int(project_id)
+                rule_changed = str(cost_code.rule_of_credit_id or '') != str(rule_of_credit_id or '')
+                
                 # Update cost code
                 cost_code.cost_code_id_str = code
                 cost_code.description = description
                 cost_code.discipline = discipline
                 cost_code.project_id = project_id
                 cost_code.rule_of_credit_id = rule_of_credit_id
+                invalidate_cost_code(cost_code_id)
+                for affected_project_id in affected_project_ids:
+                    bump_project_version(affected_project_id)
+                
+                if regroup:
+                    db.session.flush()
+                    for affected_project_id in affected_project_ids:
+                        rebuild_rollups(project_id=affected_project_id)
                 
                 db.session.commit()
                 
+                if rule_changed:
+                    job_id = start_recalculation(current_app._get_current_object(), f"cost code {code}",
+                                                 cost_code_id=cost_code_id)
+                    flash('Cost code updated successfully! Earned values of its work items are being recalculated.',
+                          'success')
+                    return redirect(url_for('main.list_cost_codes', recalculation=job_id))
+                
                 flash('Cost code updated successfully!', 'success')
                 return redirect(url_for('main.list_cost_codes'))
             except Exception as e:
@@ -477,7 +496,7 @@ def edit_cost_code(cost_code_id):
                 traceback.print_exc()
         
         # Get projects and rules of credit for the form
-        projects = Project.query.all()
+        projects = get_project_summaries()
         rules = RuleOfCredit.query.all()
         disciplines = DISCIPLINE_CHOICES
         
@@ -504,6 +523,7 @@ def delete_cost_code(cost_code_id):
             return redirect(url_for('main.list_cost_codes'))
         
         db.session.delete(cost_code)
+        invalidate_cost_code(cost_code_id)
         db.session.commit()
         
         flash('Cost code deleted successfully!', 'success')
@@ -515,9 +535,36 @@ def delete_cost_code(cost_code_id):
 
 # ===== WORK ITEM ROUTES =====
 
+# Keyset sort orders of the work item listing; the last key makes every position unique
+WORK_ITEM_SORTS = {
+    'id': [
+        SortKey(WorkItem.work_item_id_str, False, lambda item: item.work_item_id_str),
+        SortKey(WorkItem.id, False, lambda item: item.id)
+    ],
+    'description': [
+        SortKey(WorkItem.description, False, lambda item: item.description, nullable=True),
+        SortKey(WorkItem.id, False, lambda item: item.id)
+    ],
+    'progress': [
+        SortKey(WorkItem.percent_complete_hours, True, lambda item: item.percent_complete_hours, nullable=True),
+        SortKey(WorkItem.id, True, lambda item: item.id)
+    ],
+    'cost_code': [
+        SortKey(CostCode.cost_code_id_str, False, lambda item: item.cost_code.cost_code_id_str),
+        SortKey(WorkItem.id, False, lambda item: item.id)
+    ],
+    '': [
+        SortKey(WorkItem.id, True, lambda item: item.id)
+    ]
+}
+
+# Work items per page of the listing
+DEFAULT_WORK_ITEMS_PAGE_SIZE = 50
+MAX_WORK_ITEMS_PAGE_SIZE = 500
+
 @main_bp.route('/work_items')
 def work_items():
-    """List all work items with filtering options"""
+    """List work items with filtering options, one keyset page at a time"""
     try:
         # Get filter parameters
         project_id = request.args.get('project_id', type=int)
@@ -526,9 +573,12 @@ def work_items():
         discipline = request.args.get('discipline', '')
         status = request.args.get('status', '')
         sort_by = request.args.get('sort_by', '')
+        page_size = request.args.get('page_size', current_app.config.get('WORK_ITEMS_PAGE_SIZE', DEFAULT_WORK_ITEMS_PAGE_SIZE), type=int)
+        page_size = max(1, min(page_size, MAX_WORK_ITEMS_PAGE_SIZE))
         
-        # Base query
-        query = WorkItem.query
+        # Base query; cost codes are loaded in the same query for the table
+        query = WorkItem.query.join(CostCode, WorkItem.cost_code_id == CostCode.id) \
+            .options(contains_eager(WorkItem.cost_code))
         
         # Apply filters
         if project_id:
@@ -536,10 +586,9 @@ def work_items():
         if sub_job_id:
             query = query.filter(WorkItem.sub_job_id == sub_job_id)
         if search:
-            query = query.filter(WorkItem.description.ilike(f'%{search}%') | 
-                                WorkItem.work_item_id_str.ilike(f'%{search}%'))
+            query = query.filter(work_item_search_filter(search))
         if discipline:
-            query = query.join(CostCode).filter(CostCode.discipline == discipline)
+            query = query.filter(CostCode.discipline == discipline)
         if status:
             if status == 'not_started':
                 query = query.filter(WorkItem.percent_complete_hours == 0)
@@ -549,34 +598,39 @@ def work_items():
             elif status == 'completed':
                 query = query.filter(WorkItem.percent_complete_hours == 100)
         
-        # Apply sorting
-        if sort_by:
-            if sort_by == 'id':
-                query = query.order_by(WorkItem.work_item_id_str)
-            elif sort_by == 'description':
-                query = query.order_by(WorkItem.description)
-            elif sort_by == 'progress':
-                query = query.order_by(WorkItem.percent_complete_hours.desc())
-            elif sort_by == 'cost_code':
-                query = query.join(CostCode).order_by(CostCode.cost_code_id_str)
-        else:
-            # Default sort by ID
-            query = query.order_by(WorkItem.id.desc())
-        
-        # Execute query
-        work_items = query.all()
+        # Total count from the materialized rollups when the filters allow it
+        total_count = None
+        if not search and not status:
+            total_count = count_work_items(project_id, sub_job_id, discipline)
+        if total_count is None:
+            total_count = query.with_entities(func.count(WorkItem.id)).order_by(None).scalar()
+        
+        # Fetch one page in the selected sort order
+        sort_keys = WORK_ITEM_SORTS.get(sort_by, WORK_ITEM_SORTS[''])
+        try:
+            page = keyset_page(query, sort_keys, page_size,
+                               after=request.args.get('after'), before=request.args.get('before'))
+        except ValueError:
+            # Stale or edited cursor: start from the first page
+            page = keyset_page(query, sort_keys, page_size)
+        
+        # Links to the neighbouring pages keep the current filters
+        page_args = {key: value for key, value in request.args.items() if key not in ('after', 'before')}
+        next_url = url_for('main.work_items', after=page.next_cursor, **page_args) if page.next_cursor else None
+        prev_url = url_for('main.work_items', before=page.prev_cursor, **page_args) if page.prev_cursor else None
         
         # Get all projects and sub jobs for filters
-        projects = Project.query.all()
-        sub_jobs = SubJob.query.all()
-        if project_id:
-            sub_jobs = SubJob.query.filter_by(project_id=project_id).all()
+        projects = get_project_summaries()
+        sub_jobs = get_sub_job_summaries(project_id or None)
         
         # Get all disciplines
         disciplines = DISCIPLINE_CHOICES
         
         return render_template('work_items.html', 
-                              work_items=work_items,
+                              work_items=page.items,
+                              total_count=total_count,
+                              next_url=next_url,
+                              prev_url=prev_url,
                               projects=projects,
                               sub_jobs=sub_jobs,
                               disciplines=disciplines)
@@ -585,6 +639,7 @@ def work_items():
         traceback.print_exc()
         return render_template('work_items.html', 
                               work_items=[],
+                              total_count=0,
                               projects=[],
                               sub_jobs=[],
                               disciplines=DISCIPLINE_CHOICES)
@@ -630,6 +685,7 @@ def add_work_item():
                     new_work_item.set_progress_data(progress_data)
                 
                 db.session.add(new_work_item)
+                record_work_item_change(None, new_work_item)
                 db.session.commit()
                 
                 flash('Work item added successfully!', 'success')
@@ -645,7 +701,7 @@ def add_work_item():
                 traceback.print_exc()
         
         # Get projects, sub jobs, and cost codes for the form
-        projects = Project.query.all()
+        projects = get_project_summaries()
         
         # Check if sub_job_id is provided in the URL
         pre_selected_sub_job_id = request.args.get('sub_job_id', type=int)
@@ -655,7 +711,7 @@ def add_work_item():
             sub_job = SubJob.query.get(pre_selected_sub_job_id)
             if sub_job:
                 pre_selected_project_id = sub_job.project_id
-                sub_jobs = SubJob.query.filter_by(project_id=pre_selected_project_id).all()
+                sub_jobs = get_sub_job_summaries(pre_selected_project_id)
                 cost_codes = CostCode.query.filter_by(project_id=pre_selected_project_id).all()
             else:
                 sub_jobs = []
@@ -693,6 +749,9 @@ def edit_work_item(work_item_id):
                 budgeted_man_hours = request.form.get('budgeted_man_hours')
                 work_item_id_str = request.form.get('work_item_id_str')
                 
+                # Remember the current rollup contribution before changing anything
+                before = capture_contribution(work_item)
+                
                 # Update work item
                 work_item.description = description
                 work_item.project_id = project_id
@@ -705,6 +764,7 @@ def edit_work_item(work_item_id):
                 
                 # Recalculate earned values
                 work_item.calculate_earned_values()
+                record_work_item_change(before, work_item)
                 
                 db.session.commit()
                 flash('Work item updated successfully!', 'success')
@@ -715,8 +775,8 @@ def edit_work_item(work_item_id):
                 traceback.print_exc()
         
         # Get projects, sub jobs, and cost codes for the form
-        projects = Project.query.all()
-        sub_jobs = SubJob.query.filter_by(project_id=work_item.project_id).all()
+        projects = get_project_summaries()
+        sub_jobs = get_sub_job_summaries(work_item.project_id)
         cost_codes = CostCode.query.filter_by(project_id=work_item.project_id).all()
         
         return render_template('edit_work_item.html', 
@@ -784,10 +844,12 @@ def update_work_item_progress(work_item_id):
                         progress_data[step_name] = float(value) if value else 0
                 
                 # Update progress
+                before = capture_contribution(work_item)
                 work_item.set_steps_progress(progress_data)
                 
                 # Calculate earned values
                 work_item.calculate_earned_values()
+                record_work_item_change(before, work_item)
                 
                 db.session.commit()
                 flash('Progress updated successfully!', 'success')
@@ -821,8 +883,10 @@ def delete_work_item(work_item_id):
     try:
         work_item = WorkItem.query.get_or_404(work_item_id)
         sub_job_id = work_item.sub_job_id
+        before = capture_contribution(work_item)
         
         db.session.delete(work_item)
+        record_work_item_change(before, None)
         db.session.commit()
         
         flash('Work item deleted successfully!', 'success')
@@ -831,13 +895,65 @@ def delete_work_item(work_item_id):
         flash(f'Error deleting work item: {str(e)}', 'danger')
         return redirect(url_for('main.work_items'))
 
+# Import errors listed on the import page; the error report download has all of them
+MAX_IMPORT_ERRORS_SHOWN = 100
+
+@main_bp.route('/import_work_items', methods=['GET', 'POST'])
+def import_work_items_file():
+    """Bulk import work items from a CSV or Excel file, or validate the file first"""
+    try:
+        projects = sorted(get_project_summaries(), key=lambda project: project.name)
+        selected_project_id = request.values.get('project_id', type=int)
+        result = None
+        
+        if request.method == 'POST':
+            upload = request.files.get('file')
+            action = request.form.get('action', 'validate')
+            if not selected_project_id or not upload or not upload.filename:
+                flash('Select a project and a file to import', 'danger')
+            else:
+                try:
+                    rows = read_import_rows(upload.stream, upload.filename)
+                    result = import_work_items(selected_project_id, rows, dry_run=action != 'import')
+                    
+                    if action == 'error_report':
+                        output = io.StringIO()
+                        write_error_report(result['errors'], output)
+                        return current_app.response_class(
+                            output.getvalue(),
+                            mimetype='text/csv',
+                            headers={'Content-Disposition': 'attachment; filename=work_item_import_errors.csv'}
+                        )
+                    
+                    if result['dry_run']:
+                        flash(f"Validated {result['rows']} rows: {result['imported']} can be imported, "
+                              f"{result['rejected']} have errors", 'info')
+                    else:
+                        flash(f"Imported {result['imported']} work items ({result['rejected']} rows rejected) "
+                              f"in {result['elapsed_seconds']:.1f}s", 'success')
+                except ValueError as e:
+                    # Unreadable file, missing columns or unknown project
+                    flash(f'Error importing work items: {str(e)}', 'danger')
+        
+        return render_template('import_work_items.html',
+                              projects=projects,
+                              selected_project_id=selected_project_id,
+                              import_columns=IMPORT_COLUMNS,
+                              result=result,
+                              max_errors_shown=MAX_IMPORT_ERRORS_SHOWN)
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error importing work items: {str(e)}', 'danger')
+        traceback.print_exc()
+        return redirect(url_for('main.work_items'))
+
 # ===== REPORTS ROUTES =====
 
 @main_bp.route('/reports')
 def reports_index():
     """Reports index page"""
     try:
-        projects = Project.query.all()
+        projects = get_project_summaries()
         return render_template('reports_index.html', projects=projects)
     except Exception as e:
         flash(f'Error loading reports page: {str(e)}', 'danger')
@@ -849,109 +965,96 @@ def reports_index():
 @main_bp.route('/export/quantities/pdf/<int:project_id>')
 def export_quantities_pdf_project(project_id):
     """Export quantities report as PDF for a project"""
-    try:
-        # Import the PDF generation function
-        from reports.pdf_export import generate_quantities_report_pdf
-        
-        # Generate PDF
-        pdf_data = generate_quantities_report_pdf(project_id=project_id)
-        
-        # Create a filename
-        project = Project.query.get_or_404(project_id)
-        filename = f"{project.project_id_str}_quantities_report.pdf"
-        
-        # Return the PDF file
-        return send_file(
-            io.BytesIO(pdf_data),
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=filename
-        )
-    except Exception as e:
-        flash(f'Error generating PDF: {str(e)}', 'danger')
-        traceback.print_exc()
-        return redirect(url_for('main.reports_index'))
+    return _queue_report('quantities', project_id)
 
 @main_bp.route('/export/quantities/pdf/<int:project_id>/<int:sub_job_id>')
 def export_quantities_pdf_subjob(project_id, sub_job_id):
     """Export quantities report as PDF for a sub job"""
-    try:
-        # Import the PDF generation function
-        from reports.pdf_export import generate_quantities_report_pdf
-        
-        # Generate PDF
-        pdf_data = generate_quantities_report_pdf(project_id=project_id, sub_job_id=sub_job_id)
-        
-        # Create a filename
-        project = Project.query.get_or_404(project_id)
-        sub_job = SubJob.query.get_or_404(sub_job_id)
-        filename = f"{project.project_id_str}_{sub_job.sub_job_id_str}_quantities_report.pdf"
-        
-        # Return the PDF file
-        return send_file(
-            io.BytesIO(pdf_data),
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=filename
-        )
-    except Exception as e:
-        flash(f'Error generating PDF: {str(e)}', 'danger')
-        traceback.print_exc()
-        return redirect(url_for('main.reports_index'))
+    return _queue_report('quantities', project_id, sub_job_id)
 
 @main_bp.route('/export/hours/pdf/<int:project_id>')
 def export_hours_pdf_project(project_id):
     """Export hours report as PDF for a project"""
-    try:
-        # Import the PDF generation function
-        from reports.pdf_export import generate_hours_report_pdf
-        
-        # Generate PDF
-        pdf_data = generate_hours_report_pdf(project_id=project_id)
-        
-        # Create a filename
-        project = Project.query.get_or_404(project_id)
-        filename = f"{project.project_id_str}_hours_report.pdf"
-        
-        # Return the PDF file
-        return send_file(
-            io.BytesIO(pdf_data),
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=filename
-        )
-    except Exception as e:
-        flash(f'Error generating PDF: {str(e)}', 'danger')
-        traceback.print_exc()
-        return redirect(url_for('main.reports_index'))
+    return _queue_report('hours', project_id)
 
 @main_bp.route('/export/hours/pdf/<int:project_id>/<int:sub_job_id>')
 def export_hours_pdf_subjob(project_id, sub_job_id):
     """Export hours report as PDF for a sub job"""
+    return _queue_report('hours', project_id, sub_job_id)
+
+@main_bp.route('/export/reports/<int:project_id>')
+def export_reports_project(project_id):
+    """Export quantities and hours reports together as a ZIP archive for a project"""
+    return _queue_report('both', project_id)
+
+@main_bp.route('/export/reports/<int:project_id>/<int:sub_job_id>')
+def export_reports_subjob(project_id, sub_job_id):
+    """Export quantities and hours reports together as a ZIP archive for a sub job"""
+    return _queue_report('both', project_id, sub_job_id)
+
+def _queue_report(report_type, project_id, sub_job_id=None):
+    """
+    Serve a report from the report cache, or queue it in the worker pool
+    
+    The cache key doubles as the ETag, so a browser revalidating an
+    unchanged report gets a 304 without the file being read.
+    """
     try:
-        # Import the PDF generation function
-        from reports.pdf_export import generate_hours_report_pdf
-        
-        # Generate PDF
-        pdf_data = generate_hours_report_pdf(project_id=project_id, sub_job_id=sub_job_id)
-        
-        # Create a filename
-        project = Project.query.get_or_404(project_id)
-        sub_job = SubJob.query.get_or_404(sub_job_id)
-        filename = f"{project.project_id_str}_{sub_job.sub_job_id_str}_hours_report.pdf"
-        
-        # Return the PDF file
-        return send_file(
-            io.BytesIO(pdf_data),
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=filename
-        )
+        cache_key = report_cache_key(report_type, project_id, sub_job_id)
+        if cache_key in request.if_none_match:
+            response = current_app.response_class(status=304)
+            response.set_etag(cache_key)
+            return response
+        
+        extension, mimetype = REPORT_FORMATS[report_type]
+        cached_path = get_cached_report(get_report_cache_dir(current_app), cache_key, extension)
+        if cached_path:
+            return send_file(
+                cached_path,
+                mimetype=mimetype,
+                as_attachment=True,
+                download_name=get_report_download_name(report_type, project_id, sub_job_id),
+                etag=cache_key,
+                conditional=True
+            )
+        
+        job = submit_report_job(current_app._get_current_object(), report_type, project_id, sub_job_id,
+                                cache_key=cache_key)
+        return redirect(url_for('main.view_report_job', job_id=job.id))
     except Exception as e:
         flash(f'Error generating PDF: {str(e)}', 'danger')
         traceback.print_exc()
         return redirect(url_for('main.reports_index'))
 
+@main_bp.route('/reports/jobs/<job_id>')
+def view_report_job(job_id):
+    """Status page for a queued report that downloads it once ready"""
+    job = ReportJob.query.get_or_404(job_id)
+    return render_template('report_job.html', job=job)
+
+@main_bp.route('/reports/jobs/<job_id>/download')
+def download_report_job(job_id):
+    """Download the file generated by a report job"""
+    job = ReportJob.query.get_or_404(job_id)
+    
+    if job.status == 'completed' and (not job.file_path or not os.path.exists(job.file_path)):
+        # Evicted from the report cache since the job finished
+        flash('This report has expired, please export it again.', 'danger')
+        return redirect(url_for('main.reports_index'))
+    
+    if job.status != 'completed':
+        flash('This report is not ready for download.', 'danger')
+        return redirect(url_for('main.view_report_job', job_id=job.id))
+    
+    return send_file(
+        job.file_path,
+        mimetype=REPORT_FORMATS[job.report_type][1],
+        as_attachment=True,
+        download_name=job.download_name,
+        etag=job.cache_key or True,
+        conditional=True
+    )
+
 # Legacy route for backward compatibility
 @main_bp.route('/export_pdf', methods=['POST'])
 def export_pdf():
@@ -980,6 +1083,40 @@ def export_pdf():
         traceback.print_exc()
         return redirect(url_for('main.reports_index'))
 
+# ===== DATA EXPORT ROUTES =====
+
+def _export_response(chunks, export_format, filename):
+    """Stream export chunks to the client as they are produced"""
+    return current_app.response_class(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@main_bp.route('/export/<int:project_id>/work_items.<export_format>')
+def export_work_items_data(project_id, export_format):
+    """Stream all work items of a project (or of ?sub_job_id=) with step progress as CSV or NDJSON"""
+    if export_format not in EXPORT_FORMATS:
+        abort(404)
+    project = Project.query.get_or_404(project_id)
+    sub_job = None
+    sub_job_id = request.args.get('sub_job_id', type=int)
+    if sub_job_id:
+        sub_job = SubJob.query.filter_by(id=sub_job_id, project_id=project.id).first_or_404()
+    
+    name = f"{project.project_id_str}_{sub_job.sub_job_id_str}" if sub_job else project.project_id_str
+    return _export_response(export_work_items(export_format, project, sub_job), export_format,
+                            f"{name}_work_items.{export_format}")
+
+@main_bp.route('/export/<int:project_id>/rollups/<scope>.<export_format>')
+def export_rollups_data(project_id, scope, export_format):
+    """Stream the cost code or discipline rollups of a project as CSV or NDJSON"""
+    if export_format not in EXPORT_FORMATS or scope not in ROLLUP_EXPORT_COLUMNS:
+        abort(404)
+    project = Project.query.get_or_404(project_id)
+    return _export_response(export_rollups(export_format, project, scope), export_format,
+                            f"{project.project_id_str}_{scope}_rollups.{export_format}")
+
 # ===== API ROUTES =====
 
 @main_bp.route('/api/get_sub_jobs/<int:project_id>')
@@ -994,6 +1131,163 @@ def get_cost_codes(project_id):
     cost_codes = CostCode.query.filter_by(project_id=project_id).all()
     return jsonify([{'id': cc.id, 'name': f"{cc.cost_code_id_str} - {cc.description}"} for cc in cost_codes])
 
+@main_bp.route('/api/recalculations/<job_id>')
+def get_recalculation(job_id):
+    """API to poll the progress of a background earned value recalculation"""
+    status = get_recalculation_status(job_id)
+    if not status:
+        return jsonify({'error': 'Recalculation not found'}), 404
+    return jsonify(status)
+
+@main_bp.route('/api/report_jobs/<job_id>')
+def get_report_job(job_id):
+    """API to poll the status of a queued report"""
+    job = db.session.get(ReportJob, job_id)
+    if not job:
+        return jsonify({'error': 'Report job not found'}), 404
+    
+    data = job.serialize()
+    if job.status == 'completed':
+        data['download_url'] = url_for('main.download_report_job', job_id=job.id)
+    return jsonify(data)
+
+@main_bp.route('/api/search/work_items')
+def api_search_work_items():
+    """API for ranked work item search; every word of q matches as a prefix"""
+    term = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    project_id = request.args.get('project_id', type=int)
+    
+    if not term:
+        return jsonify({'query': term, 'results': []})
+    
+    try:
+        results = search_work_items(term, limit=limit, project_id=project_id)
+        return jsonify({
+            'query': term,
+            'results': [
+                {
+                    'id': work_item.id,
+                    'work_item_id_str': work_item.work_item_id_str,
+                    'description': work_item.description,
+                    'project_id': work_item.project_id,
+                    'cost_code': cost_code.cost_code_id_str,
+                    'cost_code_description': cost_code.description,
+                    'percent_complete_hours': work_item.percent_complete_hours,
+                    'url': url_for('main.view_work_item', work_item_id=work_item.id)
+                }
+                for work_item, cost_code in results
+            ]
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@main_bp.route('/api/work_items/progress', methods=['POST'])
+def api_update_progress_batch():
+    """
+    API for bulk step progress updates from the field
+    
+    Expects {"batch_id": "...", "updates": [{"work_item_id": 1, "step": "Install", "percent": 50}, ...]}.
+    Resending a batch ID returns the stored result instead of applying the updates again.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object with batch_id and updates'}), 400
+    
+    try:
+        return jsonify(apply_progress_batch(data.get('batch_id'), data.get('updates')))
+    except BatchConflictError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@main_bp.route('/api/projects/<int:project_id>/progress_history')
+def api_progress_history(project_id):
+    """
+    API for S-curves and period-over-period earned hours of a project or sub job
+    
+    Optional query parameters: sub_job_id, start and end (YYYY-MM-DD, any day of the week).
+    """
+    project = Project.query.get_or_404(project_id)
+    sub_job_id = request.args.get('sub_job_id', type=int)
+    if sub_job_id:
+        SubJob.query.filter_by(id=sub_job_id, project_id=project.id).first_or_404()
+    
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = datetime.date.fromisoformat(start) if start else None
+        end = datetime.date.fromisoformat(end) if end else None
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates (YYYY-MM-DD)'}), 400
+    
+    return jsonify({
+        'project_id': project.id,
+        'sub_job_id': sub_job_id,
+        'periods': progress_history(project.id, sub_job_id=sub_job_id, start=start, end=end)
+    })
+
+def _summary_response(scope, data_version, build):
+    """
+    JSON summary for dashboards and charts, answered with a 304 when unchanged
+    
+    The ETag comes from the rollup version counters; callers read them before
+    any row of the body, so a body is never newer than its ETag claims. A client
+    revalidating an unchanged summary gets a 304 without the body being built.
+    Clients must revalidate on every use (no-cache).
+    """
+    etag = summary_etag(scope, data_version)
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(dict(build(), version=data_version))
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+@main_bp.route('/api/v1/projects')
+def api_projects_summary():
+    """API for the totals of every project and of all projects together"""
+    return _summary_response('projects', portfolio_data_version(), projects_summary)
+
+@main_bp.route('/api/v1/projects/<int:project_id>')
+def api_project_summary(project_id):
+    """API for a project's totals with the totals of each sub job"""
+    data_version = project_data_version(project_id)
+    project = Project.query.get_or_404(project_id)
+    return _summary_response(f'project:{project.id}', data_version, lambda: project_summary(project))
+
+@main_bp.route('/api/v1/projects/<int:project_id>/disciplines')
+def api_discipline_summary(project_id):
+    """API for a project's totals per discipline"""
+    data_version = project_data_version(project_id)
+    project = Project.query.get_or_404(project_id)
+    return _summary_response(f'disciplines:{project.id}', data_version, lambda: discipline_summary(project.id))
+
+@main_bp.route('/api/v1/projects/<int:project_id>/cost_codes')
+def api_cost_code_summary(project_id):
+    """API for a project's totals per cost code"""
+    data_version = project_data_version(project_id)
+    project = Project.query.get_or_404(project_id)
+    return _summary_response(f'cost_codes:{project.id}', data_version, lambda: cost_code_summary(project.id))
+
+@main_bp.route('/api/v1/sub_jobs/<int:sub_job_id>')
+def api_sub_job_summary(sub_job_id):
+    """API for a sub job's totals"""
+    project_id = db.session.query(SubJob.project_id).filter(SubJob.id == sub_job_id).scalar()
+    if project_id is None:
+        abort(404)
+    data_version = project_data_version(project_id)
+    sub_job = SubJob.query.get_or_404(sub_job_id)
+    return _summary_response(f'sub_job:{sub_job.id}', data_version, lambda: sub_job_summary(sub_job))
+
 @main_bp.route('/api/get_rule_steps/<int:cost_code_id>')
 def get_rule_steps(cost_code_id):
     """API to get rule of credit steps for a cost code"""
@@ -0,0 +1,176 @@
+import json
+import os
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db
+
+# Used when DATABASE_URL is not set; relative SQLite paths live in instance/
+DEFAULT_DATABASE_URL = 'sqlite:///magellan_ev.db'
+
+# Engine options for PostgreSQL, merged under DATABASE_ENGINE_OPTIONS. Each
+# gunicorn worker keeps its own pool, so size them against max_connections.
+POSTGRESQL_ENGINE_OPTIONS = {
+    'pool_size': 10,
+    'max_overflow': 20,
+    'pool_timeout': 30,
+    'pool_pre_ping': True,  # Drop connections the server closed while idle
+    'pool_recycle': 1800
+}
+
+# SQLite settings per database profile, selected with the SQLITE_PROFILE setting.
+# 'production' is meant for several gunicorn workers sharing one database file:
+# WAL lets readers run while a progress update commits, and busy_timeout makes
+# writers wait for each other instead of failing with "database is locked".
+SQLITE_PROFILES = {
+    'default': {
+        'pragmas': {},
+        'engine_options': {}
+    },
+    'production': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',  # Durable with WAL except on power loss mid-checkpoint
+            'cache_size': -64000,  # 64MB page cache per connection
+            'mmap_size': 268435456,  # 256MB memory-mapped reads
+            'busy_timeout': 15000,
+            'temp_store': 'MEMORY'
+        },
+        'engine_options': {
+            'pool_size': 5,
+            'max_overflow': 10,
+            'pool_timeout': 30,
+            'connect_args': {'timeout': 15}
+        }
+    }
+}
+
+
+def get_sqlite_profile(name):
+    """Return the settings of a database profile by name"""
+    try:
+        return SQLITE_PROFILES[name or 'default']
+    except KeyError:
+        raise ValueError(f"Unknown SQLite profile: {name}")
+
+
+def get_database_url():
+    """
+    Database URL from the DATABASE_URL environment variable
+
+    Accepts the postgres:// scheme many hosting providers hand out, which
+    SQLAlchemy only knows as postgresql://.
+    """
+    url = os.environ.get('DATABASE_URL') or DEFAULT_DATABASE_URL
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def get_engine_options():
+    """
+    Engine options from the DATABASE_ENGINE_OPTIONS environment variable
+
+    The variable holds a JSON object of create_engine() keyword arguments,
+    e.g. {"pool_size": 20, "echo": false}.
+
+    Raises:
+        ValueError: If the variable is not a JSON object
+    """
+    raw = os.environ.get('DATABASE_ENGINE_OPTIONS', '').strip()
+    if not raw:
+        return {}
+    try:
+        options = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"DATABASE_ENGINE_OPTIONS is not valid JSON: {e}") from e
+    if not isinstance(options, dict):
+        raise ValueError("DATABASE_ENGINE_OPTIONS must be a JSON object")
+    return options
+
+
+def upsert_insert(table):
+    """
+    INSERT construct for the current database that supports on_conflict_do_update
+
+    SQLite and PostgreSQL share the ON CONFLICT syntax, but SQLAlchemy builds
+    it from each dialect's own insert().
+
+    Raises:
+        ValueError: On databases without ON CONFLICT support
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(table)
+    if dialect == 'sqlite':
+        return sqlite.insert(table)
+    raise ValueError(f"Upserts are not supported on {dialect}")
+
+
+def lock_for_update(query, of=None):
+    """
+    Lock what a query reads until the transaction ends
+
+    PostgreSQL locks the rows with SELECT ... FOR UPDATE. SQLite has no row
+    locks and takes its write lock only at the first write, so another
+    connection could commit in between; the transaction starts with
+    BEGIN IMMEDIATE instead, holding off every other writer until it ends.
+
+    Args:
+        query (Query): Query about to be read
+        of: Entity whose rows are locked on PostgreSQL (all of them if None)
+
+    Returns:
+        Query: The query to read
+    """
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite':
+        if not connection.connection.dbapi_connection.in_transaction:
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+        return query
+    return query.with_for_update(of=of)
+
+
+def _set_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        cursor.close()
+    return on_connect
+
+
+def init_database(app):
+    """
+    Initialize db for an app, applying its database profile
+
+    On SQLite the SQLITE_PROFILE setting selects the profile, on PostgreSQL
+    POSTGRESQL_ENGINE_OPTIONS apply. Profile engine options are merged under
+    any SQLALCHEMY_ENGINE_OPTIONS already configured, and SQLite pragmas run
+    on every new connection.
+
+    Args:
+        app (Flask): Application with SQLALCHEMY_DATABASE_URI configured
+    """
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+    if uri.startswith('sqlite'):
+        profile = get_sqlite_profile(app.config.get('SQLITE_PROFILE'))
+        # In-memory databases use a single static connection; pool sizing does not apply
+        if ':memory:' in uri or uri in ('sqlite://', 'sqlite:///'):
+            profile = dict(profile, engine_options={})
+    elif uri.startswith('postgresql'):
+        profile = {'pragmas': {}, 'engine_options': POSTGRESQL_ENGINE_OPTIONS}
+    else:
+        profile = SQLITE_PROFILES['default']
+
+    if profile['engine_options']:
+        engine_options = dict(profile['engine_options'])
+        engine_options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+
+    db.init_app(app)
+
+    if profile['pragmas']:
+        with app.app_context():
+            for engine in db.engines.values():
+                if engine.dialect.name == 'sqlite':
+                    event.listen(engine, 'connect', _set_pragmas(profile['pragmas']))
@@ -0,0 +1,41 @@
+def zero_earned_values():
+    """Earned values for a work item without a usable rule of credit"""
+    return {
+        'earned_man_hours': 0,
+        'percent_complete_hours': 0,
+        'earned_quantity': 0,
+        'percent_complete_quantity': 0
+    }
+
+
+def compute_earned_values(rule, progress_data, budgeted_man_hours, budgeted_quantity):
+    """
+    Calculate earned hours, earned quantity and percent complete for one work item
+
+    Args:
+        rule (CompiledRule): Compiled rule of credit of the work item's cost code
+        progress_data (dict): Step name -> completion percentage
+        budgeted_man_hours (float): Budgeted hours of the work item
+        budgeted_quantity (float): Budgeted quantity of the work item
+
+    Returns:
+        dict: Values for the earned_man_hours, percent_complete_hours,
+              earned_quantity and percent_complete_quantity columns
+    """
+    if not rule:
+        return zero_earned_values()
+
+    # Calculate weighted percentage
+    total_weighted_percentage = rule.weighted_percentage(progress_data)
+    values = zero_earned_values()
+
+    # Calculate earned values
+    if budgeted_man_hours and budgeted_man_hours > 0:
+        values['earned_man_hours'] = (total_weighted_percentage / 100.0) * budgeted_man_hours
+        values['percent_complete_hours'] = (values['earned_man_hours'] / budgeted_man_hours) * 100
+
+    if budgeted_quantity and budgeted_quantity > 0:
+        values['earned_quantity'] = (total_weighted_percentage / 100.0) * budgeted_quantity
+        values['percent_complete_quantity'] = (values['earned_quantity'] / budgeted_quantity) * 100
+
+    return values
@@ -0,0 +1,186 @@
+import numpy as np
+from sqlalchemy import select, bindparam
+from models import db, WorkItem, CostCode, WorkItemStepProgress
+from services.rule_cache import preload_rules, CompiledRule
+
+# Earned value columns stored on work_item
+EARNED_VALUE_COLUMNS = ('earned_man_hours', 'percent_complete_hours', 'earned_quantity', 'percent_complete_quantity')
+
+# Bulk UPDATE of the earned value columns, executed once per batch
+_update_statement = WorkItem.__table__.update() \
+    .where(WorkItem.__table__.c.id == bindparam('b_id')) \
+    .values(
+        earned_man_hours=bindparam('earned_man_hours'),
+        percent_complete_hours=bindparam('percent_complete_hours'),
+        earned_quantity=bindparam('earned_quantity'),
+        percent_complete_quantity=bindparam('percent_complete_quantity')
+    )
+
+
+class EarnedValueInputs:
+    """
+    Array form of the work items, rules and step progress of one batch
+
+    Attributes:
+        work_item_ids (ndarray): Work item IDs, one per row
+        project_ids (ndarray): Project ID of each work item
+        rule_index (ndarray): Row in weights used by each work item (0 = no rule)
+        weights (ndarray): Step weights, shape (rules + 1, max steps); row 0 is all zeros
+        progress (ndarray): Step completion percentages, shape (items, max steps)
+        budgeted_hours (ndarray): Budgeted hours (0 where missing)
+        budgeted_quantity (ndarray): Budgeted quantity (0 where missing)
+    """
+
+    def __init__(self, rows, progress_rows, rules):
+        item_count = len(rows)
+        self.work_item_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=item_count)
+        self.project_ids = np.fromiter((row[1] for row in rows), dtype=np.int64, count=item_count)
+        self.budgeted_hours = np.fromiter((row[2] or 0.0 for row in rows), dtype=np.float64, count=item_count)
+        self.budgeted_quantity = np.fromiter((row[3] or 0.0 for row in rows), dtype=np.float64, count=item_count)
+
+        # One weights row per rule used in this batch, in step order
+        rule_rows = {}
+        step_slots = {}
+        max_steps = max([len(rule.steps) for rule in rules.values()] + [1])
+        self.weights = np.zeros((len(rules) + 1, max_steps), dtype=np.float64)
+        for rule_id, rule in rules.items():
+            rule_rows[rule_id] = len(rule_rows) + 1
+            slots = {}
+            for slot, (step_name, step_weight) in enumerate(rule.steps):
+                self.weights[rule_rows[rule_id], slot] = step_weight
+                slots.setdefault(step_name, []).append(slot)
+            step_slots[rule_id] = slots
+
+        self.rule_index = np.fromiter((rule_rows.get(row[4], 0) for row in rows), dtype=np.int64, count=item_count)
+
+        # Place each progress row in the slot(s) of its step within the item's rule
+        self.progress = np.zeros((item_count, max_steps), dtype=np.float64)
+        positions = {row[0]: (index, step_slots.get(row[4], {})) for index, row in enumerate(rows)}
+        for work_item_id, step_name, percentage in progress_rows:
+            position = positions.get(work_item_id)
+            if position is None:
+                continue
+            index, slots = position
+            for slot in slots.get(step_name, ()):
+                self.progress[index, slot] = percentage or 0.0
+
+
+def compute_earned_value_arrays(inputs):
+    """
+    Compute earned values for every work item of a batch at once
+
+    The steps are accumulated one column at a time in rule order, so every
+    value is produced by the same floating point operations as
+    services.earned_value.compute_earned_values and matches it exactly.
+
+    Returns:
+        dict: Arrays for weighted_percentage, earned_man_hours,
+              percent_complete_hours, earned_quantity and percent_complete_quantity
+    """
+    weights_per_item = inputs.weights[inputs.rule_index]
+    weighted_percentage = np.zeros(len(inputs.work_item_ids), dtype=np.float64)
+    for slot in range(weights_per_item.shape[1]):
+        weighted_percentage += (inputs.progress[:, slot] / 100.0) * weights_per_item[:, slot]
+
+    values = {'weighted_percentage': weighted_percentage}
+    for budget, earned_column, percent_column in (
+        (inputs.budgeted_hours, 'earned_man_hours', 'percent_complete_hours'),
+        (inputs.budgeted_quantity, 'earned_quantity', 'percent_complete_quantity')
+    ):
+        has_budget = budget > 0
+        earned = np.where(has_budget, (weighted_percentage / 100.0) * budget, 0.0)
+        percent = np.divide(earned, budget, out=np.zeros_like(earned), where=has_budget) * 100
+        values[earned_column] = earned
+        values[percent_column] = percent
+    return values
+
+
+def write_earned_values(work_item_ids, values):
+    """
+    Store computed earned values with one executemany UPDATE
+
+    Args:
+        work_item_ids (ndarray): Work item ID of each row
+        values (dict): Arrays from compute_earned_value_arrays
+    """
+    columns = [values[column].tolist() for column in EARNED_VALUE_COLUMNS]
+    parameters = [
+        dict(zip(EARNED_VALUE_COLUMNS, item_values), b_id=work_item_id)
+        for work_item_id, item_values in zip(work_item_ids.tolist(), zip(*columns))
+    ]
+    if parameters:
+        db.session.execute(_update_statement, parameters)
+
+
+def load_inputs(*criteria, rules=None):
+    """
+    Load work items matching criteria and their step progress into arrays
+
+    Args:
+        *criteria: Filter expressions on WorkItem/CostCode (e.g. WorkItem.project_id == 1)
+        rules (dict): Rule ID -> CompiledRule to use instead of the cached rules (what-if)
+
+    Returns:
+        EarnedValueInputs
+    """
+    # Core selects on the session's connection skip ORM row processing,
+    # which dominates the load time for hundreds of thousands of rows
+    connection = db.session.connection()
+    rows = connection.execute(
+        select(
+            WorkItem.id,
+            WorkItem.project_id,
+            WorkItem.budgeted_man_hours,
+            WorkItem.budgeted_quantity,
+            CostCode.rule_of_credit_id
+        ).join(CostCode, WorkItem.cost_code_id == CostCode.id)
+        .where(*criteria)
+        .order_by(WorkItem.id)
+    ).all()
+
+    progress_rows = connection.execute(
+        select(
+            WorkItemStepProgress.work_item_id,
+            WorkItemStepProgress.step_name,
+            WorkItemStepProgress.percentage
+        ).join(WorkItem, WorkItemStepProgress.work_item_id == WorkItem.id)
+        .join(CostCode, WorkItem.cost_code_id == CostCode.id)
+        .where(*criteria)
+    ).all()
+
+    if rules is None:
+        rules = preload_rules({row[4] for row in rows if row[4]})
+    return EarnedValueInputs(rows, progress_rows, rules)
+
+
+def project_earned_values(project_id, rule_steps=None):
+    """
+    Compute earned values for a whole project, optionally with what-if rule weights
+
+    Nothing is written to the database.
+
+    Args:
+        project_id (int): Project to compute
+        rule_steps (dict): Rule ID -> list of {"name", "weight"} dictionaries that
+                           replace the stored steps of those rules
+
+    Returns:
+        dict: Per-item arrays from compute_earned_value_arrays plus work_item_ids
+              and project totals of earned hours and quantity
+    """
+    rules = None
+    if rule_steps:
+        rules = dict(preload_rules())
+        for rule_id, steps in rule_steps.items():
+            parsed_steps = [(str(step["name"]), float(step["weight"])) for step in steps]
+            rules[int(rule_id)] = CompiledRule(int(rule_id), None, parsed_steps)
+
+    inputs = load_inputs(WorkItem.project_id == project_id, rules=rules)
+    values = compute_earned_value_arrays(inputs)
+    values['work_item_ids'] = inputs.work_item_ids
+    values['total_earned_hours'] = float(values['earned_man_hours'].sum())
+    values['total_earned_quantity'] = float(values['earned_quantity'].sum())
+    values['total_budgeted_hours'] = float(inputs.budgeted_hours.sum())
+    values['total_budgeted_quantity'] = float(inputs.budgeted_quantity.sum())
+    return values
+
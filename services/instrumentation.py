@@ -0,0 +1,280 @@
+import collections
+import ipaddress
+import threading
+import time
+import tracemalloc
+from flask import g, request, jsonify, has_request_context, abort
+from sqlalchemy import event
+from models import db
+
+# Request durations kept per endpoint for the percentiles
+SAMPLE_SIZE = 500
+
+# Requests with suspected N+1 queries kept for /_metrics
+RECENT_N_PLUS_ONE = 50
+
+# Statements longer than this are shortened in N+1 reports
+STATEMENT_PREVIEW_LENGTH = 200
+
+
+class _RequestProfile:
+    """Measurements of the request being handled, kept on flask.g"""
+
+    __slots__ = ('started', 'query_count', 'sql_seconds', 'template_seconds', 'statements', 'memory_baseline')
+
+    def __init__(self, trace_memory):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.statements = collections.Counter()
+        self.memory_baseline = None
+        if trace_memory:
+            tracemalloc.reset_peak()
+            self.memory_baseline = tracemalloc.get_traced_memory()[0]
+
+    def peak_allocated(self):
+        """Bytes allocated at the peak of the request above what was allocated at its start"""
+        if self.memory_baseline is None:
+            return None
+        return max(tracemalloc.get_traced_memory()[1] - self.memory_baseline, 0)
+
+
+def _current_profile():
+    if not has_request_context():
+        return None
+    return g.get('_request_profile')
+
+
+class RouteMetrics:
+    """Per-endpoint totals of the profiled requests of this process"""
+
+    def __init__(self, n_plus_one_threshold):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self.endpoints = {}
+            self.n_plus_one = collections.deque(maxlen=RECENT_N_PLUS_ONE)
+
+    def record(self, endpoint, method, status_code, profile, wall_seconds):
+        """
+        Add one request to the totals of its endpoint
+
+        Returns:
+            list: (statement, count) of the statements repeated more than
+                  n_plus_one_threshold times in the request
+        """
+        repeated = [
+            (statement, count) for statement, count in profile.statements.most_common()
+            if count > self.n_plus_one_threshold
+        ]
+        peak_allocated = profile.peak_allocated()
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = {
+                    'requests': 0,
+                    'errors': 0,
+                    'wall_ms_total': 0.0,
+                    'wall_ms_max': 0.0,
+                    'queries_total': 0,
+                    'queries_max': 0,
+                    'sql_ms_total': 0.0,
+                    'template_ms_total': 0.0,
+                    'peak_allocated_kb_max': None,
+                    'n_plus_one_requests': 0,
+                    'samples': collections.deque(maxlen=SAMPLE_SIZE)
+                }
+            wall_ms = wall_seconds * 1000
+            stats['requests'] += 1
+            stats['errors'] += 1 if status_code >= 500 else 0
+            stats['wall_ms_total'] += wall_ms
+            stats['wall_ms_max'] = max(stats['wall_ms_max'], wall_ms)
+            stats['queries_total'] += profile.query_count
+            stats['queries_max'] = max(stats['queries_max'], profile.query_count)
+            stats['sql_ms_total'] += profile.sql_seconds * 1000
+            stats['template_ms_total'] += profile.template_seconds * 1000
+            stats['samples'].append(wall_ms)
+            if peak_allocated is not None:
+                stats['peak_allocated_kb_max'] = max(stats['peak_allocated_kb_max'] or 0, peak_allocated / 1024)
+            if repeated:
+                stats['n_plus_one_requests'] += 1
+                self.n_plus_one.append({
+                    'endpoint': endpoint,
+                    'method': method,
+                    'path': request.full_path.rstrip('?'),
+                    'at': time.time(),
+                    'statements': [
+                        {'statement': statement[:STATEMENT_PREVIEW_LENGTH], 'count': count}
+                        for statement, count in repeated
+                    ]
+                })
+        return repeated
+
+    def snapshot(self):
+        """Totals per endpoint with averages and percentiles, slowest total time first"""
+        with self._lock:
+            endpoints = []
+            for endpoint, stats in self.endpoints.items():
+                samples = sorted(stats['samples'])
+                requests = stats['requests']
+                endpoints.append({
+                    'endpoint': endpoint,
+                    'requests': requests,
+                    'errors': stats['errors'],
+                    'wall_ms_total': round(stats['wall_ms_total'], 3),
+                    'wall_ms_avg': round(stats['wall_ms_total'] / requests, 3),
+                    'wall_ms_p50': round(_percentile(samples, 50), 3),
+                    'wall_ms_p95': round(_percentile(samples, 95), 3),
+                    'wall_ms_max': round(stats['wall_ms_max'], 3),
+                    'queries_avg': round(stats['queries_total'] / requests, 2),
+                    'queries_max': stats['queries_max'],
+                    'sql_ms_avg': round(stats['sql_ms_total'] / requests, 3),
+                    'template_ms_avg': round(stats['template_ms_total'] / requests, 3),
+                    'peak_allocated_kb_max': (round(stats['peak_allocated_kb_max'], 1)
+                                              if stats['peak_allocated_kb_max'] is not None else None),
+                    'n_plus_one_requests': stats['n_plus_one_requests']
+                })
+            endpoints.sort(key=lambda item: item['wall_ms_total'], reverse=True)
+            return {
+                'since': self.started_at,
+                'n_plus_one_threshold': self.n_plus_one_threshold,
+                'endpoints': endpoints,
+                'recent_n_plus_one': list(self.n_plus_one)
+            }
+
+
+def _percentile(sorted_samples, percent):
+    if not sorted_samples:
+        return 0.0
+    index = min(int(round(percent / 100 * (len(sorted_samples) - 1))), len(sorted_samples) - 1)
+    return sorted_samples[index]
+
+
+# ===== HOOKS =====
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile()
+    if profile is not None:
+        conn.info['_profile_query_start'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile()
+    if profile is None:
+        return
+    started = conn.info.pop('_profile_query_start', None)
+    if started is None:
+        return
+    profile.sql_seconds += time.perf_counter() - started
+    profile.query_count += 1
+    # Bound parameters keep the text of a statement the same across executions
+    profile.statements[statement] += 1
+
+
+def _timed_template_class(template_class):
+    class TimedTemplate(template_class):
+        """Template that adds its render time to the request profile"""
+
+        def render(self, *args, **kwargs):
+            profile = _current_profile()
+            if profile is None:
+                return super().render(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return super().render(*args, **kwargs)
+            finally:
+                profile.template_seconds += time.perf_counter() - started
+
+    return TimedTemplate
+
+
+def is_loopback_address(address):
+    """Whether a client address is a loopback address, for endpoints meant for local use only"""
+    try:
+        return ipaddress.ip_address(address or '').is_loopback
+    except ValueError:
+        return False
+
+
+def init_instrumentation(app):
+    """
+    Profile every blueprint request of an app when the PROFILING setting is on
+
+    Each request gets its wall time, number and total time of SQL queries
+    (from SQLAlchemy cursor events), template render time and, with
+    PROFILING_MEMORY, the peak of Python allocations (tracemalloc, which
+    slows requests down noticeably). The numbers are sent in a
+    Server-Timing header and summed per endpoint in this process. A request
+    running the same statement more than PROFILING_N_PLUS_ONE_THRESHOLD
+    times is logged as a likely N+1 query.
+
+    The totals are served as JSON at /_metrics to loopback clients only;
+    DELETE /_metrics starts them over. Each gunicorn worker keeps its own
+    totals. The body of a streamed response is produced after the request
+    is recorded, so its queries are not counted.
+
+    Args:
+        app (Flask): Application with db initialized
+
+    Returns:
+        RouteMetrics: The metrics store, or None if profiling is off
+    """
+    if not app.config.get('PROFILING'):
+        return None
+
+    trace_memory = bool(app.config.get('PROFILING_MEMORY'))
+    metrics = RouteMetrics(int(app.config.get('PROFILING_N_PLUS_ONE_THRESHOLD', 10)))
+    app.extensions['route_metrics'] = metrics
+
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    app.jinja_env.template_class = _timed_template_class(app.jinja_env.template_class)
+
+    @app.before_request
+    def start_request_profile():
+        if request.blueprint:
+            g._request_profile = _RequestProfile(trace_memory)
+
+    @app.after_request
+    def record_request_profile(response):
+        profile = g.pop('_request_profile', None)
+        if profile is None:
+            return response
+        wall_seconds = time.perf_counter() - profile.started
+        repeated = metrics.record(request.endpoint or request.path, request.method,
+                                  response.status_code, profile, wall_seconds)
+        for statement, count in repeated:
+            app.logger.warning("Possible N+1 query in %s (%d executions): %s",
+                               request.endpoint, count, statement[:STATEMENT_PREVIEW_LENGTH])
+
+        timings = [
+            f"app;dur={wall_seconds * 1000:.1f}",
+            f'db;dur={profile.sql_seconds * 1000:.1f};desc="{profile.query_count} queries"',
+            f"tpl;dur={profile.template_seconds * 1000:.1f}"
+        ]
+        peak_allocated = profile.peak_allocated()
+        if peak_allocated is not None:
+            timings.append(f'mem;desc="peak {peak_allocated / 1024:.0f}KB"')
+        response.headers.add('Server-Timing', ', '.join(timings))
+        return response
+
+    @app.route('/_metrics', methods=['GET', 'DELETE'])
+    def route_metrics():
+        if not is_loopback_address(request.remote_addr):
+            abort(404)
+        if request.method == 'DELETE':
+            metrics.reset()
+            return jsonify({'reset': True})
+        return jsonify(metrics.snapshot())
+
+    return metrics
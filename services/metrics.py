@@ -0,0 +1,142 @@
+import os
+import time
+from flask import g, request, abort, Response
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST, multiprocess
+)
+from sqlalchemy import event
+from models import db
+from services.instrumentation import is_loopback_address
+
+# Multiprocess mode is chosen by prometheus_client when this variable is set
+# before the first metric is created; see gunicorn.conf.py
+MULTIPROCESS_DIR_VARIABLE = 'PROMETHEUS_MULTIPROC_DIR'
+
+# ===== METRICS =====
+
+REQUEST_DURATION = Histogram(
+    'magellan_http_request_duration_seconds',
+    'Time spent handling a request, by route',
+    ['endpoint', 'method', 'status']
+)
+
+REPORT_RENDER_DURATION = Histogram(
+    'magellan_report_render_duration_seconds',
+    'Time spent rendering a PDF report',
+    ['report_type', 'status'],
+    buckets=(0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+)
+
+REPORT_SIZE = Histogram(
+    'magellan_report_size_bytes',
+    'Size of rendered PDF reports',
+    ['report_type'],
+    buckets=(10e3, 50e3, 100e3, 500e3, 1e6, 5e6, 10e6, 50e6, 100e6)
+)
+
+RECALCULATION_BATCH_SIZE = Histogram(
+    'magellan_recalculation_batch_size',
+    'Work items whose earned values are recomputed together',
+    ['source'],
+    buckets=(1, 10, 50, 100, 500, 1000, 2000, 5000, 10000)
+)
+
+RECALCULATION_DURATION = Histogram(
+    'magellan_recalculation_batch_duration_seconds',
+    'Time spent recomputing and writing the earned values of one batch',
+    ['source'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+
+CACHE_REQUESTS = Counter(
+    'magellan_cache_requests_total',
+    'Cache lookups, by cache and result (hit or miss)',
+    ['cache', 'result']
+)
+
+DB_LOCK_ERRORS = Counter(
+    'magellan_db_lock_errors_total',
+    'Statements that failed because the database was locked or a lock wait timed out'
+)
+
+# Driver error messages of lock failures (SQLite busy, PostgreSQL lock timeouts and deadlocks)
+LOCK_ERROR_MESSAGES = ('database is locked', 'database table is locked', 'lock timeout', 'deadlock detected')
+
+
+def record_cache_lookup(cache, hit):
+    """Count one cache lookup as a hit or a miss"""
+    CACHE_REQUESTS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+def record_recalculation_batch(source, size, seconds):
+    """Record the size and duration of one batch of earned value recomputation"""
+    RECALCULATION_BATCH_SIZE.labels(source=source).observe(size)
+    RECALCULATION_DURATION.labels(source=source).observe(seconds)
+
+
+def record_report_render(report_type, status, seconds, size_bytes=None):
+    """Record the duration and, when it succeeded, the file size of one PDF report"""
+    REPORT_RENDER_DURATION.labels(report_type=report_type, status=status).observe(seconds)
+    if size_bytes is not None:
+        REPORT_SIZE.labels(report_type=report_type).observe(size_bytes)
+
+
+# ===== EXPOSITION =====
+
+def generate_metrics():
+    """
+    Metrics in the Prometheus text format
+
+    In multiprocess mode the values of every worker process (web workers
+    and report workers) are read from the shared directory and summed.
+    """
+    if os.environ.get(MULTIPROCESS_DIR_VARIABLE):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def _on_database_error(context):
+    message = str(context.original_exception).lower()
+    if any(lock_message in message for lock_message in LOCK_ERROR_MESSAGES):
+        DB_LOCK_ERRORS.inc()
+
+
+def init_metrics(app):
+    """
+    Record request latencies and database lock errors, and serve /metrics
+
+    /metrics answers loopback clients only, like /_metrics. Without
+    PROMETHEUS_MULTIPROC_DIR every process keeps its own values and a scrape
+    sees whichever worker answered it.
+
+    Args:
+        app (Flask): Application with db initialized
+    """
+    if not app.config.get('METRICS', True):
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'handle_error', _on_database_error)
+
+    @app.before_request
+    def start_request_timer():
+        if request.blueprint:
+            g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            REQUEST_DURATION.labels(
+                endpoint=request.endpoint, method=request.method, status=response.status_code
+            ).observe(time.perf_counter() - started)
+        return response
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        if not is_loopback_address(request.remote_addr):
+            abort(404)
+        return Response(generate_metrics(), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,211 @@
+import datetime
+import logging
+from sqlalchemy import inspect, select, text, func
+from sqlalchemy.exc import IntegrityError, OperationalError
+from models import (db, WorkItem, CostCode, SubJob, RollupTotal, WorkItemStepProgress, ReportJob, SchemaMigration,
+                    ProgressEvent, ProgressSnapshot)
+
+logger = logging.getLogger(__name__)
+
+
+# ===== MIGRATION STEPS =====
+#
+# db.create_all() creates missing tables with everything declared in
+# models.py, but never changes a table that already exists. Each step below
+# brings an existing database up to date and must be idempotent, because a
+# fresh database already has what it adds. Steps spell out their DDL rather
+# than reading models.py, so a version always applies the same change.
+
+def _add_column(connection, table_name, column_name, column_ddl):
+    """Add a column to an existing table unless it is already there"""
+    columns = {column['name'] for column in inspect(connection).get_columns(table_name)}
+    if column_name not in columns:
+        connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_ddl}"))
+
+
+def _execute_all(connection, statements):
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def _add_report_cache_key(connection):
+    _add_column(connection, 'report_job', 'cache_key', 'VARCHAR(64)')
+    _execute_all(connection, [
+        "CREATE INDEX IF NOT EXISTS ix_report_job_cache_key ON report_job (cache_key)",
+    ])
+
+
+def _add_filter_indexes(connection):
+    _execute_all(connection, [
+        "CREATE INDEX IF NOT EXISTS ix_sub_job_project_id ON sub_job (project_id)",
+        "CREATE INDEX IF NOT EXISTS ix_cost_code_project_discipline ON cost_code (project_id, discipline)",
+        "CREATE INDEX IF NOT EXISTS ix_cost_code_discipline ON cost_code (discipline)",
+        "CREATE INDEX IF NOT EXISTS ix_cost_code_rule_of_credit_id ON cost_code (rule_of_credit_id)",
+        "CREATE INDEX IF NOT EXISTS ix_work_item_project_id ON work_item (project_id)",
+        "CREATE INDEX IF NOT EXISTS ix_work_item_project_progress ON work_item (project_id, percent_complete_hours)",
+        "CREATE INDEX IF NOT EXISTS ix_work_item_sub_job_id ON work_item (sub_job_id)",
+        "CREATE INDEX IF NOT EXISTS ix_work_item_cost_code_id ON work_item (cost_code_id)",
+        "CREATE INDEX IF NOT EXISTS ix_step_progress_step_percentage ON work_item_step_progress (step_name, percentage)",
+    ])
+
+
+def _add_work_item_sort_indexes(connection):
+    _execute_all(connection, [
+        "CREATE INDEX IF NOT EXISTS ix_work_item_project_id_str ON work_item (project_id, work_item_id_str)",
+        "CREATE INDEX IF NOT EXISTS ix_work_item_sub_job_id_str ON work_item (sub_job_id, work_item_id_str)",
+        "CREATE INDEX IF NOT EXISTS ix_work_item_description ON work_item (description)",
+        "CREATE INDEX IF NOT EXISTS ix_work_item_project_description ON work_item (project_id, description)",
+        "CREATE INDEX IF NOT EXISTS ix_work_item_sub_job_description ON work_item (sub_job_id, description)",
+        "CREATE INDEX IF NOT EXISTS ix_work_item_progress ON work_item (percent_complete_hours)",
+        "CREATE INDEX IF NOT EXISTS ix_work_item_sub_job_progress ON work_item (sub_job_id, percent_complete_hours)",
+        "CREATE INDEX IF NOT EXISTS ix_work_item_cost_code_project ON work_item (cost_code_id, project_id)",
+        "CREATE INDEX IF NOT EXISTS ix_work_item_cost_code_sub_job ON work_item (cost_code_id, sub_job_id)",
+    ])
+    # The cost code sort joins tables; the planner needs statistics to read it in index order
+    analyze_database(connection)
+
+
+# Ordered (version, name, step) list; append new steps with the next version
+MIGRATIONS = [
+    (1, 'Add report_job.cache_key for the report cache', _add_report_cache_key),
+    (2, 'Index work item, cost code and sub job filter columns', _add_filter_indexes),
+    (3, 'Index work item listing sort orders', _add_work_item_sort_indexes),
+]
+
+
+# ===== RUNNER =====
+
+def get_applied_versions():
+    """Return the set of migration versions recorded in this database"""
+    return set(db.session.execute(select(SchemaMigration.version)).scalars())
+
+
+def pending_migrations():
+    """Return the (version, name, step) migrations not yet applied"""
+    applied = get_applied_versions()
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+
+def run_migrations():
+    """
+    Apply pending migrations in version order, each in its own transaction
+
+    Expects db.create_all() to have run first, so new tables (including
+    schema_migration) exist. Safe to run from several workers at once: a
+    version another worker recorded first is skipped.
+
+    Returns:
+        list: Names of the migrations applied by this call
+    """
+    applied = []
+    for version, name, step in pending_migrations():
+        try:
+            with db.engine.begin() as connection:
+                step(connection)
+                connection.execute(SchemaMigration.__table__.insert().values(
+                    version=version, name=name, applied_at=datetime.datetime.utcnow()
+                ))
+        except IntegrityError:
+            # Recorded by another worker in the meantime
+            continue
+        logger.info("Applied migration %d: %s", version, name)
+        applied.append(name)
+    return applied
+
+
+def analyze_database(connection=None):
+    """
+    Refresh the statistics the query planner uses to pick indexes and join orders
+
+    Worth rerunning as the data grows; ANALYZE is the same statement on
+    SQLite and PostgreSQL.
+    """
+    if connection is None:
+        with db.engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+    else:
+        connection.execute(text("ANALYZE"))
+
+
+# ===== QUERY PLAN CHECK =====
+
+def _hot_queries():
+    """Representative statements for the filters routes.py and the services run constantly"""
+    return [
+        ('work items of a project, newest first',
+         select(WorkItem.id).where(WorkItem.project_id == 1).order_by(WorkItem.id.desc()).limit(50)),
+        ('work items of a project by ID string',
+         select(WorkItem.id).where(WorkItem.project_id == 1)
+         .order_by(WorkItem.work_item_id_str, WorkItem.id).limit(50)),
+        ('work items of a sub job by description',
+         select(WorkItem.id).where(WorkItem.sub_job_id == 1)
+         .order_by(WorkItem.description.asc().nulls_first(), WorkItem.id).limit(50)),
+        ('work items of a project by progress',
+         select(WorkItem.id).where(WorkItem.project_id == 1, WorkItem.percent_complete_hours.isnot(None))
+         .order_by(WorkItem.percent_complete_hours.desc().nulls_last(), WorkItem.id.desc()).limit(50)),
+        ('work items of a sub job',
+         select(WorkItem.id).where(WorkItem.sub_job_id == 1)),
+        ('work items of a cost code',
+         select(WorkItem.id).where(WorkItem.cost_code_id == 1)),
+        ('in progress work items of a project',
+         select(WorkItem.id).where(WorkItem.project_id == 1, WorkItem.percent_complete_hours > 0,
+                                   WorkItem.percent_complete_hours < 100)),
+        ('work items of a discipline',
+         select(WorkItem.id).join(CostCode, WorkItem.cost_code_id == CostCode.id)
+         .where(CostCode.discipline == 'Piping')),
+        ('work items using a rule of credit',
+         select(WorkItem.id).join(CostCode, WorkItem.cost_code_id == CostCode.id)
+         .where(CostCode.rule_of_credit_id == 1)),
+        ('cost codes of a project and discipline',
+         select(CostCode.id).where(CostCode.project_id == 1, CostCode.discipline == 'Piping')),
+        ('sub jobs of a project',
+         select(SubJob.id).where(SubJob.project_id == 1)),
+        ('rollups of a project',
+         select(RollupTotal.id).where(RollupTotal.scope == 'sub_job', RollupTotal.project_id == 1)),
+        ('step progress of a work item',
+         select(WorkItemStepProgress.percentage).where(WorkItemStepProgress.work_item_id == 1)),
+        ('report jobs of a cache key',
+         select(ReportJob.id).where(ReportJob.cache_key == 'key')),
+        ('work item count of a project',
+         select(func.count(WorkItem.id)).where(WorkItem.project_id == 1)),
+        ('weekly progress snapshots of a project',
+         select(ProgressSnapshot.id).where(ProgressSnapshot.project_id == 1, ProgressSnapshot.scope == 'project',
+                                           ProgressSnapshot.group_key == '1',
+                                           ProgressSnapshot.period_start >= datetime.date(2024, 1, 1))),
+        ('progress events of a project since a date',
+         select(ProgressEvent.id).where(ProgressEvent.project_id == 1,
+                                        ProgressEvent.recorded_at >= datetime.datetime(2024, 1, 1))),
+    ]
+
+
+def check_query_plans():
+    """
+    Run EXPLAIN QUERY PLAN on the hot queries and report full table scans and sorts
+
+    Only supported on SQLite, whose plans name scans as "SCAN <table>"
+    when no index is used, and sorts as "USE TEMP B-TREE FOR ORDER BY".
+
+    Returns:
+        list: (query name, plan detail) for each step that scans a whole
+              table or sorts the rows, or the error for queries that cannot
+              run on this schema
+    """
+    if db.engine.dialect.name != 'sqlite':
+        raise RuntimeError("The query plan check only supports SQLite")
+
+    problems = []
+    # A new connection sees indexes created since the session's transaction began
+    with db.engine.connect() as connection:
+        for name, statement in _hot_queries():
+            sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+            try:
+                plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+            except OperationalError as e:
+                # Typically a column added by a migration that has not run yet
+                problems.append((name, str(e.orig)))
+                continue
+            for row in plan:
+                detail = row[-1]
+                if (detail.startswith('SCAN ') and ' USING ' not in detail) or 'TEMP B-TREE FOR ORDER BY' in detail:
+                    problems.append((name, detail))
+    return problems
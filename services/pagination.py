@@ -0,0 +1,155 @@
+import base64
+import json
+from collections import namedtuple
+from sqlalchemy import and_, or_
+
+# One ORDER BY term of a keyset: SQL expression, direction, how to read the
+# same value from a loaded row, and whether the column can be NULL (first key
+# only). Sort on plain columns, not expressions such as coalesce, so an index
+# can supply the order; NULLs sort first ascending and last descending.
+SortKey = namedtuple('SortKey', ['expression', 'descending', 'value', 'nullable'], defaults=[False])
+
+# Page of results with cursors for the neighbouring pages (None at either end)
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor', 'prev_cursor'])
+
+
+def encode_cursor(values):
+    """Encode the sort key values of a row as an opaque URL-safe cursor"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is not valid
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (TypeError, UnicodeError, json.JSONDecodeError, base64.binascii.Error) as e:
+        raise ValueError(f"Invalid page cursor: {cursor}") from e
+    if not isinstance(values, list):
+        raise ValueError(f"Invalid page cursor: {cursor}")
+    return values
+
+
+def _after(sort_keys, values, reverse=False):
+    """
+    Filter for rows strictly after values in sort_keys order
+
+    Expands to (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ..., with < for
+    descending keys, which works on every database and with mixed directions.
+    Values must not be NULL; see _segments.
+    """
+    clauses = []
+    for position, key in enumerate(sort_keys):
+        descending = key.descending != reverse
+        value = values[position]
+        comparison = key.expression < value if descending else key.expression > value
+        equal_prefix = [sort_keys[i].expression == values[i] for i in range(position)]
+        clauses.append(and_(*equal_prefix, comparison))
+    return or_(*clauses)
+
+
+def _segments(sort_keys, values, reverse=False):
+    """
+    Filters for the rows after a cursor, as parts to read one after another
+
+    Adding "OR key IS NULL" to the cursor filter would make the database scan
+    the index from its start, so when the first key is nullable its NULL and
+    non-NULL rows are read as separate index ranges, in sort order: NULLs
+    first ascending and last descending. Only the first key may be nullable.
+
+    Args:
+        values (list): Sort key values of the cursor row, or None without a cursor
+
+    Returns:
+        list: Filter clauses (None for no filter), in the order of their rows
+    """
+    first = sort_keys[0]
+    if not first.nullable:
+        return [_after(sort_keys, values, reverse) if values is not None else None]
+
+    descending = first.descending != reverse
+    null_part = first.expression.is_(None)
+    not_null_part = first.expression.isnot(None)
+    if values is None:
+        return [not_null_part, null_part] if descending else [null_part, not_null_part]
+    if values[0] is None:
+        # Within the NULLs the remaining keys decide the order
+        parts = [and_(null_part, _after(sort_keys[1:], values[1:], reverse))]
+        return parts if descending else parts + [not_null_part]
+    parts = [_after(sort_keys, values, reverse)]
+    return parts + [null_part] if descending else parts
+
+
+def _order_by(sort_keys, reverse=False):
+    terms = []
+    for key in sort_keys:
+        descending = key.descending != reverse
+        term = key.expression.desc() if descending else key.expression.asc()
+        if key.nullable:
+            # SQLite's default placement; spelled out so PostgreSQL matches the cursor filter
+            term = term.nulls_last() if descending else term.nulls_first()
+        terms.append(term)
+    return terms
+
+
+def keyset_page(query, sort_keys, page_size, after=None, before=None):
+    """
+    Fetch one page of query using keyset (cursor) pagination
+
+    Each page is an index range scan starting at the cursor row, so its cost
+    does not depend on how deep into the results it is. The last sort key
+    must be unique (e.g. the primary key) so every row has a distinct position.
+
+    Args:
+        query: SQLAlchemy query with filters applied and no ORDER BY
+        sort_keys (list): SortKey terms defining the order
+        page_size (int): Rows per page
+        after (str): Cursor of the row the page starts after
+        before (str): Cursor of the row the page ends before (previous page)
+
+    Returns:
+        KeysetPage
+
+    Raises:
+        ValueError: If the cursor is not valid for these sort keys
+    """
+    reverse = bool(before) and not after
+    cursor = after or before
+
+    values = None
+    if cursor:
+        values = decode_cursor(cursor)
+        if (len(values) != len(sort_keys) or values[-1] is None
+                or not all(value is None or isinstance(value, (str, int, float)) for value in values)):
+            # A cursor of another sort order, truncated or edited
+            raise ValueError(f"Invalid page cursor: {cursor}")
+
+    order_by = _order_by(sort_keys, reverse=reverse)
+    rows = []
+    for segment in _segments(sort_keys, values, reverse=reverse):
+        segment_query = query.filter(segment) if segment is not None else query
+        rows.extend(segment_query.order_by(*order_by).limit(page_size + 1 - len(rows)).all())
+        if len(rows) > page_size:
+            break
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    def row_cursor(row):
+        return encode_cursor([key.value(row) for key in sort_keys])
+
+    if reverse:
+        next_cursor = row_cursor(rows[-1]) if rows else None
+        prev_cursor = row_cursor(rows[0]) if rows and has_more else None
+    else:
+        next_cursor = row_cursor(rows[-1]) if rows and has_more else None
+        prev_cursor = row_cursor(rows[0]) if rows and cursor else None
+
+    return KeysetPage(rows, next_cursor, prev_cursor)
@@ -0,0 +1,246 @@
+import datetime
+import hashlib
+import json
+import time
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from models import db, WorkItem, CostCode, WorkItemStepProgress, ProgressBatch
+from services.database import upsert_insert
+from services.rule_cache import get_compiled_rule
+from services.ev_kernel import EarnedValueInputs, compute_earned_value_arrays, write_earned_values
+from services.rollups import record_earned_value_changes
+from services.metrics import record_recalculation_batch
+
+# Largest number of updates accepted in one batch
+MAX_BATCH_SIZE = 5000
+
+MAX_BATCH_ID_LENGTH = 100
+
+
+class BatchConflictError(ValueError):
+    """A batch ID was reused with different updates"""
+
+
+def parse_progress_updates(updates):
+    """
+    Check the shape of a list of progress updates
+
+    Each update is a {"work_item_id": int, "step": str, "percent": number}
+    dictionary; percent must be between 0 and 100.
+
+    Returns:
+        list: (work_item_id, step, percent, error) per update, error being
+              None for valid updates
+
+    Raises:
+        ValueError: If updates is not a list or is too long
+    """
+    if not isinstance(updates, list):
+        raise ValueError("updates must be a list")
+    if len(updates) > MAX_BATCH_SIZE:
+        raise ValueError(f"A batch can hold at most {MAX_BATCH_SIZE} updates")
+
+    parsed = []
+    for update in updates:
+        if not isinstance(update, dict):
+            parsed.append((None, None, None, "Update must be an object"))
+            continue
+        work_item_id = update.get('work_item_id')
+        step = update.get('step')
+        percent = update.get('percent')
+        if not isinstance(work_item_id, int) or isinstance(work_item_id, bool):
+            parsed.append((work_item_id, step, percent, "work_item_id must be an integer"))
+        elif not isinstance(step, str) or not step:
+            parsed.append((work_item_id, step, percent, "step must be a step name"))
+        elif not isinstance(percent, (int, float)) or isinstance(percent, bool) or not 0 <= percent <= 100:
+            parsed.append((work_item_id, step, percent, "percent must be a number from 0 to 100"))
+        else:
+            parsed.append((work_item_id, step, float(percent), None))
+    return parsed
+
+
+def _payload_hash(updates):
+    return hashlib.sha256(json.dumps(updates, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _stored_result(batch_id, payload_hash):
+    batch = db.session.get(ProgressBatch, batch_id)
+    if batch is None:
+        return None
+    if batch.payload_hash != payload_hash:
+        raise BatchConflictError(f"Batch {batch_id} was already applied with different updates")
+    result = batch.get_result()
+    result['replayed'] = True
+    return result
+
+
+def _load_items(work_item_ids):
+    """Work item rows with everything needed for rules, earned values and rollups, by ID"""
+    rows = db.session.execute(
+        select(
+            WorkItem.id,
+            WorkItem.project_id,
+            WorkItem.budgeted_man_hours,
+            WorkItem.budgeted_quantity,
+            CostCode.rule_of_credit_id,
+            WorkItem.sub_job_id,
+            WorkItem.cost_code_id,
+            CostCode.discipline,
+            WorkItem.earned_man_hours,
+            WorkItem.earned_quantity
+        ).join(CostCode, WorkItem.cost_code_id == CostCode.id)
+        .where(WorkItem.id.in_(work_item_ids))
+        .order_by(WorkItem.id)
+    ).all()
+    return {row.id: row for row in rows}
+
+
+def apply_progress_batch(batch_id, updates):
+    """
+    Apply many step progress updates in one transaction, at most once per batch ID
+
+    Step progress is written with one executemany upsert, earned values of
+    the touched work items are recomputed together with the cached compiled
+    rules and written with one executemany UPDATE, and the rollups receive
+    one upsert per affected group. Invalid updates (unknown work item, step
+    not in the item's rule) are reported per update while the valid ones are
+    applied. The response is stored under the batch ID, so a client retrying
+    after a lost response gets the same result without applying it twice.
+
+    Args:
+        batch_id (str): Client chosen ID of the batch
+        updates (list): {"work_item_id", "step", "percent"} dictionaries
+
+    Returns:
+        dict: batch_id, replayed, applied and failed counts, and one result
+              per update in request order
+
+    Raises:
+        ValueError: If the batch ID or the updates list is malformed
+        BatchConflictError: If the batch ID was used before with different updates
+    """
+    if not isinstance(batch_id, str) or not batch_id.strip() or len(batch_id) > MAX_BATCH_ID_LENGTH:
+        raise ValueError(f"batch_id must be a non-empty string of at most {MAX_BATCH_ID_LENGTH} characters")
+    parsed = parse_progress_updates(updates)
+    payload_hash = _payload_hash(updates)
+
+    stored = _stored_result(batch_id, payload_hash)
+    if stored is not None:
+        return stored
+
+    items = _load_items({work_item_id for work_item_id, _, _, error in parsed if error is None})
+    rules = {}
+    results = []
+    progress = {}  # (work item ID, step) -> percent; later updates of the same step win
+    for work_item_id, step, percent, error in parsed:
+        item = items.get(work_item_id) if error is None else None
+        if error is None and item is None:
+            error = f"Work item {work_item_id} not found"
+        if error is None:
+            rule_id = item.rule_of_credit_id
+            if rule_id not in rules:
+                rules[rule_id] = get_compiled_rule(rule_id)
+            if rules[rule_id] is None:
+                error = "The work item's cost code has no rule of credit"
+            elif step not in rules[rule_id].weights:
+                error = f"Step '{step}' is not part of the rule of credit"
+
+        if error is None:
+            progress[(work_item_id, step)] = percent
+            results.append({'work_item_id': work_item_id, 'step': step, 'status': 'updated'})
+        else:
+            results.append({'work_item_id': work_item_id, 'step': step, 'status': 'error', 'error': error})
+
+    if progress:
+        statement = upsert_insert(WorkItemStepProgress.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=['work_item_id', 'step_name'],
+            set_={'percentage': statement.excluded.percentage}
+        )
+        db.session.execute(statement, [
+            {'work_item_id': work_item_id, 'step_name': step, 'percentage': percent}
+            for (work_item_id, step), percent in progress.items()
+        ])
+
+        values = _recompute(sorted({work_item_id for work_item_id, _ in progress}), items, rules)
+        for result in results:
+            if result['status'] == 'updated':
+                result.update(values[result['work_item_id']])
+
+    applied = sum(1 for result in results if result['status'] == 'updated')
+    response = {
+        'batch_id': batch_id,
+        'replayed': False,
+        'applied': applied,
+        'failed': len(results) - applied,
+        'results': results
+    }
+
+    db.session.add(ProgressBatch(
+        batch_id=batch_id,
+        payload_hash=payload_hash,
+        item_count=len(results),
+        result_json=json.dumps(response)
+    ))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # The same batch was applied concurrently by another request
+        db.session.rollback()
+        return _stored_result(batch_id, payload_hash)
+    return response
+
+
+def _recompute(work_item_ids, items, rules):
+    """
+    Recompute and store earned values of the updated work items and update the rollups
+
+    Returns:
+        dict: Work item ID -> new earned_man_hours, percent_complete_hours,
+              earned_quantity and percent_complete_quantity
+    """
+    started = time.monotonic()
+    rows = [items[work_item_id] for work_item_id in work_item_ids]
+    progress_rows = db.session.execute(
+        select(WorkItemStepProgress.work_item_id, WorkItemStepProgress.step_name, WorkItemStepProgress.percentage)
+        .where(WorkItemStepProgress.work_item_id.in_(work_item_ids))
+    ).all()
+    used_rules = {rule_id: rule for rule_id, rule in rules.items() if rule is not None}
+
+    inputs = EarnedValueInputs(rows, progress_rows, used_rules)
+    values = compute_earned_value_arrays(inputs)
+    write_earned_values(inputs.work_item_ids, values)
+
+    record_earned_value_changes([
+        (row.id, row.project_id, row.sub_job_id, row.cost_code_id, row.discipline, {
+            'earned_man_hours': earned_hours - (row.earned_man_hours or 0),
+            'earned_quantity': earned_quantity - (row.earned_quantity or 0)
+        })
+        for row, earned_hours, earned_quantity in zip(
+            rows, values['earned_man_hours'].tolist(), values['earned_quantity'].tolist()
+        )
+    ])
+    record_recalculation_batch('progress_batch', len(rows), time.monotonic() - started)
+
+    return {
+        row.id: {
+            'earned_man_hours': values['earned_man_hours'][index].item(),
+            'percent_complete_hours': values['percent_complete_hours'][index].item(),
+            'earned_quantity': values['earned_quantity'][index].item(),
+            'percent_complete_quantity': values['percent_complete_quantity'][index].item()
+        }
+        for index, row in enumerate(rows)
+    }
+
+
+def purge_progress_batches(max_age_days=30):
+    """
+    Delete stored batch results older than max_age_days
+
+    Returns:
+        int: Number of batches deleted
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=max_age_days)
+    deleted = ProgressBatch.query.filter(ProgressBatch.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
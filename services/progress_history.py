@@ -0,0 +1,263 @@
+import datetime
+from sqlalchemy import select, func
+from models import db, ProgressEvent, ProgressSnapshot, RollupTotal
+from services.database import upsert_insert
+
+# Value columns of progress events, snapshots and rollups
+HISTORY_COLUMNS = ('item_count', 'budgeted_man_hours', 'earned_man_hours', 'budgeted_quantity', 'earned_quantity')
+
+# Snapshot scopes; group keys match rollup_total
+HISTORY_SCOPES = ('project', 'sub_job')
+
+
+def week_start(value):
+    """Monday of the week a date or datetime falls in"""
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return value - datetime.timedelta(days=value.weekday())
+
+
+# ===== EVENTS =====
+
+def record_progress_events(events):
+    """
+    Append progress events in the current transaction
+
+    Args:
+        events (list): Dictionaries with work_item_id, project_id, sub_job_id
+                       and changes of the HISTORY_COLUMNS (missing ones are 0)
+    """
+    if not events:
+        return
+    recorded_at = datetime.datetime.utcnow()
+    db.session.execute(ProgressEvent.__table__.insert(), [
+        dict({column: event.get(column, 0) for column in HISTORY_COLUMNS},
+             work_item_id=event.get('work_item_id'),
+             project_id=event['project_id'],
+             sub_job_id=event['sub_job_id'],
+             recorded_at=recorded_at)
+        for event in events
+    ])
+
+
+def record_aggregate_events(changes):
+    """
+    Append one event per sub job for the net change of a bulk operation
+
+    Imports and recalculations change thousands of work items at once; an
+    event per sub job, without a work item ID, keeps the weekly history
+    exact without an event per item.
+
+    Args:
+        changes (dict): (project ID, sub job ID) -> changes of the HISTORY_COLUMNS
+    """
+    record_progress_events([
+        dict(values, project_id=project_id, sub_job_id=sub_job_id)
+        for (project_id, sub_job_id), values in changes.items()
+        if any(values.values())
+    ])
+
+
+# ===== COMPACTION =====
+
+def _current_totals(project_id):
+    """Cumulative totals per (scope, group key) from the materialized rollups"""
+    rows = db.session.execute(
+        select(RollupTotal.scope, RollupTotal.group_key, *[getattr(RollupTotal, column) for column in HISTORY_COLUMNS])
+        .where(RollupTotal.project_id == project_id, RollupTotal.scope.in_(HISTORY_SCOPES))
+    ).all()
+    return {(row[0], row[1]): list(row[2:]) for row in rows}
+
+
+def _compaction_start(project_id, current_week):
+    """First week to (re)compact: the last compacted week, else the week of the first event"""
+    last_compacted = db.session.query(func.max(ProgressSnapshot.period_start)).filter(
+        ProgressSnapshot.project_id == project_id,
+        ProgressSnapshot.scope == 'project'
+    ).scalar()
+    if last_compacted:
+        return min(last_compacted, current_week)
+    first_event = db.session.query(func.min(ProgressEvent.recorded_at)).filter(
+        ProgressEvent.project_id == project_id
+    ).scalar()
+    return week_start(first_event) if first_event else current_week
+
+
+def compact_project_history(project_id, today=None):
+    """
+    Write weekly snapshots of a project and its sub jobs from its progress events
+
+    The current rollup totals anchor the latest week; earlier weeks are
+    derived by subtracting the events recorded after them. Weeks from the
+    last compacted one up to the current week are (re)written, so running
+    this daily keeps the open week current and closes finished weeks.
+    Imports and bulk recalculations after rule edits record one aggregate
+    event per sub job, so they land in the week they ran. Changes made
+    without events (rollup rebuilds) show up in the week that is open when
+    they are compacted.
+
+    Args:
+        project_id (int): Project to compact
+        today (date): Reference date, defaults to today (UTC)
+
+    Returns:
+        int: Number of snapshot rows written
+    """
+    current_week = week_start(today or datetime.datetime.utcnow().date())
+    start_week = _compaction_start(project_id, current_week)
+    weeks = []
+    week = start_week
+    while week <= current_week:
+        weeks.append(week)
+        week += datetime.timedelta(days=7)
+
+    # Changes per (scope, group key) and week, streamed from the events since start_week
+    changes = {}
+    events = db.session.execute(
+        select(ProgressEvent.sub_job_id, ProgressEvent.recorded_at,
+               *[getattr(ProgressEvent, column) for column in HISTORY_COLUMNS])
+        .where(ProgressEvent.project_id == project_id,
+               ProgressEvent.recorded_at >= datetime.datetime.combine(start_week, datetime.time.min))
+    )
+    for row in events:
+        week = min(week_start(row[1]), current_week)
+        for group in (('project', str(project_id)), ('sub_job', str(row[0]))):
+            totals = changes.setdefault(group, {}).setdefault(week, [0] * len(HISTORY_COLUMNS))
+            for index, value in enumerate(row[2:]):
+                totals[index] += value or 0
+
+    current = _current_totals(project_id)
+    snapshot_rows = []
+    compacted_at = datetime.datetime.utcnow()
+    earned_hours_index = HISTORY_COLUMNS.index('earned_man_hours')
+    earned_quantity_index = HISTORY_COLUMNS.index('earned_quantity')
+    for group in set(current) | set(changes):
+        scope, group_key = group
+        cumulative = list(current.get(group, [0] * len(HISTORY_COLUMNS)))
+        group_changes = changes.get(group, {})
+        # Walk back from the current totals, one week at a time
+        for week in reversed(weeks):
+            period = group_changes.get(week, [0] * len(HISTORY_COLUMNS))
+            row = dict(zip(HISTORY_COLUMNS, cumulative))
+            row.update(
+                scope=scope,
+                project_id=project_id,
+                group_key=group_key,
+                period_start=week,
+                earned_man_hours_period=period[earned_hours_index],
+                earned_quantity_period=period[earned_quantity_index],
+                compacted_at=compacted_at
+            )
+            snapshot_rows.append(row)
+            cumulative = [value - change for value, change in zip(cumulative, period)]
+
+    if snapshot_rows:
+        statement = upsert_insert(ProgressSnapshot.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=['scope', 'project_id', 'group_key', 'period_start'],
+            set_={column: statement.excluded[column] for column in HISTORY_COLUMNS + (
+                'earned_man_hours_period', 'earned_quantity_period', 'compacted_at')}
+        )
+        db.session.execute(statement, snapshot_rows)
+    return len(snapshot_rows)
+
+
+def compact_progress_history(project_id=None, today=None):
+    """
+    Compact the progress history of one project or of every project with rollups
+
+    Meant to run periodically (e.g. nightly from cron with the
+    compact-progress-history command). Commits after each project.
+
+    Returns:
+        int: Number of snapshot rows written
+    """
+    if project_id is not None:
+        project_ids = [project_id]
+    else:
+        project_ids = sorted(set(db.session.execute(select(RollupTotal.project_id).distinct()).scalars()) |
+                             set(db.session.execute(select(ProgressEvent.project_id).distinct()).scalars()))
+    written = 0
+    for each_project_id in project_ids:
+        written += compact_project_history(each_project_id, today=today)
+        db.session.commit()
+    return written
+
+
+# ===== TREND QUERIES =====
+
+def _period_dict(period_start, values, earned_hours_period, earned_quantity_period):
+    period = dict(zip(HISTORY_COLUMNS, values))
+    period.update(
+        period_start=period_start.isoformat(),
+        period_end=(period_start + datetime.timedelta(days=6)).isoformat(),
+        earned_man_hours_period=earned_hours_period,
+        earned_quantity_period=earned_quantity_period
+    )
+    budgeted_hours = period['budgeted_man_hours'] or 0
+    period['percent_complete_hours'] = (period['earned_man_hours'] / budgeted_hours) * 100 if budgeted_hours > 0 else 0
+    return period
+
+
+def progress_history(project_id, sub_job_id=None, start=None, end=None, today=None):
+    """
+    Weekly cumulative totals and period earned values for S-curves and trend charts
+
+    Reads the compacted snapshots with one range query on the
+    (project_id, period_start) index. The open week comes live from the
+    rollups, so the last point is current even between compactions.
+
+    Args:
+        project_id (int): Project to report
+        sub_job_id (int): Report this sub job of the project instead of the whole project
+        start (date): First week to include (any date in it)
+        end (date): Last week to include, defaults to the current week
+        today (date): Reference date, defaults to today (UTC)
+
+    Returns:
+        list: One dictionary per week, oldest first, with cumulative
+              HISTORY_COLUMNS, percent_complete_hours, earned hours and
+              quantity of the week and earned_man_hours_change versus the
+              previous week
+    """
+    scope, group_key = ('sub_job', str(int(sub_job_id))) if sub_job_id else ('project', str(int(project_id)))
+    current_week = week_start(today or datetime.datetime.utcnow().date())
+    end_week = min(week_start(end), current_week) if end else current_week
+
+    query = ProgressSnapshot.query.filter(
+        ProgressSnapshot.project_id == project_id,
+        ProgressSnapshot.scope == scope,
+        ProgressSnapshot.group_key == group_key,
+        ProgressSnapshot.period_start <= end_week
+    )
+    if start:
+        # One earlier week, for the period-over-period change of the first week
+        query = query.filter(ProgressSnapshot.period_start >= week_start(start) - datetime.timedelta(days=7))
+    snapshots = query.order_by(ProgressSnapshot.period_start).all()
+
+    periods = [
+        _period_dict(snapshot.period_start, [getattr(snapshot, column) for column in HISTORY_COLUMNS],
+                     snapshot.earned_man_hours_period, snapshot.earned_quantity_period)
+        for snapshot in snapshots
+        if snapshot.period_start < current_week
+    ]
+
+    if end_week == current_week:
+        live = _current_totals(project_id).get((scope, group_key), [0] * len(HISTORY_COLUMNS))
+        previous = periods[-1] if periods else None
+        periods.append(_period_dict(
+            current_week,
+            live,
+            live[HISTORY_COLUMNS.index('earned_man_hours')] - (previous['earned_man_hours'] if previous else 0),
+            live[HISTORY_COLUMNS.index('earned_quantity')] - (previous['earned_quantity'] if previous else 0)
+        ))
+
+    for index, period in enumerate(periods):
+        previous_earned = periods[index - 1]['earned_man_hours_period'] if index else None
+        period['earned_man_hours_change'] = (
+            period['earned_man_hours_period'] - previous_earned if previous_earned is not None else None
+        )
+
+    if start:
+        periods = [period for period in periods if period['period_start'] >= week_start(start).isoformat()]
+    return periods
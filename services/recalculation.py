@@ -0,0 +1,198 @@
+import datetime
+import threading
+import time
+import uuid
+from models import db, WorkItem, CostCode, WorkItemStepProgress, RecalculationJob
+from services.rule_cache import preload_rules
+from services.ev_kernel import EarnedValueInputs, compute_earned_value_arrays, write_earned_values
+from services.rollups import rebuild_rollups
+from services.database import lock_for_update
+from services.progress_history import record_aggregate_events
+from services.metrics import record_recalculation_batch
+
+# Work items loaded, computed and updated per transaction
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def _affected_items_query(rule_id=None, cost_code_id=None, project_id=None):
+    """Build the query for work item rows that need recalculating"""
+    query = db.session.query(
+        WorkItem.id,
+        WorkItem.project_id,
+        WorkItem.budgeted_man_hours,
+        WorkItem.budgeted_quantity,
+        CostCode.rule_of_credit_id,
+        # After the EarnedValueInputs columns: for the progress history events
+        WorkItem.sub_job_id,
+        WorkItem.earned_man_hours,
+        WorkItem.earned_quantity
+    ).join(CostCode, WorkItem.cost_code_id == CostCode.id)
+
+    if rule_id is not None:
+        query = query.filter(CostCode.rule_of_credit_id == rule_id)
+    if cost_code_id is not None:
+        query = query.filter(WorkItem.cost_code_id == cost_code_id)
+    if project_id is not None:
+        query = query.filter(WorkItem.project_id == project_id)
+    return query
+
+
+def _load_progress_rows(work_item_ids):
+    """Load step progress for a chunk of work item IDs with one query"""
+    return db.session.query(
+        WorkItemStepProgress.work_item_id,
+        WorkItemStepProgress.step_name,
+        WorkItemStepProgress.percentage
+    ).filter(WorkItemStepProgress.work_item_id.in_(work_item_ids)).all()
+
+
+def _history_changes(rows, values):
+    """Net earned value change per (project, sub job) of a recalculated chunk"""
+    changes = {}
+    for row, earned_hours, earned_quantity in zip(
+        rows, values['earned_man_hours'].tolist(), values['earned_quantity'].tolist()
+    ):
+        totals = changes.setdefault((row.project_id, row.sub_job_id),
+                                    {'earned_man_hours': 0.0, 'earned_quantity': 0.0})
+        totals['earned_man_hours'] += earned_hours - (row.earned_man_hours or 0)
+        totals['earned_quantity'] += earned_quantity - (row.earned_quantity or 0)
+    return changes
+
+
+def recalculate_work_items(rule_id=None, cost_code_id=None, project_id=None,
+                           chunk_size=DEFAULT_CHUNK_SIZE, progress_callback=None):
+    """
+    Recalculate stored earned values for many work items in chunks
+
+    Each chunk locks and loads work item and step progress rows with two
+    queries, computes earned values for the whole chunk with the NumPy
+    kernel and writes them back with one executemany UPDATE, then commits
+    together with one progress history event per sub job for the net
+    change. Rollups of the affected projects are rebuilt at the end.
+
+    Args:
+        rule_id (int): Only work items whose cost code uses this rule of credit
+        cost_code_id (int): Only work items with this cost code
+        project_id (int): Only work items of this project
+        chunk_size (int): Work items per transaction
+        progress_callback (callable): Called as (done, total, elapsed_seconds) after each chunk
+
+    Returns:
+        dict: Number of items and chunks processed and elapsed seconds
+    """
+    started = time.monotonic()
+    base_query = _affected_items_query(rule_id, cost_code_id, project_id)
+    total = base_query.count()
+    rules = preload_rules()
+
+    done = 0
+    chunks = 0
+    affected_project_ids = set()
+    last_id = 0
+
+    while True:
+        # Progress committed between reading a chunk and updating it would be
+        # overwritten with stale earned values, so the chunk stays locked until its commit
+        chunk_query = base_query.filter(WorkItem.id > last_id).order_by(WorkItem.id).limit(chunk_size)
+        rows = lock_for_update(chunk_query, of=WorkItem).all()
+        if not rows:
+            break
+
+        chunk_started = time.monotonic()
+        inputs = EarnedValueInputs(rows, _load_progress_rows([row.id for row in rows]), rules)
+        values = compute_earned_value_arrays(inputs)
+        affected_project_ids.update(row.project_id for row in rows)
+
+        write_earned_values(inputs.work_item_ids, values)
+        record_aggregate_events(_history_changes(rows, values))
+        db.session.commit()
+        record_recalculation_batch('recalculation', len(rows), time.monotonic() - chunk_started)
+
+        last_id = rows[-1].id
+        done += len(rows)
+        chunks += 1
+        if progress_callback:
+            progress_callback(done, total, time.monotonic() - started)
+
+    for affected_project_id in affected_project_ids:
+        rebuild_rollups(project_id=affected_project_id)
+    db.session.commit()
+
+    return {
+        'items': done,
+        'chunks': chunks,
+        'elapsed_seconds': time.monotonic() - started
+    }
+
+
+def get_recalculation_status(job_id):
+    """Return the status of a background recalculation started by any web worker"""
+    job = db.session.get(RecalculationJob, job_id)
+    return job.serialize() if job else None
+
+
+def _update_job(job_id, **values):
+    """Record a recalculation's progress; committed at once so other workers see it"""
+    job = db.session.get(RecalculationJob, job_id)
+    for name, value in values.items():
+        setattr(job, name, value)
+    db.session.commit()
+
+
+def start_recalculation(app, description, **filters):
+    """
+    Run recalculate_work_items in a background thread
+
+    Progress is stored in a RecalculationJob row, so the job can be polled
+    from any web worker, not only the one that started it.
+
+    Args:
+        app (Flask): Application used to open an app context in the thread
+        description (str): Label used in status and log output
+        **filters: rule_id, cost_code_id and/or project_id
+
+    Returns:
+        str: Job ID to poll with get_recalculation_status
+    """
+    job = RecalculationJob(id=uuid.uuid4().hex, description=description, status='running')
+    db.session.add(job)
+    db.session.commit()
+    job_id = job.id
+
+    def report_progress(done, total, elapsed):
+        _update_job(job_id, done=done, total=total, elapsed_seconds=elapsed)
+        app.logger.info("Recalculating %s: %d/%d work items (%.2fs)", description, done, total, elapsed)
+
+    def run():
+        with app.app_context():
+            try:
+                result = recalculate_work_items(progress_callback=report_progress, **filters)
+                _update_job(job_id, status='completed', done=result['items'], total=result['items'],
+                            elapsed_seconds=result['elapsed_seconds'], finished_at=datetime.datetime.utcnow())
+                app.logger.info("Recalculated %s: %d work items in %.2fs", description, result['items'],
+                                result['elapsed_seconds'])
+            except Exception as e:
+                db.session.rollback()
+                _update_job(job_id, status='failed', error=str(e), finished_at=datetime.datetime.utcnow())
+                app.logger.exception("Error recalculating %s", description)
+            finally:
+                db.session.remove()
+
+    threading.Thread(target=run, name=f"recalculate-{job_id[:8]}", daemon=True).start()
+    return job_id
+
+
+def purge_recalculation_jobs(max_age_hours=24):
+    """
+    Delete finished recalculation jobs older than max_age_hours
+
+    Returns:
+        int: Number of jobs deleted
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(hours=max_age_hours)
+    deleted = RecalculationJob.query.filter(
+        RecalculationJob.created_at < cutoff,
+        RecalculationJob.status.in_(('completed', 'failed'))
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
@@ -0,0 +1,123 @@
+import datetime
+import hashlib
+import os
+from services.versions import project_data_version
+from services.metrics import record_cache_lookup
+
+# Default size limit of the report cache directory
+DEFAULT_REPORT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# File extensions of cached reports: single PDFs and ZIP archives of several
+REPORT_FILE_EXTENSIONS = ('pdf', 'zip')
+
+
+def get_report_cache_dir(app):
+    """Directory holding cached report files"""
+    cache_dir = app.config.get('REPORT_CACHE_DIR') or os.path.join(app.instance_path, 'report_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def get_report_cache_max_bytes(app):
+    return app.config.get('REPORT_CACHE_MAX_BYTES', DEFAULT_REPORT_CACHE_MAX_BYTES)
+
+
+def report_cache_key(report_type, project_id, sub_job_id=None):
+    """
+    Content address of a report: the same key always means the same file
+
+    The key covers the report type, its scope, the project's data version
+    and the report date printed in the header, so any change to work items,
+    cost codes, sub jobs or rules of credit produces a new key.
+    """
+    parts = [
+        report_type,
+        str(project_id),
+        str(sub_job_id or ''),
+        project_data_version(project_id),
+        datetime.datetime.now().strftime("%Y-%m-%d")
+    ]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def report_cache_path(cache_dir, cache_key, extension='pdf'):
+    return os.path.join(cache_dir, f"{cache_key}.{extension}")
+
+
+def get_cached_report(cache_dir, cache_key, extension='pdf'):
+    """
+    Return the path of a cached report, or None on a miss
+
+    Hits refresh the file's modification time, which is the LRU order used
+    for eviction.
+    """
+    path = report_cache_path(cache_dir, cache_key, extension)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        record_cache_lookup('report', False)
+        return None
+    record_cache_lookup('report', True)
+    return path
+
+
+def store_report(cache_dir, cache_key, write_report, max_bytes=DEFAULT_REPORT_CACHE_MAX_BYTES, extension='pdf'):
+    """
+    Write a report into the cache atomically, then evict down to max_bytes
+
+    Args:
+        cache_dir (str): Report cache directory
+        cache_key (str): Key from report_cache_key
+        write_report (callable): Called with a temporary file path to write the report to
+        max_bytes (int): Size limit of the cache directory
+        extension (str): File extension of the report, one of REPORT_FILE_EXTENSIONS
+
+    Returns:
+        str: Path of the cached report
+    """
+    path = report_cache_path(cache_dir, cache_key, extension)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write_report(temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    evict_reports(cache_dir, max_bytes, keep=path)
+    return path
+
+
+def evict_reports(cache_dir, max_bytes, keep=None):
+    """
+    Delete least recently used reports until the cache fits in max_bytes
+
+    Returns:
+        int: Number of files deleted
+    """
+    entries = []
+    total_bytes = 0
+    with os.scandir(cache_dir) as scanned:
+        for entry in scanned:
+            if entry.name.rpartition('.')[2] not in REPORT_FILE_EXTENSIONS:
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_bytes += stat.st_size
+
+    deleted = 0
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+        deleted += 1
+    return deleted
@@ -0,0 +1,285 @@
+import datetime
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import Flask
+from models import db, Project, SubJob, ReportJob
+from services.database import init_database
+from services.metrics import record_report_render
+from services.report_cache import (
+    get_report_cache_dir, get_report_cache_max_bytes, report_cache_key, store_report
+)
+
+# Default number of report worker processes per web worker
+DEFAULT_REPORT_WORKERS = 2
+
+# Report types that can be queued; 'both' renders the quantities and hours
+# reports from one pass over the work items and ships them as one ZIP archive
+REPORT_TYPES = ('quantities', 'hours', 'both')
+
+# Report measures written into a combined 'both' archive
+COMBINED_REPORT_MEASURES = ('quantities', 'hours')
+
+# File extension and mimetype of each report type
+REPORT_FORMATS = {
+    'quantities': ('pdf', 'application/pdf'),
+    'hours': ('pdf', 'application/pdf'),
+    'both': ('zip', 'application/zip')
+}
+
+# Times a job is run before a crashing worker process marks it failed
+MAX_JOB_ATTEMPTS = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# App of a report worker process, built once by _init_worker
+_worker_app = None
+
+
+def _get_executor(app):
+    """Create the report process pool on first use in this process"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers do not inherit the web worker's open database connections
+            _executor = ProcessPoolExecutor(
+                max_workers=app.config.get('REPORT_WORKERS', DEFAULT_REPORT_WORKERS),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(_worker_config(app),)
+            )
+        return _executor
+
+
+def _discard_executor(executor):
+    """
+    Drop a pool broken by a dead worker process so the next job gets a fresh one
+
+    Only the given pool is dropped; another thread may already have replaced it.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit_job(app, job_id, attempt=1):
+    """Run a queued job in the pool, replacing the pool if a worker process died"""
+    args = (run_report_job, job_id, get_report_cache_dir(app), get_report_cache_max_bytes(app))
+    executor = _get_executor(app)
+    try:
+        future = executor.submit(*args)
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        executor = _get_executor(app)
+        future = executor.submit(*args)
+    future.add_done_callback(lambda done: _on_job_finished(app, job_id, executor, attempt, done))
+
+
+def _worker_config(app):
+    """Configuration a report worker process needs to open the database"""
+    return {
+        'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+        'SQLALCHEMY_ENGINE_OPTIONS': app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+        'SQLITE_PROFILE': app.config.get('SQLITE_PROFILE'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False
+    }
+
+
+def _build_download_name(report_type, project, sub_job):
+    prefix = f"{project.project_id_str}_{sub_job.sub_job_id_str}" if sub_job else project.project_id_str
+    if report_type == 'both':
+        return f"{prefix}_reports.zip"
+    return f"{prefix}_{report_type}_report.pdf"
+
+
+def get_report_download_name(report_type, project_id, sub_job_id=None):
+    """File name offered to the browser for a report"""
+    project = Project.query.get_or_404(project_id)
+    sub_job = SubJob.query.get_or_404(sub_job_id) if sub_job_id else None
+    return _build_download_name(report_type, project, sub_job)
+
+
+def submit_report_job(app, report_type, project_id, sub_job_id=None, cache_key=None):
+    """
+    Queue a report for generation in the worker pool
+
+    A job already queued or running for the same cache key is reused
+    instead of generating the same report twice.
+
+    Args:
+        app (Flask): Current application
+        report_type (str): 'quantities', 'hours' or 'both'
+        project_id (int): Project to report on
+        sub_job_id (int): Optional sub job to restrict the report to
+        cache_key (str): Report cache key, computed if not given
+
+    Returns:
+        ReportJob: The queued job
+    """
+    if report_type not in REPORT_TYPES:
+        raise ValueError(f"Unknown report type: {report_type}")
+
+    download_name = get_report_download_name(report_type, project_id, sub_job_id)
+    if cache_key is None:
+        cache_key = report_cache_key(report_type, project_id, sub_job_id)
+
+    pending_job = ReportJob.query.filter(
+        ReportJob.cache_key == cache_key,
+        ReportJob.status.in_(('queued', 'running'))
+    ).first()
+    if pending_job:
+        return pending_job
+
+    job = ReportJob(
+        id=uuid.uuid4().hex,
+        report_type=report_type,
+        project_id=project_id,
+        sub_job_id=sub_job_id,
+        status='queued',
+        download_name=download_name,
+        cache_key=cache_key
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    _submit_job(app, job.id)
+    return job
+
+
+def _on_job_finished(app, job_id, executor, attempt, future):
+    """
+    Handle jobs whose worker process died before it could update the job row
+
+    A dead worker breaks the whole pool: it is replaced, and the job is queued
+    again on the new pool until MAX_JOB_ATTEMPTS, then recorded as failed.
+    """
+    if future.cancelled():
+        error = BrokenProcessPool('Report pool shut down before the job ran')
+    else:
+        error = future.exception()
+    if error is None:
+        return
+    app.logger.warning("Report job %s failed in the worker pool (attempt %d): %s", job_id, attempt, error)
+    if isinstance(error, BrokenProcessPool):
+        _discard_executor(executor)
+
+    with app.app_context():
+        job = db.session.get(ReportJob, job_id)
+        if not job or job.status not in ('queued', 'running'):
+            return
+        if isinstance(error, BrokenProcessPool) and attempt < MAX_JOB_ATTEMPTS:
+            job.status = 'queued'
+            job.started_at = None
+            db.session.commit()
+            _submit_job(app, job_id, attempt + 1)
+        else:
+            job.status = 'failed'
+            job.error = str(error) or 'Report worker process died'
+            job.finished_at = datetime.datetime.utcnow()
+            db.session.commit()
+
+
+def _init_worker(config):
+    """
+    Set up a report worker process: one app, and so one engine and pool, for all its jobs
+
+    Args:
+        config (dict): Settings from _worker_config
+    """
+    global _worker_app
+    _worker_app = Flask(__name__)
+    _worker_app.config.update(config)
+    init_database(_worker_app)
+
+
+def write_combined_report(output, project_id=None, sub_job_id=None):
+    """
+    Write the quantities and hours reports, rendered in one pass, to a ZIP archive
+
+    Each PDF is named in the archive as it would be downloaded on its own.
+    """
+    from reports.pdf_export import write_report_archive
+    project = db.session.get(Project, project_id)
+    sub_job = db.session.get(SubJob, sub_job_id) if sub_job_id else None
+    entry_names = {measure: _build_download_name(measure, project, sub_job) for measure in COMBINED_REPORT_MEASURES}
+    write_report_archive(output, entry_names, project_id, sub_job_id)
+
+
+def run_report_job(job_id, cache_dir, cache_max_bytes):
+    """
+    Generate one queued report into the report cache; runs inside a report worker process
+
+    Returns:
+        str: Final job status
+    """
+    from reports.pdf_export import write_quantities_report_pdf, write_hours_report_pdf
+    writers = {
+        'quantities': write_quantities_report_pdf,
+        'hours': write_hours_report_pdf,
+        'both': write_combined_report
+    }
+
+    with _worker_app.app_context():
+        job = db.session.get(ReportJob, job_id)
+        if not job:
+            return 'missing'
+
+        job.status = 'running'
+        job.started_at = datetime.datetime.utcnow()
+        db.session.commit()
+
+        started = time.monotonic()
+        try:
+            # The report is written straight to a temporary file in the cache
+            write_report = writers[job.report_type]
+            file_path = store_report(
+                cache_dir, job.cache_key,
+                lambda temp_path: write_report(temp_path, project_id=job.project_id, sub_job_id=job.sub_job_id),
+                cache_max_bytes, extension=REPORT_FORMATS[job.report_type][0]
+            )
+
+            job.status = 'completed'
+            job.file_path = file_path
+            job.size_bytes = os.path.getsize(file_path)
+            record_report_render(job.report_type, 'completed', time.monotonic() - started, job.size_bytes)
+        except Exception as e:
+            db.session.rollback()
+            traceback.print_exc()
+            job = db.session.get(ReportJob, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            record_report_render(job.report_type, 'failed', time.monotonic() - started)
+
+        job.finished_at = datetime.datetime.utcnow()
+        db.session.commit()
+        return job.status
+
+
+def purge_report_jobs(max_age_hours=24):
+    """
+    Delete finished report jobs older than max_age_hours
+
+    Report files belong to the report cache, which may still serve them for
+    newer requests; they are removed by its size-bounded eviction instead.
+
+    Returns:
+        int: Number of jobs deleted
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(hours=max_age_hours)
+    old_jobs = ReportJob.query.filter(
+        ReportJob.created_at < cutoff,
+        ReportJob.status.in_(('completed', 'failed'))
+    ).all()
+
+    for job in old_jobs:
+        db.session.delete(job)
+    db.session.commit()
+    return len(old_jobs)
@@ -0,0 +1,383 @@
+from sqlalchemy import func
+from models import db, WorkItem, CostCode, RollupTotal
+from services.database import upsert_insert
+from services.progress_history import record_progress_events
+from services.versions import bump_version, bump_project_version, DATA_VERSION_NAME
+
+# Rollup scopes kept in the rollup_total table
+ROLLUP_SCOPES = ('project', 'sub_job', 'cost_code', 'discipline')
+
+# Work item value columns and their matching rollup_total columns
+VALUE_COLUMNS = ('budgeted_man_hours', 'earned_man_hours', 'budgeted_quantity', 'earned_quantity')
+
+
+def empty_totals():
+    """Return a totals dictionary for a group without work items"""
+    return {
+        'item_count': 0,
+        'total_budgeted_hours': 0,
+        'total_earned_hours': 0,
+        'total_budgeted_quantity': 0,
+        'total_earned_quantity': 0,
+        'overall_progress': 0
+    }
+
+
+def _build_totals(item_count, budgeted_hours, earned_hours, budgeted_quantity, earned_quantity):
+    """Build a totals dictionary from one aggregate row"""
+    totals = {
+        'item_count': item_count or 0,
+        'total_budgeted_hours': budgeted_hours or 0,
+        'total_earned_hours': earned_hours or 0,
+        'total_budgeted_quantity': budgeted_quantity or 0,
+        'total_earned_quantity': earned_quantity or 0,
+        'overall_progress': 0
+    }
+
+    # Overall progress is based on earned vs budgeted hours
+    if totals['total_budgeted_hours'] > 0:
+        totals['overall_progress'] = (totals['total_earned_hours'] / totals['total_budgeted_hours']) * 100
+
+    return totals
+
+
+def combine_totals(totals_list):
+    """Add up totals dictionaries, e.g. of every project for the dashboard"""
+    return _build_totals(*(
+        sum(totals[key] for totals in totals_list)
+        for key in ('item_count', 'total_budgeted_hours', 'total_earned_hours',
+                    'total_budgeted_quantity', 'total_earned_quantity')
+    ))
+
+
+def _aggregate_columns():
+    """Aggregate columns shared by every rollup query"""
+    return [
+        func.count(WorkItem.id),
+        func.sum(WorkItem.budgeted_man_hours),
+        func.sum(WorkItem.earned_man_hours),
+        func.sum(WorkItem.budgeted_quantity),
+        func.sum(WorkItem.earned_quantity)
+    ]
+
+
+# ===== MATERIALIZED ROLLUP READS =====
+
+def _materialized_totals(scope, *criteria):
+    """Read rollup rows of one scope as a group key -> totals dictionary"""
+    rows = db.session.query(
+        RollupTotal.group_key,
+        RollupTotal.item_count,
+        RollupTotal.budgeted_man_hours,
+        RollupTotal.earned_man_hours,
+        RollupTotal.budgeted_quantity,
+        RollupTotal.earned_quantity
+    ).filter(RollupTotal.scope == scope, *criteria).all()
+
+    return {row[0]: _build_totals(*row[1:]) for row in rows}
+
+
+def _keys_as_ids(totals_by_key):
+    """Convert string group keys of ID based scopes back to integers"""
+    return {int(key): totals for key, totals in totals_by_key.items()}
+
+
+def project_totals(project_ids=None):
+    """
+    Get totals for many projects from the materialized rollups
+
+    Args:
+        project_ids (list): Project IDs to include, or None for all projects
+
+    Returns:
+        dict: Project ID -> totals dictionary (projects without work items are omitted)
+    """
+    criteria = []
+    if project_ids is not None:
+        if not project_ids:
+            return {}
+        criteria.append(RollupTotal.project_id.in_(project_ids))
+    return _keys_as_ids(_materialized_totals('project', *criteria))
+
+
+def sub_job_totals(project_id=None, sub_job_ids=None):
+    """
+    Get totals for many sub jobs from the materialized rollups
+
+    Args:
+        project_id (int): Restrict to the sub jobs of this project
+        sub_job_ids (list): Sub Job IDs to include
+
+    Returns:
+        dict: Sub Job ID -> totals dictionary (sub jobs without work items are omitted)
+    """
+    criteria = []
+    if project_id is not None:
+        criteria.append(RollupTotal.project_id == project_id)
+    if sub_job_ids is not None:
+        if not sub_job_ids:
+            return {}
+        criteria.append(RollupTotal.group_key.in_([str(sub_job_id) for sub_job_id in sub_job_ids]))
+    return _keys_as_ids(_materialized_totals('sub_job', *criteria))
+
+
+def cost_code_totals(project_id=None):
+    """Get totals per cost code ID from the materialized rollups"""
+    criteria = [RollupTotal.project_id == project_id] if project_id is not None else []
+    return _keys_as_ids(_materialized_totals('cost_code', *criteria))
+
+
+def discipline_totals(project_id):
+    """Get totals per discipline name for a project from the materialized rollups"""
+    return _materialized_totals('discipline', RollupTotal.project_id == project_id)
+
+
+def get_project_totals(project_id):
+    """Get totals for a single project"""
+    return project_totals([project_id]).get(project_id, empty_totals())
+
+
+def get_sub_job_totals(sub_job_id):
+    """Get totals for a single sub job"""
+    return sub_job_totals(sub_job_ids=[sub_job_id]).get(sub_job_id, empty_totals())
+
+
+def count_work_items(project_id=None, sub_job_id=None, discipline=None):
+    """
+    Count work items from the materialized rollups without scanning work_item
+
+    Args:
+        project_id (int): Only work items of this project
+        sub_job_id (int): Only work items of this sub job
+        discipline (str): Only work items whose cost code has this discipline
+
+    Returns:
+        int: Number of work items, or None if no rollup scope matches the
+             combination of filters (sub job together with discipline)
+    """
+    if sub_job_id and discipline:
+        return None
+
+    if sub_job_id:
+        criteria = [RollupTotal.scope == 'sub_job', RollupTotal.group_key == str(int(sub_job_id))]
+    elif discipline:
+        criteria = [RollupTotal.scope == 'discipline', RollupTotal.group_key == discipline]
+    else:
+        criteria = [RollupTotal.scope == 'project']
+    if project_id:
+        criteria.append(RollupTotal.project_id == project_id)
+
+    return int(db.session.query(func.coalesce(func.sum(RollupTotal.item_count), 0)).filter(*criteria).scalar())
+
+
+# ===== INCREMENTAL MAINTENANCE =====
+
+def capture_contribution(work_item):
+    """
+    Capture what a work item currently adds to the rollups
+
+    Call this before changing or deleting a work item and pass the result
+    to record_work_item_change afterwards.
+
+    Returns:
+        dict: ID, group keys and values of the work item, or None if it has no cost code
+    """
+    if work_item is None or not work_item.project_id or not work_item.cost_code_id:
+        return None
+
+    cost_code = db.session.get(CostCode, int(work_item.cost_code_id))
+    if not cost_code:
+        return None
+
+    return {
+        'work_item_id': work_item.id,
+        'keys': _group_keys(work_item.project_id, work_item.sub_job_id, cost_code.id, cost_code.discipline),
+        'values': {column: getattr(work_item, column) or 0 for column in VALUE_COLUMNS}
+    }
+
+
+def _group_keys(project_id, sub_job_id, cost_code_id, discipline):
+    """(scope, project ID, group key) of every rollup group a work item belongs to"""
+    project_id = int(project_id)
+    return [
+        ('project', project_id, str(project_id)),
+        ('sub_job', project_id, str(int(sub_job_id))),
+        ('cost_code', project_id, str(int(cost_code_id))),
+        ('discipline', project_id, discipline)
+    ]
+
+
+def _upsert_group(scope, project_id, group_key, item_count, deltas):
+    """Add an item count and value deltas to one rollup group, creating it if needed"""
+    table = RollupTotal.__table__
+    # One ON CONFLICT statement, so concurrent writers adding the first
+    # item of a group cannot both insert it
+    statement = upsert_insert(table).values(scope=scope, project_id=project_id, group_key=group_key,
+                                            item_count=item_count, **deltas)
+    changes = {'item_count': table.c.item_count + statement.excluded.item_count}
+    for column in deltas:
+        changes[column] = table.c[column] + statement.excluded[column]
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['scope', 'project_id', 'group_key'],
+        set_=changes
+    ))
+
+
+def _apply_contribution(contribution, sign):
+    """Add (sign=1) or remove (sign=-1) a captured contribution using in-place upserts"""
+    deltas = {column: sign * value for column, value in contribution['values'].items()}
+    for scope, project_id, group_key in contribution['keys']:
+        _upsert_group(scope, project_id, group_key, sign, deltas)
+
+    # Drop groups of this project that no longer have any work items
+    if sign < 0:
+        project_id = contribution['keys'][0][1]
+        db.session.query(RollupTotal).filter(
+            RollupTotal.project_id == project_id,
+            RollupTotal.item_count <= 0
+        ).delete(synchronize_session=False)
+
+
+def record_work_item_change(before, work_item):
+    """
+    Update the materialized rollups after a work item was added, changed or deleted
+
+    Also bumps the data version of the affected projects, which keys the
+    report cache and dashboard ETags, and appends progress history events
+    when totals changed.
+
+    Args:
+        before (dict): Contribution captured before the change (None for new work items)
+        work_item (WorkItem): The work item after the change (None if it was deleted)
+    """
+    if work_item is not None and work_item.id is None:
+        # A new work item gets its ID on flush; its history events need it
+        db.session.flush()
+    after = capture_contribution(work_item)
+    if before != after:
+        if before:
+            _apply_contribution(before, -1)
+        if after:
+            _apply_contribution(after, 1)
+        # A deleted work item's ID comes from the contribution captured before the delete
+        record_progress_events(_progress_events(before, after, (after or before)['work_item_id']))
+
+    # Descriptions and step progress can change without changing any total
+    for project_id in {contribution['keys'][0][1] for contribution in (before, after) if contribution}:
+        bump_project_version(project_id)
+
+
+def _progress_events(before, after, work_item_id):
+    """History events for a contribution change: one if the sub job stays the same, else a removal and an addition"""
+    def event(contribution, item_count, changes):
+        return dict(
+            changes,
+            work_item_id=work_item_id,
+            project_id=contribution['keys'][0][1],
+            sub_job_id=int(contribution['keys'][1][2]),
+            item_count=item_count
+        )
+
+    if before and after and before['keys'][:2] == after['keys'][:2]:
+        changes = {column: after['values'][column] - before['values'][column] for column in VALUE_COLUMNS}
+        return [event(after, 0, changes)] if any(changes.values()) else []
+    events = []
+    if before:
+        events.append(event(before, -1, {column: -value for column, value in before['values'].items()}))
+    if after:
+        events.append(event(after, 1, after['values']))
+    return events
+
+
+def record_earned_value_changes(changes):
+    """
+    Update the rollups after many work items changed earned values only
+
+    Deltas are summed per rollup group first, so a batch touching hundreds
+    of work items issues one upsert per group instead of per item. Each
+    changed work item also gets a progress history event.
+
+    Args:
+        changes (list): (work item ID, project ID, sub job ID, cost code ID,
+                        discipline, {column: delta}) per changed work item
+    """
+    group_deltas = {}
+    project_ids = set()
+    events = []
+    for work_item_id, project_id, sub_job_id, cost_code_id, discipline, deltas in changes:
+        project_ids.add(int(project_id))
+        if any(deltas.values()):
+            events.append(dict(deltas, work_item_id=work_item_id, project_id=int(project_id),
+                               sub_job_id=int(sub_job_id)))
+        for key in _group_keys(project_id, sub_job_id, cost_code_id, discipline):
+            totals = group_deltas.setdefault(key, {})
+            for column, delta in deltas.items():
+                totals[column] = totals.get(column, 0) + delta
+
+    for (scope, project_id, group_key), deltas in group_deltas.items():
+        _upsert_group(scope, project_id, group_key, 0, deltas)
+    record_progress_events(events)
+    for project_id in project_ids:
+        bump_project_version(project_id)
+
+
+# ===== REBUILD / REPAIR =====
+
+def rebuild_rollups(project_id=None):
+    """
+    Recompute the materialized rollups from the work_item table
+
+    Args:
+        project_id (int): Only rebuild this project, or None for every project
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    delete_query = db.session.query(RollupTotal)
+    criteria = []
+    if project_id is not None:
+        delete_query = delete_query.filter(RollupTotal.project_id == project_id)
+        criteria.append(WorkItem.project_id == project_id)
+    delete_query.delete(synchronize_session=False)
+
+    group_columns = {
+        'project': WorkItem.project_id,
+        'sub_job': WorkItem.sub_job_id,
+        'cost_code': WorkItem.cost_code_id,
+        'discipline': CostCode.discipline
+    }
+
+    rows = []
+    for scope, group_column in group_columns.items():
+        # Group by project as well so every row knows which project it belongs to
+        query = db.session.query(WorkItem.project_id, group_column, *_aggregate_columns()) \
+            .join(CostCode, WorkItem.cost_code_id == CostCode.id)
+        if criteria:
+            query = query.filter(*criteria)
+        for row in query.group_by(WorkItem.project_id, group_column).all():
+            rows.append({
+                'scope': scope,
+                'project_id': row[0],
+                'group_key': str(row[1]),
+                'item_count': row[2],
+                'budgeted_man_hours': row[3] or 0,
+                'earned_man_hours': row[4] or 0,
+                'budgeted_quantity': row[5] or 0,
+                'earned_quantity': row[6] or 0
+            })
+
+    if rows:
+        db.session.execute(RollupTotal.__table__.insert(), rows)
+
+    if project_id is not None:
+        bump_project_version(project_id)
+    else:
+        bump_version(DATA_VERSION_NAME)
+    return len(rows)
+
+
+def ensure_rollups():
+    """Build the rollups once for databases created before the rollup_total table existed"""
+    if db.session.query(RollupTotal.id).first() is None and db.session.query(WorkItem.id).first() is not None:
+        rebuild_rollups()
+        db.session.commit()
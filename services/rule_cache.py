@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+from models import db, CostCode, RuleOfCredit
+from services.versions import get_version, bump_version, local_version_bumps
+from services.metrics import record_cache_lookup
+
+# Name of the shared version counter for rules of credit and cost code assignments
+RULES_VERSION_NAME = 'rules'
+
+# Seconds between checks of the shared version counter
+VERSION_CHECK_INTERVAL = 1.0
+
+_lock = threading.Lock()
+_compiled_rules = {}      # rule id -> CompiledRule
+_cost_code_rules = {}     # cost code id -> rule id (or None)
+_state = {'version': None, 'checked_at': 0.0, 'local_bumps': None}
+
+
+class CompiledRule:
+    """A rule of credit parsed once into (name, weight) pairs"""
+    __slots__ = ('rule_id', 'version', 'steps', 'weights')
+
+    def __init__(self, rule_id, version, steps):
+        self.rule_id = rule_id
+        self.version = version
+        self.steps = tuple(steps)
+        self.weights = dict(steps)
+
+    def weighted_percentage(self, progress_data):
+        """Combine step completion percentages into one weighted percentage"""
+        total_weighted_percentage = 0
+        for step_name, step_weight in self.steps:
+            step_completion = float(progress_data.get(step_name, 0.0))
+            total_weighted_percentage += (step_completion / 100.0) * step_weight
+        return total_weighted_percentage
+
+
+def parse_rule_steps(steps_json):
+    """
+    Parse rule of credit steps_json into a list of (name, weight) tuples
+
+    Supports the current {"steps": [{"name", "weight"}]} shape and the legacy
+    list shape whose entries use either "name" or "step_name".
+    """
+    parsed_rule_steps = []
+    try:
+        rule_data = json.loads(steps_json or "[]")
+        if isinstance(rule_data, dict) and "steps" in rule_data and isinstance(rule_data["steps"], list):
+            for step_entry in rule_data["steps"]:
+                if isinstance(step_entry, dict) and "name" in step_entry and "weight" in step_entry:
+                    parsed_rule_steps.append((str(step_entry["name"]), float(step_entry["weight"])))
+        elif isinstance(rule_data, list):  # Legacy format support
+            for step_entry in rule_data:
+                if isinstance(step_entry, dict) and "weight" in step_entry:
+                    step_name_val = None
+                    if "name" in step_entry:  # Legacy might have 'name'
+                        step_name_val = str(step_entry["name"])
+                    elif "step_name" in step_entry:  # Or 'step_name'
+                        step_name_val = str(step_entry["step_name"])
+
+                    if step_name_val:
+                        parsed_rule_steps.append((step_name_val, float(step_entry["weight"])))
+    except (ValueError, TypeError):
+        pass
+    return parsed_rule_steps
+
+
+def _sync():
+    """Drop the local cache when another worker bumped the shared rules version"""
+    now = time.monotonic()
+    # A bump made by this process is picked up at once rather than after the check interval
+    local_bumps = local_version_bumps()
+    if (_state['version'] is not None and local_bumps == _state['local_bumps']
+            and now - _state['checked_at'] < VERSION_CHECK_INTERVAL):
+        return
+    version = get_version(RULES_VERSION_NAME)
+    with _lock:
+        if version != _state['version']:
+            _compiled_rules.clear()
+            _cost_code_rules.clear()
+            _state['version'] = version
+        _state['checked_at'] = now
+        _state['local_bumps'] = local_bumps
+
+
+def compile_rule(rule):
+    """Compile and cache a loaded RuleOfCredit instance"""
+    compiled = CompiledRule(rule.id, _state['version'], parse_rule_steps(rule.steps_json))
+    with _lock:
+        _compiled_rules[rule.id] = compiled
+    return compiled
+
+
+def get_compiled_rule(rule_id):
+    """Return the compiled rule for a rule ID, or None if the rule does not exist"""
+    if not rule_id:
+        return None
+    _sync()
+    rule_id = int(rule_id)
+    compiled = _compiled_rules.get(rule_id)
+    record_cache_lookup('rule', compiled is not None)
+    if compiled is None:
+        rule = db.session.get(RuleOfCredit, rule_id)
+        if not rule:
+            return None
+        compiled = compile_rule(rule)
+    return compiled
+
+
+def get_compiled_rule_for_cost_code(cost_code_id):
+    """Return the compiled rule assigned to a cost code, or None if it has no rule"""
+    if not cost_code_id:
+        return None
+    _sync()
+    cost_code_id = int(cost_code_id)
+    if cost_code_id not in _cost_code_rules:
+        rule_id = db.session.query(CostCode.rule_of_credit_id).filter(CostCode.id == cost_code_id).scalar()
+        with _lock:
+            _cost_code_rules[cost_code_id] = rule_id
+    return get_compiled_rule(_cost_code_rules[cost_code_id])
+
+
+def preload_rules(rule_ids=None):
+    """Compile many rules with one query, e.g. before a bulk recalculation"""
+    _sync()
+    query = RuleOfCredit.query
+    if rule_ids is not None:
+        query = query.filter(RuleOfCredit.id.in_(list(rule_ids)))
+    return {rule.id: compile_rule(rule) for rule in query.all()}
+
+
+def invalidate_rule(rule_id):
+    """Drop a rule locally and bump the shared version so other workers drop it too"""
+    with _lock:
+        _compiled_rules.pop(int(rule_id), None)
+    bump_version(RULES_VERSION_NAME)
+
+
+def invalidate_cost_code(cost_code_id):
+    """Drop a cost code's rule assignment locally and in other workers"""
+    with _lock:
+        _cost_code_rules.pop(int(cost_code_id), None)
+    bump_version(RULES_VERSION_NAME)
+
+
+def clear_cache():
+    """Drop every compiled rule in this process"""
+    with _lock:
+        _compiled_rules.clear()
+        _cost_code_rules.clear()
+        _state['version'] = None
@@ -0,0 +1,198 @@
+import logging
+import re
+from sqlalchemy import text, Integer
+from models import db, WorkItem, CostCode
+
+logger = logging.getLogger(__name__)
+
+# FTS5 table over work item ID strings, descriptions and cost codes; rowid is work_item.id
+SEARCH_TABLE = 'work_item_search'
+
+# Column weights for bm25 ranking: work item ID, description, cost code, project (unindexed)
+RANK_WEIGHTS = (10.0, 2.0, 1.0, 0.0)
+
+# Broader searches than this skip bm25 ranking, whose cost grows with every
+# match, and return matches in work item order instead
+RANKED_SEARCH_MAX_MATCHES = 10000
+
+# Results returned by search_work_items when no limit is given
+DEFAULT_SEARCH_LIMIT = 20
+
+_COST_CODE_TEXT = "coalesce((SELECT cost_code_id_str || ' ' || description FROM cost_code WHERE id = new.cost_code_id), '')"
+
+_SEARCH_INDEX_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        work_item_id_str, description, cost_code, project_id UNINDEXED, prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS work_item_search_insert AFTER INSERT ON work_item BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, work_item_id_str, description, cost_code, project_id)
+        VALUES (new.id, new.work_item_id_str, coalesce(new.description, ''), {_COST_CODE_TEXT}, new.project_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS work_item_search_update
+        AFTER UPDATE OF work_item_id_str, description, cost_code_id, project_id ON work_item BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+        INSERT INTO {SEARCH_TABLE}(rowid, work_item_id_str, description, cost_code, project_id)
+        VALUES (new.id, new.work_item_id_str, coalesce(new.description, ''), {_COST_CODE_TEXT}, new.project_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS work_item_search_delete AFTER DELETE ON work_item BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS cost_code_search_update
+        AFTER UPDATE OF cost_code_id_str, description ON cost_code BEGIN
+        UPDATE {SEARCH_TABLE} SET cost_code = new.cost_code_id_str || ' ' || new.description
+        WHERE rowid IN (SELECT id FROM work_item WHERE cost_code_id = new.id);
+    END"""
+]
+
+_index_available = False
+
+
+def _is_sqlite():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def search_index_available():
+    """True if the FTS5 search index exists in this database"""
+    global _index_available
+    if not _index_available and _is_sqlite():
+        _index_available = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': SEARCH_TABLE}
+        ).first() is not None
+    return _index_available
+
+
+def ensure_search_index():
+    """
+    Create the FTS5 index and its sync triggers, filling it on first creation
+
+    Triggers on work_item and cost_code keep the index in sync for every
+    write path, including bulk SQL updates. Does nothing on databases other
+    than SQLite, where searches fall back to LIKE matching.
+
+    Returns:
+        bool: True if the index is available
+    """
+    if not _is_sqlite():
+        return False
+    if search_index_available():
+        return True
+
+    try:
+        for statement in _SEARCH_INDEX_DDL:
+            db.session.execute(text(statement))
+        db.session.commit()
+    except Exception as e:
+        # SQLite builds without FTS5 keep using LIKE searches
+        db.session.rollback()
+        logger.warning("Full-text search index not available: %s", e)
+        return False
+
+    count = rebuild_search_index()
+    logger.info("Built full-text search index for %d work items", count)
+    return search_index_available()
+
+
+def rebuild_search_index():
+    """
+    Repopulate the search index from work_item and cost_code
+
+    Returns:
+        int: Number of work items indexed
+    """
+    db.session.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    result = db.session.execute(text(
+        f"""INSERT INTO {SEARCH_TABLE}(rowid, work_item_id_str, description, cost_code, project_id)
+        SELECT work_item.id, work_item.work_item_id_str, coalesce(work_item.description, ''),
+               coalesce(cost_code.cost_code_id_str || ' ' || cost_code.description, ''),
+               work_item.project_id
+        FROM work_item LEFT JOIN cost_code ON cost_code.id = work_item.cost_code_id"""
+    ))
+    db.session.commit()
+    return result.rowcount
+
+
+def build_match_query(term):
+    """
+    Turn user input into an FTS5 query: every word must match as a prefix
+
+    Returns:
+        str: MATCH expression, or None if term has no searchable words
+    """
+    words = re.findall(r'\w+', term or '')
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _matching_ids(match_query):
+    return text(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match_query") \
+        .bindparams(match_query=match_query).columns(rowid=Integer)
+
+
+def _like_filter(term):
+    return WorkItem.description.ilike(f'%{term}%') | WorkItem.work_item_id_str.ilike(f'%{term}%')
+
+
+def work_item_search_filter(term):
+    """
+    Filter expression for work items matching a search term
+
+    Uses the FTS5 index when available, otherwise the LIKE match on
+    description and work item ID.
+    """
+    if search_index_available():
+        match_query = build_match_query(term)
+        if match_query is None:
+            return _like_filter(term)
+        return WorkItem.id.in_(_matching_ids(match_query))
+    return _like_filter(term)
+
+
+def search_work_items(term, limit=DEFAULT_SEARCH_LIMIT, project_id=None):
+    """
+    Search work items, best matches first
+
+    Ranking and the limit are applied inside the FTS5 query, so only the
+    returned work items are loaded.
+
+    Args:
+        term (str): Search input; each word matches as a prefix
+        limit (int): Maximum number of results
+        project_id (int): Only work items of this project
+
+    Returns:
+        list: (WorkItem, CostCode) tuples
+    """
+    query = db.session.query(WorkItem, CostCode).join(CostCode, WorkItem.cost_code_id == CostCode.id)
+
+    if not search_index_available():
+        if project_id:
+            query = query.filter(WorkItem.project_id == project_id)
+        return query.filter(_like_filter(term)).order_by(WorkItem.work_item_id_str).limit(limit).all()
+
+    match_query = build_match_query(term)
+    if match_query is None:
+        return []
+
+    where = f"{SEARCH_TABLE} MATCH :match_query"
+    params = {'match_query': match_query, 'limit': limit}
+    if project_id:
+        where += " AND project_id = :project_id"
+        params['project_id'] = project_id
+
+    match_count = db.session.execute(text(f"SELECT count(*) FROM {SEARCH_TABLE} WHERE {where}"), params).scalar()
+    if match_count > RANKED_SEARCH_MAX_MATCHES:
+        order = "rowid"
+    else:
+        order = f"bm25({SEARCH_TABLE}, {', '.join(str(weight) for weight in RANK_WEIGHTS)})"
+
+    work_item_ids = db.session.execute(
+        text(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {where} ORDER BY {order} LIMIT :limit"), params
+    ).scalars().all()
+    if not work_item_ids:
+        return []
+
+    results = {work_item.id: (work_item, cost_code)
+               for work_item, cost_code in query.filter(WorkItem.id.in_(work_item_ids)).all()}
+    return [results[work_item_id] for work_item_id in work_item_ids if work_item_id in results]
@@ -0,0 +1,103 @@
+import json
+from sqlalchemy import func
+from models import db, WorkItem, WorkItemStepProgress
+from services.database import upsert_insert
+
+# progress_json values that hold no step progress
+EMPTY_PROGRESS_JSON = ('', '[]', '{}')
+
+
+def parse_progress_json(progress_json):
+    """
+    Parse a legacy progress_json string into a step name -> percentage dictionary
+
+    Handles the three shapes found in existing databases:
+        [{"step_name": ..., "current_complete_percentage": ...}, ...]
+        [{"name": ..., "percentage": ...}, ...]
+        {"step name": percentage, ...}
+    """
+    try:
+        progress_data = {}
+        current_progress_data = json.loads(progress_json or "[]")
+
+        if isinstance(current_progress_data, list):
+            for step_progress in current_progress_data:
+                if isinstance(step_progress, dict):
+                    if "step_name" in step_progress and "current_complete_percentage" in step_progress:
+                        progress_data[str(step_progress["step_name"])] = float(step_progress["current_complete_percentage"])
+                    elif "name" in step_progress and "percentage" in step_progress:
+                        progress_data[str(step_progress["name"])] = float(step_progress["percentage"])
+        elif isinstance(current_progress_data, dict):
+            for step_name, percentage in current_progress_data.items():
+                progress_data[str(step_name)] = float(percentage or 0)
+
+        return progress_data
+    except (ValueError, TypeError):
+        return {}
+
+
+def upsert_step_progress(work_item_id, step_name, percentage):
+    """Insert or update the progress row of one step with a single statement"""
+    statement = upsert_insert(WorkItemStepProgress.__table__).values(
+        work_item_id=work_item_id,
+        step_name=step_name,
+        percentage=float(percentage)
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=['work_item_id', 'step_name'],
+        set_={'percentage': statement.excluded.percentage}
+    )
+    db.session.execute(statement)
+
+
+def count_items_at_percentage(step_name, percentage=100, project_id=None):
+    """
+    Count work items whose progress on a step has reached a percentage
+
+    Uses the (step_name, percentage) index instead of decoding progress JSON.
+    """
+    query = db.session.query(func.count(WorkItemStepProgress.id)).filter(
+        WorkItemStepProgress.step_name == step_name,
+        WorkItemStepProgress.percentage >= percentage
+    )
+    if project_id is not None:
+        query = query.join(WorkItem, WorkItemStepProgress.work_item_id == WorkItem.id) \
+            .filter(WorkItem.project_id == project_id)
+    return query.scalar()
+
+
+def migrate_progress_json(batch_size=1000):
+    """
+    Move legacy progress_json data into the work_item_step_progress table
+
+    Work items are migrated in batches. Each migrated item gets its
+    progress_json reset to "[]", so running the migration again only picks
+    up items that were not converted yet.
+
+    Returns:
+        tuple: (work items migrated, step rows written)
+    """
+    migrated_items = 0
+    written_rows = 0
+
+    while True:
+        legacy_items = db.session.query(WorkItem.id, WorkItem.progress_json) \
+            .filter(WorkItem.progress_json.isnot(None), WorkItem.progress_json.notin_(EMPTY_PROGRESS_JSON)) \
+            .order_by(WorkItem.id) \
+            .limit(batch_size) \
+            .all()
+        if not legacy_items:
+            break
+
+        for work_item_id, progress_json in legacy_items:
+            for step_name, percentage in parse_progress_json(progress_json).items():
+                upsert_step_progress(work_item_id, step_name, percentage)
+                written_rows += 1
+
+        db.session.query(WorkItem) \
+            .filter(WorkItem.id.in_([work_item_id for work_item_id, _ in legacy_items])) \
+            .update({WorkItem.progress_json: '[]'}, synchronize_session=False)
+        db.session.commit()
+        migrated_items += len(legacy_items)
+
+    return migrated_items, written_rows
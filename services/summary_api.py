@@ -0,0 +1,115 @@
+import hashlib
+from models import db, Project, SubJob, CostCode
+from services.rollups import (project_totals, sub_job_totals, cost_code_totals, discipline_totals,
+                              get_project_totals, get_sub_job_totals, combine_totals, empty_totals)
+
+# Bump when the shape of a summary changes, so bodies cached under old ETags are refetched
+SUMMARY_FORMAT_VERSION = 1
+
+
+def summary_etag(scope, data_version):
+    """
+    Strong ETag of a JSON summary
+
+    Every change shown in a summary bumps one of the version counters behind
+    data_version, so an unchanged ETag means an unchanged body.
+
+    Args:
+        scope (str): Summary and its ID, e.g. 'project:3'
+        data_version (str): Version string from services.versions
+    """
+    parts = [str(SUMMARY_FORMAT_VERSION), scope, data_version]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _totals_record(totals):
+    """Totals with the quantity based percentage the charts show next to the hours based one"""
+    record = dict(totals)
+    budgeted_quantity = totals['total_budgeted_quantity']
+    record['percent_complete_quantity'] = (
+        (totals['total_earned_quantity'] / budgeted_quantity) * 100 if budgeted_quantity > 0 else 0
+    )
+    return record
+
+
+def _project_record(project, totals):
+    return {
+        'id': project.id,
+        'project_id_str': project.project_id_str,
+        'name': project.name,
+        'description': project.description,
+        'totals': _totals_record(totals)
+    }
+
+
+def _sub_job_record(sub_job, totals):
+    return {
+        'id': sub_job.id,
+        'sub_job_id_str': sub_job.sub_job_id_str,
+        'name': sub_job.name,
+        'description': sub_job.description,
+        'area': sub_job.area,
+        'project_id': sub_job.project_id,
+        'totals': _totals_record(totals)
+    }
+
+
+def projects_summary():
+    """Every project with its totals, and the totals of all projects together"""
+    totals_by_project = project_totals()
+    projects = Project.query.order_by(Project.id).all()
+    project_totals_list = [totals_by_project.get(project.id, empty_totals()) for project in projects]
+    return {
+        'projects': [_project_record(project, totals) for project, totals in zip(projects, project_totals_list)],
+        'totals': _totals_record(combine_totals(project_totals_list))
+    }
+
+
+def project_summary(project):
+    """A project with its totals and the totals of each of its sub jobs"""
+    totals_by_sub_job = sub_job_totals(project_id=project.id)
+    sub_jobs = SubJob.query.filter_by(project_id=project.id).order_by(SubJob.id).all()
+    record = _project_record(project, get_project_totals(project.id))
+    record['sub_jobs'] = [
+        _sub_job_record(sub_job, totals_by_sub_job.get(sub_job.id, empty_totals())) for sub_job in sub_jobs
+    ]
+    return record
+
+
+def sub_job_summary(sub_job):
+    """A sub job with its totals"""
+    return _sub_job_record(sub_job, get_sub_job_totals(sub_job.id))
+
+
+def discipline_summary(project_id):
+    """Totals per discipline of a project, ordered by discipline"""
+    totals_by_discipline = discipline_totals(project_id)
+    return {
+        'project_id': project_id,
+        'disciplines': [
+            {'discipline': discipline, 'totals': _totals_record(totals_by_discipline[discipline])}
+            for discipline in sorted(totals_by_discipline)
+        ]
+    }
+
+
+def cost_code_summary(project_id):
+    """Every cost code of a project with its totals, ordered by code"""
+    totals_by_cost_code = cost_code_totals(project_id=project_id)
+    cost_codes = db.session.query(
+        CostCode.id, CostCode.cost_code_id_str, CostCode.description, CostCode.discipline, CostCode.rule_of_credit_id
+    ).filter(CostCode.project_id == project_id).order_by(CostCode.cost_code_id_str)
+    return {
+        'project_id': project_id,
+        'cost_codes': [
+            {
+                'id': cost_code.id,
+                'cost_code_id_str': cost_code.cost_code_id_str,
+                'description': cost_code.description,
+                'discipline': cost_code.discipline,
+                'rule_of_credit_id': cost_code.rule_of_credit_id,
+                'totals': _totals_record(totals_by_cost_code.get(cost_code.id, empty_totals()))
+            }
+            for cost_code in cost_codes
+        ]
+    }
@@ -0,0 +1,211 @@
+import threading
+import time
+from sqlalchemy import or_
+from models import db, Project, SubJob, CacheVersion
+from services.versions import (
+    bump_version, bump_project_version, local_version_bumps, project_version_name, DATA_VERSION_NAME
+)
+from services.rollups import project_totals, sub_job_totals, empty_totals
+from services.metrics import record_cache_lookup
+
+# Version bumped when projects are added or deleted
+PROJECTS_VERSION_NAME = 'projects'
+
+# Seconds between checks of the shared version counters
+VERSION_CHECK_INTERVAL = 1.0
+
+# Seconds after which every summary is reloaded, even without a version change
+SUMMARY_TTL = 300
+
+_lock = threading.Lock()
+_summaries = {}      # project id -> ProjectSummary
+_state = {
+    'versions': None,       # counter values the cached summaries were checked against
+    'checked_at': 0.0,
+    'loaded_at': 0.0,       # time of the last full load, for the TTL
+    'local_bumps': None,
+    'complete': False,      # True once every project was loaded
+    'project_ids': ()       # IDs of every project, in order, as of the last full load
+}
+
+
+class SubJobSummary:
+    """Sub job columns shown in lists and menus, with its totals"""
+    __slots__ = ('id', 'sub_job_id_str', 'name', 'description', 'area', 'project_id', 'totals')
+
+    def __init__(self, row, totals):
+        self.id = row.id
+        self.sub_job_id_str = row.sub_job_id_str
+        self.name = row.name
+        self.description = row.description
+        self.area = row.area
+        self.project_id = row.project_id
+        self.totals = totals
+
+
+class ProjectSummary:
+    """
+    Project columns, totals and sub jobs, read once and shared by requests
+
+    Has the attributes templates use of Project (id, project_id_str, name,
+    description, sub_jobs), so it can stand in for it in lists and menus.
+    """
+    __slots__ = ('id', 'project_id_str', 'name', 'description', 'totals', 'sub_jobs')
+
+    def __init__(self, row, totals, sub_jobs):
+        self.id = row.id
+        self.project_id_str = row.project_id_str
+        self.name = row.name
+        self.description = row.description
+        self.totals = totals
+        self.sub_jobs = tuple(sub_jobs)
+
+    @property
+    def overall_progress(self):
+        return self.totals['overall_progress']
+
+
+def _summary_versions():
+    """Current values of the counters the summaries depend on, by name"""
+    return dict(
+        db.session.query(CacheVersion.name, CacheVersion.version).filter(or_(
+            CacheVersion.name.in_((DATA_VERSION_NAME, PROJECTS_VERSION_NAME)),
+            CacheVersion.name.like('project:%')
+        )).all()
+    )
+
+
+def _sync():
+    """
+    Drop summaries whose version counter changed since they were loaded
+
+    A change of the data or projects counter, or the TTL running out, drops
+    everything; a project's own counter only drops that project. Checks run
+    at most every VERSION_CHECK_INTERVAL seconds, and right away after this
+    process bumped a counter itself.
+    """
+    now = time.monotonic()
+    local_bumps = local_version_bumps()
+    if (_state['versions'] is not None and local_bumps == _state['local_bumps']
+            and now - _state['checked_at'] < VERSION_CHECK_INTERVAL):
+        return
+    versions = _summary_versions()
+    with _lock:
+        previous = _state['versions']
+        if (previous is None or now - _state['loaded_at'] > SUMMARY_TTL
+                or any(versions.get(name) != previous.get(name) for name in (DATA_VERSION_NAME, PROJECTS_VERSION_NAME))):
+            _summaries.clear()
+            _state['complete'] = False
+        else:
+            for project_id in list(_summaries):
+                name = project_version_name(project_id)
+                if versions.get(name) != previous.get(name):
+                    del _summaries[project_id]
+        _state['versions'] = versions
+        _state['checked_at'] = now
+        _state['local_bumps'] = local_bumps
+
+
+def _load(project_ids=None):
+    """Read the summaries of some or all projects with one query per table"""
+    project_query = db.session.query(Project.id, Project.project_id_str, Project.name, Project.description)
+    sub_job_query = db.session.query(SubJob.id, SubJob.sub_job_id_str, SubJob.name, SubJob.description,
+                                     SubJob.area, SubJob.project_id)
+    if project_ids is not None:
+        project_query = project_query.filter(Project.id.in_(project_ids))
+        sub_job_query = sub_job_query.filter(SubJob.project_id.in_(project_ids))
+
+    totals_by_sub_job = sub_job_totals() if project_ids is None else {}
+    if project_ids is not None:
+        for project_id in project_ids:
+            totals_by_sub_job.update(sub_job_totals(project_id=project_id))
+    sub_jobs_by_project = {}
+    for row in sub_job_query.order_by(SubJob.id):
+        sub_jobs_by_project.setdefault(row.project_id, []).append(
+            SubJobSummary(row, totals_by_sub_job.get(row.id, empty_totals()))
+        )
+
+    totals_by_project = project_totals(project_ids)
+    return {
+        row.id: ProjectSummary(row, totals_by_project.get(row.id, empty_totals()), sub_jobs_by_project.get(row.id, ()))
+        for row in project_query.order_by(Project.id)
+    }
+
+
+def get_project_summaries():
+    """
+    Summaries of every project, ordered by ID
+
+    Served from the process cache; only projects whose counters changed are
+    read again, without touching the work_item table (totals come from the
+    materialized rollups).
+
+    Returns:
+        list: ProjectSummary per project
+    """
+    _sync()
+    with _lock:
+        complete = _state['complete']
+        missing = None if not complete else [
+            project_id for project_id in _state['project_ids'] if project_id not in _summaries
+        ]
+    record_cache_lookup('project_summary', complete and not missing)
+
+    if not complete:
+        loaded = _load()
+        with _lock:
+            _summaries.clear()
+            _summaries.update(loaded)
+            _state['project_ids'] = tuple(loaded)
+            _state['complete'] = True
+            _state['loaded_at'] = time.monotonic()
+        return list(loaded.values())
+
+    if missing:
+        loaded = _load(missing)
+        with _lock:
+            _summaries.update(loaded)
+
+    with _lock:
+        return [_summaries[project_id] for project_id in _state['project_ids'] if project_id in _summaries]
+
+
+def get_project_summary(project_id):
+    """Summary of one project, or None if it does not exist"""
+    for summary in get_project_summaries():
+        if summary.id == project_id:
+            return summary
+    return None
+
+
+def get_sub_job_summaries(project_id=None):
+    """Sub job summaries of one project, or of every project, ordered by project and ID"""
+    return [
+        sub_job
+        for summary in get_project_summaries()
+        if project_id is None or summary.id == project_id
+        for sub_job in summary.sub_jobs
+    ]
+
+
+def invalidate_project_list():
+    """Drop every summary after a project was added or deleted, here and in other workers"""
+    with _lock:
+        _summaries.clear()
+        _state['complete'] = False
+    bump_version(PROJECTS_VERSION_NAME)
+
+
+def invalidate_project_summary(project_id):
+    """Drop one project's summary after its details or sub jobs changed, here and in other workers"""
+    with _lock:
+        _summaries.pop(int(project_id), None)
+    bump_project_version(project_id)
+
+
+def clear_cache():
+    """Drop every summary in this process"""
+    with _lock:
+        _summaries.clear()
+        _state['versions'] = None
+        _state['complete'] = False
@@ -0,0 +1,88 @@
+import itertools
+from sqlalchemy import or_
+from models import db, CacheVersion
+from services.database import upsert_insert
+
+# Version bumps made by this process; lets local caches resync right after their own writes
+_local_bumps = itertools.count(1)
+_state = {'local_bumps': 0}
+
+
+def get_version(name):
+    """Return the current version of a named cache (0 if it was never bumped)"""
+    version = db.session.query(CacheVersion.version).filter(CacheVersion.name == name).scalar()
+    return version or 0
+
+
+def bump_version(name):
+    """
+    Increment the version of a named cache in the current transaction
+
+    Other workers compare this counter with the version their local cache
+    was built from and drop the cache once the transaction commits.
+    """
+    statement = upsert_insert(CacheVersion.__table__).values(name=name, version=1)
+    statement = statement.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'version': CacheVersion.__table__.c.version + 1}
+    )
+    db.session.execute(statement)
+    _state['local_bumps'] = next(_local_bumps)
+
+
+def local_version_bumps():
+    """Number of version bumps made by this process so far"""
+    return _state['local_bumps']
+
+
+# Version bumped when every project's data may have changed (e.g. a full rollup rebuild)
+DATA_VERSION_NAME = 'data'
+
+
+def project_version_name(project_id):
+    """Name of the version counter of one project's work items, cost codes and sub jobs"""
+    return f"project:{int(project_id)}"
+
+
+def bump_project_version(project_id):
+    """Mark everything derived from a project's data as changed"""
+    bump_version(project_version_name(project_id))
+
+
+def project_data_version(project_id):
+    """
+    Version string that changes whenever data shown for a project changes
+
+    Combines the project's own counter with the rules counter (rule of credit
+    and cost code assignment edits) and the global data counter.
+    """
+    from services.rule_cache import RULES_VERSION_NAME
+
+    names = [DATA_VERSION_NAME, RULES_VERSION_NAME, project_version_name(project_id)]
+    versions = dict(
+        db.session.query(CacheVersion.name, CacheVersion.version)
+        .filter(CacheVersion.name.in_(names))
+        .all()
+    )
+    return '-'.join(str(versions.get(name, 0)) for name in names)
+
+
+def portfolio_data_version():
+    """
+    Version string that changes whenever data shown for any project changes
+
+    Combines the global data, rules and project list counters with the sum of
+    every project's counter; each bump raises the sum, so the string never
+    repeats.
+    """
+    from services.rule_cache import RULES_VERSION_NAME
+    from services.summary_cache import PROJECTS_VERSION_NAME
+
+    names = [DATA_VERSION_NAME, RULES_VERSION_NAME, PROJECTS_VERSION_NAME]
+    versions = dict(
+        db.session.query(CacheVersion.name, CacheVersion.version)
+        .filter(or_(CacheVersion.name.in_(names), CacheVersion.name.like('project:%')))
+        .all()
+    )
+    project_versions = sum(version for name, version in versions.items() if name.startswith('project:'))
+    return '-'.join([str(versions.get(name, 0)) for name in names] + [str(project_versions)])
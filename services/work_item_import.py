@@ -0,0 +1,333 @@
+import csv
+import io
+import os
+import time
+import uuid
+from sqlalchemy import select
+from models import db, Project, SubJob, CostCode, RuleOfCredit, WorkItem, WorkItemStepProgress
+from services.rollups import rebuild_rollups
+from services.progress_history import record_aggregate_events
+
+# Rows validated, checked against existing work item IDs and inserted per transaction
+DEFAULT_CHUNK_SIZE = 5000
+
+# Columns of an import file; the sub job and cost code are looked up by their ID strings
+IMPORT_COLUMNS = (
+    'work_item_id_str', 'description', 'sub_job_id_str', 'cost_code_id_str',
+    'budgeted_quantity', 'unit_of_measure', 'budgeted_man_hours'
+)
+REQUIRED_COLUMNS = ('sub_job_id_str', 'cost_code_id_str')
+
+# Alternative header names accepted for the import columns
+COLUMN_ALIASES = {
+    'work_item_id': 'work_item_id_str',
+    'work_item': 'work_item_id_str',
+    'sub_job': 'sub_job_id_str',
+    'sub_job_id': 'sub_job_id_str',
+    'cost_code': 'cost_code_id_str',
+    'cost_code_id': 'cost_code_id_str',
+    'quantity': 'budgeted_quantity',
+    'uom': 'unit_of_measure',
+    'man_hours': 'budgeted_man_hours',
+    'hours': 'budgeted_man_hours'
+}
+
+# Maximum lengths of the imported string columns (see models.WorkItem)
+MAX_LENGTHS = {'work_item_id_str': 100, 'unit_of_measure': 20}
+
+ERROR_REPORT_COLUMNS = ('row', 'work_item_id_str', 'error')
+
+
+class ImportFileError(ValueError):
+    """The import file cannot be read (unsupported type, missing columns)"""
+
+
+# ===== READING FILES =====
+
+def _normalize_header(name):
+    key = str(name or '').strip().lower().replace(' ', '_').replace('-', '_')
+    return COLUMN_ALIASES.get(key, key)
+
+
+def _check_header(header):
+    columns = [_normalize_header(name) for name in header]
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ImportFileError(f"Missing required column(s): {', '.join(missing)}")
+    return columns
+
+
+def _read_csv_rows(stream):
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text_stream)
+    header = next(reader, None)
+    if header is None:
+        raise ImportFileError("The file is empty")
+    columns = _check_header(header)
+    for values in reader:
+        if any(value.strip() for value in values):
+            yield reader.line_num, dict(zip(columns, values))
+
+
+def _read_excel_rows(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError("Excel import requires the openpyxl package; upload a CSV file instead")
+
+    # read_only streams the sheet instead of loading every cell
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise ImportFileError("The file is empty")
+        columns = _check_header(header)
+        for row_number, values in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in values):
+                yield row_number, dict(zip(columns, values))
+    finally:
+        workbook.close()
+
+
+def read_import_rows(stream, filename):
+    """
+    Stream the rows of a CSV or Excel (.xlsx) import file
+
+    Args:
+        stream: Binary file object
+        filename (str): Original file name, whose extension selects the format
+
+    Yields:
+        tuple: (row number in the file, column name -> raw value)
+
+    Raises:
+        ImportFileError: If the file type is not supported or required columns are missing
+    """
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension in ('.csv', '.txt'):
+        return _read_csv_rows(stream)
+    if extension in ('.xlsx', '.xlsm'):
+        return _read_excel_rows(stream)
+    raise ImportFileError(f"Unsupported file type '{extension}'; use .csv or .xlsx")
+
+
+# ===== VALIDATION =====
+
+class _ImportContext:
+    """Lookup maps for one project, loaded once per import"""
+
+    def __init__(self, project_id):
+        self.project_id = project_id
+        self.sub_jobs = dict(
+            db.session.query(SubJob.sub_job_id_str, SubJob.id).filter(SubJob.project_id == project_id)
+        )
+        self.cost_codes = {
+            row.cost_code_id_str: (row.id, row.rule_of_credit_id)
+            for row in db.session.query(CostCode.cost_code_id_str, CostCode.id, CostCode.rule_of_credit_id)
+            .filter(CostCode.project_id == project_id)
+        }
+        rule_ids = {rule_id for _, rule_id in self.cost_codes.values() if rule_id}
+        self.rule_steps = {
+            rule.id: [str(step['name']) for step in rule.get_steps() if isinstance(step, dict) and 'name' in step]
+            for rule in RuleOfCredit.query.filter(RuleOfCredit.id.in_(rule_ids))
+        } if rule_ids else {}
+        self.seen_ids = set()
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _number(value, label):
+    if value is None or _text(value) == '':
+        return None
+    try:
+        number = float(value) if not isinstance(value, str) else float(value.replace(',', '').strip())
+    except ValueError:
+        raise ValueError(f"{label} is not a number: {value}")
+    if number < 0:
+        raise ValueError(f"{label} cannot be negative")
+    return number
+
+
+def _validate_row(context, values):
+    """
+    Turn the raw values of one row into work_item column values
+
+    Raises:
+        ValueError: With the message for the error report
+    """
+    sub_job_key = _text(values.get('sub_job_id_str'))
+    if not sub_job_key:
+        raise ValueError("Sub job is required")
+    if sub_job_key not in context.sub_jobs:
+        raise ValueError(f"Unknown sub job for this project: {sub_job_key}")
+
+    cost_code_key = _text(values.get('cost_code_id_str'))
+    if not cost_code_key:
+        raise ValueError("Cost code is required")
+    if cost_code_key not in context.cost_codes:
+        raise ValueError(f"Unknown cost code for this project: {cost_code_key}")
+    cost_code_id, rule_id = context.cost_codes[cost_code_key]
+
+    row = {
+        'work_item_id_str': _text(values.get('work_item_id_str')) or f"WI-{uuid.uuid4().hex[:8].upper()}",
+        'description': _text(values.get('description')) or None,
+        'project_id': context.project_id,
+        'sub_job_id': context.sub_jobs[sub_job_key],
+        'cost_code_id': cost_code_id,
+        'budgeted_quantity': _number(values.get('budgeted_quantity'), 'Budgeted quantity'),
+        'unit_of_measure': _text(values.get('unit_of_measure')) or None,
+        'budgeted_man_hours': _number(values.get('budgeted_man_hours'), 'Budgeted man hours'),
+        'progress_json': '[]',
+        # New work items have no progress, so nothing is earned yet
+        'earned_man_hours': 0.0,
+        'earned_quantity': 0.0,
+        'percent_complete_hours': 0.0,
+        'percent_complete_quantity': 0.0
+    }
+    for column, max_length in MAX_LENGTHS.items():
+        if row[column] and len(row[column]) > max_length:
+            raise ValueError(f"{column} is longer than {max_length} characters")
+
+    if row['work_item_id_str'] in context.seen_ids:
+        raise ValueError(f"Duplicate work item ID in the file: {row['work_item_id_str']}")
+    context.seen_ids.add(row['work_item_id_str'])
+    return row, rule_id
+
+
+def _existing_work_item_ids(work_item_id_strs):
+    if not work_item_id_strs:
+        return set()
+    return set(db.session.execute(
+        select(WorkItem.work_item_id_str).where(WorkItem.work_item_id_str.in_(work_item_id_strs))
+    ).scalars())
+
+
+def _history_changes(chunk):
+    """Items and budgets added per (project, sub job) by a chunk; nothing is earned yet"""
+    changes = {}
+    for row, _ in chunk:
+        totals = changes.setdefault((row['project_id'], row['sub_job_id']),
+                                    {'item_count': 0, 'budgeted_man_hours': 0.0, 'budgeted_quantity': 0.0})
+        totals['item_count'] += 1
+        totals['budgeted_man_hours'] += row['budgeted_man_hours'] or 0
+        totals['budgeted_quantity'] += row['budgeted_quantity'] or 0
+    return changes
+
+
+def _insert_chunk(context, chunk):
+    """
+    Insert validated rows and their zero step progress rows with executemany statements
+
+    The chunk's additions go into the progress history as one event per sub
+    job in the same transaction, so S-curves show the import in the week it ran.
+    """
+    db.session.execute(WorkItem.__table__.insert(), [row for row, _ in chunk])
+    record_aggregate_events(_history_changes(chunk))
+
+    new_ids = dict(
+        db.session.query(WorkItem.work_item_id_str, WorkItem.id)
+        .filter(WorkItem.work_item_id_str.in_([row['work_item_id_str'] for row, _ in chunk]))
+    )
+    step_rows = [
+        {'work_item_id': new_ids[row['work_item_id_str']], 'step_name': step_name, 'percentage': 0.0}
+        for row, rule_id in chunk
+        for step_name in context.rule_steps.get(rule_id, ())
+    ]
+    if step_rows:
+        db.session.execute(WorkItemStepProgress.__table__.insert(), step_rows)
+
+
+# ===== IMPORT =====
+
+def import_work_items(project_id, rows, dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE, progress_callback=None):
+    """
+    Validate and insert work items in bulk
+
+    Sub jobs and cost codes are resolved through lookup maps loaded once for
+    the project. Rows are validated and inserted in chunks, each with one
+    query for already existing work item IDs, executemany INSERTs for work
+    items and their step progress, and its own commit. Invalid rows are
+    skipped and listed in the result; the project's rollups are rebuilt once
+    at the end.
+
+    Args:
+        project_id (int): Project the work items are imported into
+        rows (iterable): (row number, column name -> value) pairs, e.g. from read_import_rows
+        dry_run (bool): Validate only, without writing anything
+        chunk_size (int): Rows per transaction
+        progress_callback (callable): Called as (rows read, rows imported, elapsed_seconds) after each chunk
+
+    Returns:
+        dict: Rows read, imported and rejected, the errors as
+              {'row', 'work_item_id_str', 'error'} dictionaries, and elapsed seconds
+    """
+    started = time.monotonic()
+    if db.session.get(Project, project_id) is None:
+        raise ValueError(f"Project {project_id} not found")
+    context = _ImportContext(project_id)
+
+    read = imported = 0
+    errors = []
+
+    def flush(chunk):
+        nonlocal imported
+        existing = _existing_work_item_ids([row['work_item_id_str'] for _, row, _ in chunk])
+        valid = []
+        for row_number, row, rule_id in chunk:
+            if row['work_item_id_str'] in existing:
+                errors.append({'row': row_number, 'work_item_id_str': row['work_item_id_str'],
+                               'error': f"Work item ID already exists: {row['work_item_id_str']}"})
+            else:
+                valid.append((row, rule_id))
+        if valid and not dry_run:
+            _insert_chunk(context, valid)
+            db.session.commit()
+        imported += len(valid)
+        if progress_callback:
+            progress_callback(read, imported, time.monotonic() - started)
+
+    chunk = []
+    try:
+        for row_number, values in rows:
+            read += 1
+            try:
+                row, rule_id = _validate_row(context, values)
+            except ValueError as e:
+                errors.append({'row': row_number, 'work_item_id_str': _text(values.get('work_item_id_str')),
+                               'error': str(e)})
+                continue
+            chunk.append((row_number, row, rule_id))
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+    finally:
+        db.session.rollback()
+        if imported and not dry_run:
+            # Also covers chunks committed before a failure
+            rebuild_rollups(project_id=project_id)
+            db.session.commit()
+
+    return {
+        'dry_run': dry_run,
+        'rows': read,
+        'imported': imported,
+        'rejected': len(errors),
+        'errors': errors,
+        'elapsed_seconds': time.monotonic() - started
+    }
+
+
+def write_error_report(errors, output):
+    """Write import errors as CSV to a text file object"""
+    writer = csv.DictWriter(output, fieldnames=ERROR_REPORT_COLUMNS)
+    writer.writeheader()
+    writer.writerows(errors)
@@ -1,31 +1,78 @@
 from flask import Flask
 from routes import main_bp
 from models import db
+from commands import register_commands
+from services.database import init_database, get_database_url, get_engine_options
+from services.instrumentation import init_instrumentation
+from services.metrics import init_metrics
 import os
 
 def create_app():
     """Create and configure the Flask application"""
     app = Flask(__name__)
     
-    # Configure the SQLite database
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///magellan_ev.db'
+    # Configure the database: SQLite by default, PostgreSQL via DATABASE_URL
+    app.config['SQLALCHEMY_DATABASE_URI'] = get_database_url()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = get_engine_options()
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = 'magellan-ev-secret-key'  # Required for flash messages
     
+    # SQLite tuning: 'default' or 'production' (WAL, pragmas and pool sizing, see services.database)
+    app.config['SQLITE_PROFILE'] = os.environ.get('SQLITE_PROFILE', 'default')
+    
+    # Background PDF report generation
+    app.config['REPORT_WORKERS'] = int(os.environ.get('REPORT_WORKERS', 2))
+    
+    # Let a fronting nginx/Apache serve report files (X-Sendfile) instead of the app
+    app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+    
+    # Opt-in request profiling: Server-Timing headers and per-route totals at /_metrics
+    app.config['PROFILING'] = os.environ.get('PROFILING', '').lower() in ('1', 'true', 'yes')
+    app.config['PROFILING_MEMORY'] = os.environ.get('PROFILING_MEMORY', '').lower() in ('1', 'true', 'yes')
+    app.config['PROFILING_N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('PROFILING_N_PLUS_ONE_THRESHOLD', 10))
+    
+    # Prometheus metrics at /metrics; set PROMETHEUS_MULTIPROC_DIR to combine gunicorn workers
+    app.config['METRICS'] = os.environ.get('METRICS', '1').lower() in ('1', 'true', 'yes')
+    
     # Initialize the database with the app
-    db.init_app(app)
+    init_database(app)
+    
+    # Request profiling, when enabled
+    init_instrumentation(app)
+    
+    # Prometheus metrics, when enabled
+    init_metrics(app)
     
     # Register the blueprint
     app.register_blueprint(main_bp)
     
-    # Create database tables
+    # Register CLI maintenance commands
+    register_commands(app)
+    
+    # Create database tables and bring existing ones up to date
     with app.app_context():
         db.create_all()
+        
+        from services.migrations import run_migrations
+        run_migrations()
+        
+        # Convert legacy progress_json step progress into rows
+        from services.step_progress import migrate_progress_json
+        migrate_progress_json()
+        
+        # Populate the materialized rollups on first start after upgrading
+        from services.rollups import ensure_rollups
+        ensure_rollups()
+        
+        # Full-text search index over work items and cost codes (SQLite FTS5)
+        from services.search import ensure_search_index
+        ensure_search_index()
     
     return app
 
-app = create_app()
-
+# Created by gunicorn ('simple_app:create_app()') or below, not on import: spawned
+# report workers import this module and must not repeat the startup work
 if __name__ == '__main__':
+    app = create_app()
     port = int(os.environ.get("PORT", 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,208 @@
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import warnings
+import pytest
+
+# The suite runs against one database, chosen when pytest starts:
+#   1. TEST_DATABASE_URL, if set (any URL DATABASE_URL accepts)
+#   2. A throwaway PostgreSQL server launched from initdb/pg_ctl found in
+#      POSTGRES_BIN_DIR or on PATH (the server refuses to run as root)
+#   3. A SQLite file in a temporary directory
+# The app is built by simple_app.create_app() with DATABASE_URL pointing there.
+
+# Seconds to wait for the throwaway PostgreSQL server to accept connections
+POSTGRES_START_TIMEOUT = 30
+
+
+# ===== DATABASE BACKEND =====
+
+def _find_postgres_binary(name):
+    bin_dir = os.environ.get('POSTGRES_BIN_DIR')
+    if bin_dir:
+        path = os.path.join(bin_dir, name)
+        return path if os.access(path, os.X_OK) else None
+    return shutil.which(name)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_postgres(directory):
+    """
+    Launch a PostgreSQL server with its data in directory
+
+    Returns:
+        tuple: (database URL, stop function), or None if no server could be started
+    """
+    initdb = _find_postgres_binary('initdb')
+    pg_ctl = _find_postgres_binary('pg_ctl')
+    if not initdb or not pg_ctl:
+        return None
+
+    data_dir = os.path.join(directory, 'pgdata')
+    port = _free_port()
+    server_options = f"-p {port} -k {directory} -c listen_addresses=127.0.0.1 -c fsync=off"
+    try:
+        subprocess.run([initdb, '-D', data_dir, '-U', 'postgres', '--auth=trust', '-E', 'UTF8', '--no-sync'],
+                       check=True, capture_output=True, text=True)
+        subprocess.run([pg_ctl, '-D', data_dir, '-l', os.path.join(directory, 'postgres.log'), '-o', server_options,
+                        '-w', '-t', str(POSTGRES_START_TIMEOUT), 'start'],
+                       check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError as e:
+        warnings.warn(f"Could not start PostgreSQL, testing on SQLite: {(e.stderr or e.stdout).strip()}")
+        return None
+
+    def stop():
+        subprocess.run([pg_ctl, '-D', data_dir, '-m', 'immediate', 'stop'], capture_output=True)
+
+    return f"postgresql://postgres@127.0.0.1:{port}/postgres", stop
+
+
+def pytest_configure(config):
+    directory = tempfile.mkdtemp(prefix='magellan-ev-test-')
+    config.test_directory = directory
+    config.stop_database = None
+
+    url = os.environ.get('TEST_DATABASE_URL')
+    if not url:
+        started = _start_postgres(directory)
+        if started:
+            url, config.stop_database = started
+        else:
+            url = 'sqlite:///' + os.path.join(directory, 'magellan_ev.db')
+    config.database_url = url
+
+    # Read by simple_app.create_app() when the app fixture calls it
+    os.environ['DATABASE_URL'] = url
+
+
+def pytest_unconfigure(config):
+    if getattr(config, 'stop_database', None):
+        config.stop_database()
+    if getattr(config, 'test_directory', None):
+        shutil.rmtree(config.test_directory, ignore_errors=True)
+
+
+def pytest_report_header(config):
+    return f"database: {config.database_url}"
+
+
+# ===== FIXTURES =====
+
+@pytest.fixture(scope='session')
+def app():
+    """The application as simple_app creates it, on the test database"""
+    from simple_app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def app_context(app):
+    """
+    App context for one test
+
+    Rows the test wrote are deleted afterwards and the process-local caches
+    dropped, so every test starts from an empty (but migrated) database.
+    """
+    from models import db
+    from services import rule_cache, summary_cache
+
+    with app.app_context():
+        yield
+        db.session.remove()
+        for table in reversed(db.metadata.sorted_tables):
+            if table.name != 'schema_migration':
+                db.session.execute(table.delete())
+        db.session.commit()
+        db.session.remove()
+    rule_cache.clear_cache()
+    summary_cache.clear_cache()
+
+
+@pytest.fixture
+def create_project(app_context):
+    """
+    Factory for a project with sub jobs, two cost codes and their rules of credit
+
+    Work items alternate between the sub jobs and cost codes. Piping items
+    use the 'Install'/'Test' rule (60/40) with some progress; electrical
+    items use the 'Pull'/'Terminate' rule (50/50) with none.
+
+    Returns:
+        callable: (name, work_items=10, sub_jobs=2) -> dict of the created IDs
+    """
+    from models import db, Project, SubJob, RuleOfCredit, CostCode, WorkItem
+    from services.rollups import rebuild_rollups
+
+    rule_ids = {}
+
+    def get_rule_id(name, steps):
+        if name not in rule_ids:
+            rule = RuleOfCredit(name=name)
+            rule.set_steps(steps)
+            db.session.add(rule)
+            db.session.flush()
+            rule_ids[name] = rule.id
+        return rule_ids[name]
+
+    def create(name, work_items=10, sub_jobs=2):
+        project = Project(project_id_str=name, name=f"Project {name}")
+        db.session.add(project)
+        db.session.flush()
+        sub_job_rows = [
+            SubJob(sub_job_id_str=f"{name}-SJ{number}", name=f"Sub job {number}", area=f"Area {number}",
+                   project_id=project.id)
+            for number in range(1, sub_jobs + 1)
+        ]
+        piping_rule_id = get_rule_id('Piping', [{'name': 'Install', 'weight': 60}, {'name': 'Test', 'weight': 40}])
+        electrical_rule_id = get_rule_id('Electrical',
+                                         [{'name': 'Pull', 'weight': 50}, {'name': 'Terminate', 'weight': 50}])
+        cost_codes = [
+            CostCode(cost_code_id_str=f"{name}-PIPE", description='Pipe', discipline='Piping',
+                     project_id=project.id, rule_of_credit_id=piping_rule_id),
+            CostCode(cost_code_id_str=f"{name}-WIRE", description='Wire', discipline='Electrical',
+                     project_id=project.id, rule_of_credit_id=electrical_rule_id)
+        ]
+        db.session.add_all(sub_job_rows + cost_codes)
+        db.session.flush()
+
+        for number in range(work_items):
+            work_item = WorkItem(
+                work_item_id_str=f"{name}-WI{number:05d}",
+                description=f"Work item {number}",
+                project_id=project.id,
+                sub_job_id=sub_job_rows[number % sub_jobs].id,
+                cost_code_id=cost_codes[number % 2].id,
+                budgeted_quantity=10 + number,
+                unit_of_measure='EA',
+                budgeted_man_hours=5 + number
+            )
+            if number % 2 == 0:
+                work_item.set_steps_progress({'Install': (number * 7) % 101, 'Test': 0})
+            db.session.add(work_item)
+            db.session.flush()
+            work_item.calculate_earned_values()
+        db.session.commit()
+        rebuild_rollups(project_id=project.id)
+        db.session.commit()
+
+        return {
+            'project_id': project.id,
+            'sub_job_ids': [sub_job.id for sub_job in sub_job_rows],
+            'cost_code_ids': [cost_code.id for cost_code in cost_codes]
+        }
+
+    return create
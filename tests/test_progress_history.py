@@ -0,0 +1,64 @@
+import datetime
+import pytest
+from models import db, ProgressEvent, ProgressSnapshot, RollupTotal, RuleOfCredit
+from services.progress_history import compact_project_history, week_start
+
+
+def _record_history_weeks_ago(ids, weeks, item_count):
+    """An event from before the test, as left by work items added back then"""
+    db.session.add(ProgressEvent(
+        project_id=ids['project_id'], sub_job_id=ids['sub_job_ids'][0], item_count=item_count,
+        recorded_at=datetime.datetime.utcnow() - datetime.timedelta(weeks=weeks)
+    ))
+    db.session.commit()
+
+
+def _project_item_counts(project_id):
+    compact_project_history(project_id)
+    db.session.commit()
+    return {
+        snapshot.period_start: snapshot.item_count
+        for snapshot in ProgressSnapshot.query.filter_by(project_id=project_id, scope='project')
+    }
+
+
+def test_import_is_recorded_in_the_week_it_ran(app_context, create_project):
+    from services.work_item_import import import_work_items
+
+    ids = create_project('IM', work_items=2, sub_jobs=1)
+    _record_history_weeks_ago(ids, 3, 2)
+
+    rows = [
+        (number, {'work_item_id_str': f'IM-NEW{number}', 'sub_job_id_str': 'IM-SJ1', 'cost_code_id_str': 'IM-PIPE',
+                  'budgeted_quantity': 4, 'budgeted_man_hours': 2})
+        for number in range(3)
+    ]
+    result = import_work_items(ids['project_id'], rows, chunk_size=2)
+    assert result['imported'] == 3
+
+    events = ProgressEvent.query.filter_by(project_id=ids['project_id'], work_item_id=None).all()
+    assert sum(event.item_count for event in events) == 2 + 3
+    counts = _project_item_counts(ids['project_id'])
+    this_week = week_start(datetime.datetime.utcnow())
+    assert counts[this_week] == 5
+    assert counts[this_week - datetime.timedelta(weeks=1)] == 2
+
+
+def test_recalculation_is_recorded_in_the_week_it_ran(app_context, create_project):
+    from services.recalculation import recalculate_work_items
+    from services.rule_cache import invalidate_rule
+
+    ids = create_project('RE', work_items=6, sub_jobs=2)
+    rule = RuleOfCredit.query.filter_by(name='Piping').one()
+    rule.set_steps([{'name': 'Install', 'weight': 100}, {'name': 'Test', 'weight': 0}])
+    invalidate_rule(rule.id)
+    db.session.commit()
+
+    def earned_hours():
+        return RollupTotal.query.filter_by(project_id=ids['project_id'], scope='project').one().earned_man_hours
+
+    before = earned_hours()
+    recalculate_work_items(rule_id=rule.id)
+    change = sum(event.earned_man_hours for event in ProgressEvent.query.filter_by(project_id=ids['project_id']))
+    assert change > 0
+    assert earned_hours() - before == pytest.approx(change)
@@ -0,0 +1,104 @@
+import io
+import zipfile
+import pytest
+from sqlalchemy import event
+from models import db
+from reports.pdf_export import write_quantities_report_pdf
+from services import rule_cache, summary_cache
+from services.report_jobs import write_combined_report
+
+# Most statements a page may run, whatever the number of rows
+MAX_PAGE_QUERIES = 10
+
+# Most statements a report may run: project, totals, the two streaming
+# cursors, the rules version check and one load per rule of credit (two here)
+MAX_REPORT_QUERIES = 7
+
+
+class QueryCounter:
+    """Count the statements sent to the database inside a with block"""
+
+    def __init__(self):
+        self.statements = []
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+def _count_cold(run):
+    """Statements run by a call with the process caches empty, as after a restart"""
+    db.session.remove()
+    summary_cache.clear_cache()
+    rule_cache.clear_cache()
+    with QueryCounter() as counter:
+        run()
+    return counter.count
+
+
+@pytest.mark.parametrize('url', ['/projects', '/'])
+def test_project_list_queries_do_not_grow_with_projects(app_context, client, create_project, url):
+    def fetch():
+        assert client.get(url).status_code == 200
+
+    create_project('SMALL', work_items=2, sub_jobs=1)
+    small = _count_cold(fetch)
+    for number in range(6):
+        create_project(f'LARGE{number}', work_items=30, sub_jobs=4)
+    large = _count_cold(fetch)
+
+    assert large == small
+    assert large <= MAX_PAGE_QUERIES
+
+
+def test_project_page_queries_do_not_grow_with_sub_jobs(app_context, client, create_project):
+    small_project = create_project('SMALL', work_items=2, sub_jobs=1)
+    large_project = create_project('LARGE', work_items=200, sub_jobs=12)
+
+    def fetch(project_id):
+        def run():
+            assert client.get(f"/project/{project_id}").status_code == 200
+        return run
+
+    small = _count_cold(fetch(small_project['project_id']))
+    large = _count_cold(fetch(large_project['project_id']))
+
+    assert large == small
+    assert large <= MAX_PAGE_QUERIES
+
+
+def test_report_queries_do_not_grow_with_work_items(app_context, create_project):
+    small_project = create_project('SMALL', work_items=3, sub_jobs=1)
+    large_project = create_project('LARGE', work_items=600, sub_jobs=6)
+
+    def report(project_id):
+        return lambda: write_quantities_report_pdf(io.BytesIO(), project_id=project_id)
+
+    small = _count_cold(report(small_project['project_id']))
+    large = _count_cold(report(large_project['project_id']))
+
+    assert large == small
+    assert large <= MAX_REPORT_QUERIES
+
+
+def test_combined_report_reads_the_work_items_once(app_context, create_project):
+    project = create_project('BOTH', work_items=40, sub_jobs=2)
+    single = _count_cold(lambda: write_quantities_report_pdf(io.BytesIO(), project_id=project['project_id']))
+
+    archive = io.BytesIO()
+    combined = _count_cold(lambda: write_combined_report(archive, project_id=project['project_id']))
+
+    assert combined == single
+    with zipfile.ZipFile(archive) as opened:
+        assert opened.namelist() == ['BOTH_quantities_report.pdf', 'BOTH_hours_report.pdf']
+        assert all(opened.read(name).startswith(b'%PDF') for name in opened.namelist())
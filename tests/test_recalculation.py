@@ -0,0 +1,62 @@
+import time
+from models import db, RecalculationJob
+
+
+def _wait_for_recalculation(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        status = client.get(f'/api/recalculations/{job_id}').get_json()
+        if status['status'] != 'running' or time.monotonic() > deadline:
+            return status
+        time.sleep(0.1)
+
+
+def test_rule_edit_recalculation_status_is_shared(app_context, client, create_project):
+    from models import RuleOfCredit
+
+    create_project('RC', work_items=8)
+    rule = RuleOfCredit.query.filter_by(name='Piping').one()
+    response = client.post(f'/edit_rule_of_credit/{rule.id}', data={
+        'name': 'Piping', 'description': '',
+        'step_name[]': ['Install', 'Test'], 'step_weight[]': ['50', '50']
+    })
+    assert response.status_code == 302
+    job_id = response.location.partition('recalculation=')[2]
+    assert job_id
+
+    # Stored in the database, so any web worker can answer the poll
+    assert db.session.get(RecalculationJob, job_id) is not None
+    assert job_id in client.get(f'/list_rules_of_credit?recalculation={job_id}').get_data(as_text=True)
+
+    status = _wait_for_recalculation(client, job_id)
+    assert status['status'] == 'completed'
+    assert status['done'] == status['total'] == 4
+
+
+def test_unknown_recalculation_is_not_found(app_context, client):
+    assert client.get('/api/recalculations/missing').status_code == 404
+
+
+def test_locked_chunk_holds_off_concurrent_progress(app_context, create_project):
+    import threading
+    from sqlalchemy import update
+    from models import WorkItem
+    from services.database import lock_for_update
+
+    create_project('LK', work_items=4)
+    rows = lock_for_update(WorkItem.query.order_by(WorkItem.id), of=WorkItem).all()
+    engine = db.engine
+
+    def write_progress():
+        with engine.connect() as connection:
+            connection.execute(update(WorkItem).where(WorkItem.id == rows[0].id).values(earned_man_hours=1.0))
+            connection.commit()
+
+    writer = threading.Thread(target=write_progress)
+    writer.start()
+    writer.join(0.5)
+    assert writer.is_alive()
+
+    db.session.commit()
+    writer.join(10)
+    assert not writer.is_alive()